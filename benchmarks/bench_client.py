@@ -0,0 +1,189 @@
+"""
+Benchmark the client against a local stand-in of the site.
+
+The stand-in serves synthetic pages of growing sizes, or the pages
+recorded from the site in the directory given with --recorded (see
+RecordedWilmaData).  The parse times are measured without the HTTP
+requests for each of the HTML parsers.
+
+Run with: python -m benchmarks.bench_client [--recorded DIR]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from wilmes._client import (
+    MESSAGE_PAGE_REGIONS,
+    MESSAGE_PATH,
+    NEWS_LIST_PAGE_REGIONS,
+    NEWS_LIST_PATH,
+    Connection,
+    _get_http_encoding,
+)
+from wilmes._html_parsing import HTML_PARSERS
+from wilmes.tests.fake_wilma import (
+    FakeWilmaData,
+    FakeWilmaServer,
+    RecordedWilmaData,
+)
+
+MESSAGE_COUNTS = [10, 100, 1000]
+MESSAGE_SIZES = [(0, 5), (10, 50), (50, 500)]  # (replies, recipients)
+NEWS_COUNTS = [10, 100, 1000]
+
+Result = Dict[str, object]
+
+
+def run(repeat: int = 5, recorded: Optional[str] = None) -> List[Result]:
+    def make_data(**sizes: int) -> FakeWilmaData:
+        if recorded:
+            return RecordedWilmaData(recorded, **sizes)
+        return FakeWilmaData(**sizes)
+
+    return (
+        bench_open(make_data, repeat)
+        + bench_message_list(make_data, repeat)
+        + bench_message(make_data, repeat)
+        + bench_news_list(make_data, repeat))
+
+
+def bench_open(
+        make_data: Callable[..., FakeWilmaData],
+        repeat: int,
+) -> List[Result]:
+    with FakeWilmaServer(make_data()) as server:
+        connections: List[Connection] = []
+        timing = measure(
+            lambda: connections.append(
+                Connection.open(server.url, 'user', 'pass')),
+            repeat)
+        for connection in connections:
+            connection.close()
+    return [{'benchmark': 'open', **timing}]
+
+
+def bench_message_list(
+        make_data: Callable[..., FakeWilmaData],
+        repeat: int,
+) -> List[Result]:
+    results: List[Result] = []
+    for count in MESSAGE_COUNTS:
+        data = make_data(pupils=1, messages=count)
+        with FakeWilmaServer(data) as server, \
+                Connection.open(server.url, 'user', 'pass') as connection:
+            pupil_id = next(iter(connection.pupils))
+            message_count = len(connection.fetch_message_list(pupil_id))
+            timing = measure(
+                lambda: connection.fetch_message_list(pupil_id), repeat)
+        results.append({
+            'benchmark': 'fetch_message_list',
+            'messages': message_count,
+            **timing,
+            'messages_per_second': (
+                message_count / timing['median_seconds']),
+        })
+    return results
+
+
+def bench_message(
+        make_data: Callable[..., FakeWilmaData],
+        repeat: int,
+) -> List[Result]:
+    results: List[Result] = []
+    for (replies, recipients) in MESSAGE_SIZES:
+        data = make_data(
+            pupils=1, messages=1, replies=replies, recipients=recipients)
+        with FakeWilmaServer(data) as server, \
+                Connection.open(server.url, 'user', 'pass') as connection:
+            pupil_id = next(iter(connection.pupils))
+            info = connection.fetch_message_list(pupil_id)[0]
+            sizes: Result = {'replies': replies, 'recipients': recipients}
+            results.append({
+                'benchmark': 'fetch_message',
+                **sizes,
+                **measure(lambda: connection.fetch_message(info), repeat),
+            })
+            url = MESSAGE_PATH.format(pupil_id=pupil_id, message_id=info.id)
+            response = connection._browse_simple(url)
+            for (parser_name, html_parser) in HTML_PARSERS.items():
+                def parse() -> None:
+                    page = html_parser.parse(
+                        response.content, _get_http_encoding(response),
+                        MESSAGE_PAGE_REGIONS)
+                    connection._parse_message(
+                        info, connection._get_message_body(page, url))
+
+                results.append({
+                    'benchmark': 'parse_message',
+                    **sizes,
+                    'html_parser': parser_name,
+                    'bytes': len(response.content),
+                    **measure(parse, repeat),
+                })
+    return results
+
+
+def bench_news_list(
+        make_data: Callable[..., FakeWilmaData],
+        repeat: int,
+) -> List[Result]:
+    results: List[Result] = []
+    for count in NEWS_COUNTS:
+        with FakeWilmaServer(make_data(pupils=1, news=count)) as server, \
+                Connection.open(server.url, 'user', 'pass') as connection:
+            pupil_id = next(iter(connection.pupils))
+            results.append({
+                'benchmark': 'fetch_news_list',
+                'news_items': count,
+                **measure(
+                    lambda: connection.fetch_news_list(pupil_id), repeat),
+            })
+            response = connection._browse_simple(
+                NEWS_LIST_PATH.format(pupil_id=pupil_id))
+            for (parser_name, html_parser) in HTML_PARSERS.items():
+                def parse() -> None:
+                    page = html_parser.parse(
+                        response.content, _get_http_encoding(response),
+                        NEWS_LIST_PAGE_REGIONS)
+                    connection._parse_news_list(pupil_id, page)
+
+                results.append({
+                    'benchmark': 'parse_news_list',
+                    'news_items': count,
+                    'html_parser': parser_name,
+                    'bytes': len(response.content),
+                    **measure(parse, repeat),
+                })
+    return results
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    times: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        'min_seconds': min(times),
+        'median_seconds': statistics.median(times),
+    }
+
+
+def main(argv: List[str] = sys.argv) -> None:
+    parser = argparse.ArgumentParser(prog=argv[0])
+    parser.add_argument(
+        '--repeat', '-r', type=int, default=5,
+        help="Number of times to repeat each measurement")
+    parser.add_argument(
+        '--recorded',
+        help="Directory of recorded pages to serve")
+    args = parser.parse_args(argv[1:])
+    json.dump(run(args.repeat, args.recorded), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
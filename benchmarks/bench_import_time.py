@@ -0,0 +1,76 @@
+"""
+Benchmark the import times of the package and the command line tool.
+
+Each module is imported in a fresh interpreter with -X importtime.
+The cumulative import time of the module and the wall time of the
+whole process are reported, as the minimum of the runs, together
+with the import times of the heavy libraries which got imported.
+The command line tool should not import any of them, so that e.g.
+"wilmes --check-only" starts fast.
+
+Run with: python -m benchmarks.bench_import_time
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+MODULES = [None, 'wilmes', 'wilmes.__main__', 'wilmes._client']
+HEAVY_MODULES = [
+    'bs4', 'dateutil', 'lxml', 'mechanicalsoup', 'pytz', 'requests']
+
+
+def import_module(module: Optional[str]) -> Tuple[float, Dict[str, int]]:
+    """
+    Import the module in a new interpreter.
+
+    Return the wall time of the process in seconds and the cumulative
+    import times of the imported modules in microseconds.
+    """
+    code = f'import {module}' if module else 'pass'
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        check=True, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    import_times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        (prefix, _sep, rest) = line.partition(':')
+        if prefix != 'import time' or rest.strip().startswith('self'):
+            continue
+        (_self_us, cumulative_us, name) = rest.split('|')
+        import_times.setdefault(name.strip(), int(cumulative_us))
+    return (seconds, import_times)
+
+
+def run(number: int = 5) -> List[Dict[str, object]]:
+    results: List[Dict[str, object]] = []
+    for module in MODULES:
+        runs = [import_module(module) for _ in range(number)]
+        import_times = min(runs, key=lambda x: x[1].get(module or '', 0))[1]
+        results.append({
+            'benchmark': 'import_time',
+            'module': module or '(interpreter start-up)',
+            'process_seconds': min(seconds for (seconds, _times) in runs),
+            'import_seconds': import_times.get(module or '', 0) / 1e6,
+            'heavy_modules': {
+                name: import_times[name] / 1e6
+                for name in HEAVY_MODULES if name in import_times},
+        })
+    return results
+
+
+def main(argv: List[str] = sys.argv) -> None:
+    parser = argparse.ArgumentParser(prog=argv[0])
+    parser.add_argument(
+        '--number', '-n', type=int, default=5,
+        help="Number of times to import each module")
+    args = parser.parse_args(argv[1:])
+    json.dump(run(args.number), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
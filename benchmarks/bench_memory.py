@@ -0,0 +1,138 @@
+"""
+Measure the memory used by message infos of many accounts.
+
+The "plain" variant builds dataclasses with an instance dict and a
+new sender for every row, like the message list parsing used to do.
+
+Run with: python -m benchmarks.bench_memory
+"""
+import gc
+import json
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from wilmes._client import _ConnectionBase
+from wilmes._html_parsing import DEFAULT_HTML_PARSER
+from wilmes._serialization import message_info_from_dict, message_info_to_dict
+from wilmes._timestamps import _parse_known_timestamp, parse_timestamp
+from wilmes._types import PupilId
+
+ACCOUNTS = 50
+MESSAGES_PER_ACCOUNT = 1000
+SENDERS_PER_ACCOUNT = 10
+URL = 'https://wilma.example.com'
+
+
+@dataclass
+class _PlainPerson:
+    name: str
+    id: Optional[int] = None
+    type: Optional[str] = None
+
+
+@dataclass
+class _PlainMessageInfo:
+    id: int
+    origin: str
+    pupil_id: str
+    subject: str
+    last_timestamp: datetime
+    folder: str
+    sender: _PlainPerson
+    reply_count: int
+    is_unread: bool
+
+
+def make_message_lists() -> Dict[PupilId, Dict[str, Any]]:
+    # Decode the lists from JSON, so that every row has its own
+    # strings like when they are fetched
+    return {
+        PupilId(str(1000 + account)): json.loads(json.dumps({'Messages': [
+            {
+                'Id': n,
+                'Subject': f'Subject of message {n}',
+                'TimeStamp': f'2024-{1 + n % 12:02d}-{1 + n % 28:02d} 12:00',
+                'Folder': 'Inbox',
+                'Sender': f'Teacher {n % SENDERS_PER_ACCOUNT}',
+                'SenderId': n % SENDERS_PER_ACCOUNT,
+                'SenderType': 1,
+                'Replies': n % 3,
+                'Status': 0,
+            }
+            for n in range(MESSAGES_PER_ACCOUNT)
+        ]}))
+        for account in range(ACCOUNTS)
+    }
+
+
+def parse_plain(message_lists: Dict[PupilId, Dict[str, Any]]) -> List[Any]:
+    return [
+        _PlainMessageInfo(
+            id=x['Id'],
+            origin=URL,
+            pupil_id=pupil_id,
+            subject=x['Subject'],
+            last_timestamp=parse_timestamp(x['TimeStamp']),
+            folder=x['Folder'],
+            sender=_PlainPerson(
+                name=x['Sender'], id=x['SenderId'], type='teacher'),
+            reply_count=x['Replies'],
+            is_unread=False,
+        )
+        for (pupil_id, data) in message_lists.items()
+        for x in data['Messages']
+    ]
+
+
+def parse_compact(message_lists: Dict[PupilId, Dict[str, Any]]) -> List[Any]:
+    result: List[Any] = []
+    for (pupil_id, data) in message_lists.items():
+        # Each account has a connection of its own
+        connection = _ConnectionBase(URL, DEFAULT_HTML_PARSER)
+        result.extend(connection._parse_message_list(pupil_id, data))
+    return result
+
+
+def measure(
+        name: str,
+        build: Callable[[], List[Any]],
+) -> Dict[str, object]:
+    _parse_known_timestamp.cache_clear()
+    gc.collect()
+    tracemalloc.start()
+    items = build()
+    (current, _peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'benchmark': 'message_info_memory',
+        'variant': name,
+        'items': len(items),
+        'bytes': current,
+        'bytes_per_item': current / len(items),
+        'distinct_senders': len({id(x.sender) for x in items}),
+    }
+
+
+def run() -> List[Dict[str, object]]:
+    message_lists = make_message_lists()
+    compact = parse_compact(message_lists)
+    dicts = json.loads(json.dumps([message_info_to_dict(x) for x in compact]))
+    del compact
+    return [
+        measure('plain', lambda: parse_plain(message_lists)),
+        measure('compact', lambda: parse_compact(message_lists)),
+        measure('from_dict', lambda: [
+            message_info_from_dict(x) for x in dicts]),
+    ]
+
+
+def main() -> None:
+    json.dump(run(), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark parsing of long news lists.
+
+The news lists are parsed with each of the HTML parsers, with a date
+header for every couple of items and with a single date header for
+all the items.  The time per item should stay about the same as the
+lists grow.
+
+Run with: python -m benchmarks.bench_news_list
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List
+
+from wilmes._client import NEWS_LIST_PAGE_REGIONS, _ConnectionBase
+from wilmes._html_parsing import HTML_PARSERS
+from wilmes._types import PupilId
+from wilmes.tests.fake_wilma import FakeWilmaData
+
+NEWS_COUNTS = [1000, 2000, 4000, 8000]
+ORIGIN = 'https://example.com'
+PUPIL_ID = PupilId('1000')
+
+
+def run(number: int = 3) -> List[Dict[str, object]]:
+    results: List[Dict[str, object]] = []
+    for count in NEWS_COUNTS:
+        layouts = {'dense': 2, 'sparse': count}  # items per date header
+        for (layout, news_per_date) in layouts.items():
+            data = FakeWilmaData(news=count, news_per_date=news_per_date)
+            markup = data.news_list(PUPIL_ID).encode('utf-8')
+            for (parser_name, html_parser) in HTML_PARSERS.items():
+                connection = _ConnectionBase(ORIGIN, html_parser)
+                seconds = 0.0
+                for _ in range(number):
+                    # The parsing modifies the tree, so each run gets a
+                    # freshly parsed page, which is not timed
+                    page = html_parser.parse(
+                        markup, 'utf-8', NEWS_LIST_PAGE_REGIONS)
+                    start = time.perf_counter()
+                    connection._parse_news_list(PUPIL_ID, page)
+                    seconds += time.perf_counter() - start
+                results.append({
+                    'benchmark': 'parse_news_list',
+                    'news_items': count,
+                    'layout': layout,
+                    'html_parser': parser_name,
+                    'seconds': seconds / number,
+                    'us_per_item': seconds / (number * count) * 1e6,
+                })
+    return results
+
+
+def main(argv: List[str] = sys.argv) -> None:
+    parser = argparse.ArgumentParser(prog=argv[0])
+    parser.add_argument(
+        '--number', '-n', type=int, default=3,
+        help="Number of times to parse each list")
+    args = parser.parse_args(argv[1:])
+    json.dump(run(args.number), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
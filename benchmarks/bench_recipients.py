@@ -0,0 +1,116 @@
+"""
+Benchmark parsing of very large and malformed recipient lists.
+
+The recipient lists of school-wide messages are split both with the
+tokenizer and with PERSON_LIST_RX, which it replaces, and whole
+message pages with such lists are parsed.  The pathological inputs
+make the regex backtrack quadratically, so it is measured with the
+smaller sizes only.  The tokenizer time should grow linearly.
+
+Run with: python -m benchmarks.bench_recipients
+"""
+import argparse
+import json
+import sys
+import timeit
+from typing import Callable, Dict, List
+
+from wilmes._client import MESSAGE_PAGE_REGIONS, MESSAGE_PATH, _ConnectionBase
+from wilmes._html_parsing import DEFAULT_HTML_PARSER
+from wilmes._recipients import PERSON_LIST_RX, split_person_list
+from wilmes._types import PupilId
+from wilmes.tests.fake_wilma import FakeWilmaData
+
+RECIPIENT_COUNTS = [1000, 2000, 5000, 10000]
+PATHOLOGICAL_SIZES = [1000, 2000, 4000, 8000]
+MAX_REGEX_SIZE = 1000
+ORIGIN = 'https://example.com'
+PUPIL_ID = PupilId('1000')
+
+PATHOLOGICAL_INPUTS: Dict[str, Callable[[int], str]] = {
+    'comma_without_space': lambda n: 'x' * (10 * n) + ',y',
+    'unclosed_parentheses': lambda n: 'Name (' * n,
+    'unclosed_after_groups': lambda n: 'Name (7A) ' * n + '(',
+}
+
+Result = Dict[str, object]
+
+
+def run(number: int = 3) -> List[Result]:
+    return bench_recipient_lists(number) + bench_pathological(number)
+
+
+def bench_recipient_lists(number: int) -> List[Result]:
+    results: List[Result] = []
+    for count in RECIPIENT_COUNTS:
+        data = FakeWilmaData(pupils=1, messages=1, recipients=count)
+        text = ', '.join(
+            f'Recipient {n} (Class {n % 5}A)' for n in range(count))
+        results.append({
+            'benchmark': 'split_recipients',
+            'recipients': count,
+            'tokenizer_seconds': measure(
+                lambda: split_person_list(text), number),
+            'regex_seconds': measure(lambda: split_with_regex(text), number),
+        })
+        connection = _ConnectionBase(ORIGIN, DEFAULT_HTML_PARSER)
+        info = connection._parse_message_list(
+            PUPIL_ID, data.message_list(PUPIL_ID))[0]
+        markup = data.message_page(PUPIL_ID, info.id).encode('utf-8')
+        url = MESSAGE_PATH.format(pupil_id=PUPIL_ID, message_id=info.id)
+
+        def parse() -> None:
+            page = DEFAULT_HTML_PARSER.parse(
+                markup, 'utf-8', MESSAGE_PAGE_REGIONS)
+            connection._parse_message(
+                info, connection._get_message_body(page, url))
+
+        results.append({
+            'benchmark': 'parse_message',
+            'recipients': count,
+            'bytes': len(markup),
+            'seconds': measure(parse, number),
+        })
+    return results
+
+
+def bench_pathological(number: int) -> List[Result]:
+    results: List[Result] = []
+    for (name, make_input) in PATHOLOGICAL_INPUTS.items():
+        for size in PATHOLOGICAL_SIZES:
+            text = make_input(size)
+            results.append({
+                'benchmark': 'split_pathological',
+                'input': name,
+                'size': size,
+                'chars': len(text),
+                'tokenizer_seconds': measure(
+                    lambda: split_person_list(text), number),
+                'regex_seconds': (
+                    measure(lambda: split_with_regex(text), 1)
+                    if size <= MAX_REGEX_SIZE else None),
+            })
+    return results
+
+
+def split_with_regex(text: str) -> List[str]:
+    names = (x.group(1).strip() for x in PERSON_LIST_RX.finditer(text))
+    return [x for x in names if x]
+
+
+def measure(func: Callable[[], object], number: int) -> float:
+    return timeit.timeit(func, number=number) / number
+
+
+def main(argv: List[str] = sys.argv) -> None:
+    parser = argparse.ArgumentParser(prog=argv[0])
+    parser.add_argument(
+        '--number', '-n', type=int, default=3,
+        help="Number of times to run each measurement")
+    args = parser.parse_args(argv[1:])
+    json.dump(run(args.number), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark re-parsing a response archive with a replay connection.
+
+All the archived messages and news items of every pupil are parsed
+again with each of the HTML parsers, without any HTTP requests.  The
+archive is given with --archive and --origin, or else a synthetic one
+is recorded from the local stand-in of the site.
+
+Run with: python -m benchmarks.bench_replay [--archive DIR --origin URL]
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from wilmes._archive import ResponseArchive
+from wilmes._client import Connection
+from wilmes._html_parsing import HTML_PARSERS
+from wilmes._replay import ReplayConnection
+from wilmes.tests.fake_wilma import FakeWilmaData, FakeWilmaServer
+
+
+def run(
+        archive_path: Optional[str] = None,
+        origin: Optional[str] = None,
+        max_workers: int = 1,
+) -> List[Dict[str, object]]:
+    if archive_path and origin:
+        with ResponseArchive(archive_path) as archive:
+            return bench_replay(archive, origin, max_workers)
+    with tempfile.TemporaryDirectory() as directory, \
+            ResponseArchive(directory) as archive:
+        data = FakeWilmaData(pupils=2, messages=200, replies=3, news=100)
+        with FakeWilmaServer(data) as server:
+            with Connection.open(
+                    server.url, 'user', 'pass', max_workers=4,
+                    archive=archive) as connection:
+                for pupil_id in connection.pupils:
+                    connection.fetch_messages(
+                        connection.fetch_message_list(pupil_id))
+                    connection.fetch_news_items(
+                        connection.fetch_news_list(pupil_id))
+            return bench_replay(archive, server.url, max_workers)
+
+
+def bench_replay(
+        archive: ResponseArchive,
+        origin: str,
+        max_workers: int,
+) -> List[Dict[str, object]]:
+    results: List[Dict[str, object]] = []
+    for (parser_name, html_parser) in HTML_PARSERS.items():
+        start = time.perf_counter()
+        message_count = news_item_count = 0
+        with ReplayConnection(
+                archive, origin, max_workers=max_workers,
+                html_parser=html_parser) as connection:
+            for pupil_id in connection.pupils:
+                message_count += sum(
+                    1 for _ in connection.iter_messages(pupil_id))
+                news_item_count += sum(
+                    1 for _ in connection.iter_news(pupil_id))
+        seconds = time.perf_counter() - start
+        results.append({
+            'benchmark': 'replay',
+            'html_parser': parser_name,
+            'max_workers': max_workers,
+            'messages': message_count,
+            'news_items': news_item_count,
+            'seconds': seconds,
+            'items_per_second': (message_count + news_item_count) / seconds,
+        })
+    return results
+
+
+def main(argv: List[str] = sys.argv) -> None:
+    parser = argparse.ArgumentParser(prog=argv[0])
+    parser.add_argument(
+        '--archive',
+        help="Directory of the response archive to re-parse")
+    parser.add_argument(
+        '--origin',
+        help="URL of the site whose pages to re-parse from the archive")
+    parser.add_argument(
+        '--jobs', '-j', type=int, default=1,
+        help="Number of pages to parse in parallel")
+    args = parser.parse_args(argv[1:])
+    json.dump(run(args.archive, args.origin, args.jobs), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
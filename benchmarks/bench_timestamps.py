@@ -0,0 +1,59 @@
+"""
+Compare the timestamp parser to the generic dateutil based one.
+
+Run with: python -m benchmarks.bench_timestamps
+"""
+import json
+import sys
+import timeit
+from typing import Callable, Dict, List
+
+from wilmes._timestamps import (
+    _parse_known_timestamp,
+    parse_timestamp,
+    parse_timestamp_with_dateutil,
+)
+
+SAMPLES = {
+    'iso': [f'2024-{m:02d}-{d:02d} 12:{d:02d}'
+            for m in range(1, 13) for d in range(1, 29)],
+    'finnish': [f'{d}.{m}.2024 {d % 24}:30'
+                for m in range(1, 13) for d in range(1, 29)],
+    'yearless': [f'{d}.{m}.' for m in range(1, 13) for d in range(1, 29)],
+    'special': ['Today', 'Yesterday'],
+}
+
+
+def run(number: int = 20) -> List[Dict[str, object]]:
+    results: List[Dict[str, object]] = []
+    implementations: Dict[str, Callable[[str], object]] = {
+        'dateutil': parse_timestamp_with_dateutil,
+        'fast': parse_timestamp,
+        'fast_uncached': _parse_uncached,
+    }
+    for (sample_name, strings) in SAMPLES.items():
+        for (impl_name, func) in implementations.items():
+            _parse_known_timestamp.cache_clear()
+            seconds = timeit.timeit(
+                lambda: [func(x) for x in strings], number=number)
+            results.append({
+                'benchmark': 'parse_timestamp',
+                'sample': sample_name,
+                'implementation': impl_name,
+                'us_per_call': seconds / (number * len(strings)) * 1e6,
+            })
+    return results
+
+
+def _parse_uncached(string: str) -> object:
+    _parse_known_timestamp.cache_clear()
+    return parse_timestamp(string)
+
+
+def main() -> None:
+    json.dump(run(), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 from typing import Any, Optional, Protocol, Sequence, TypeVar, Union
 
-from .element import Tag
+from .element import SoupStrainer, Tag
 
 _Str_T = TypeVar('_Str_T', str, bytes, covariant=True)
 
@@ -17,14 +17,21 @@ class BeautifulSoup(Tag):
             self,
             markup: Union[_Str, _Readable[Any]] = ...,
             features: Optional[Union[str, Sequence[str]]] = ...,
+            builder: None = ...,
+            parse_only: Optional[SoupStrainer] = ...,
+            from_encoding: Optional[str] = ...,
             #
             # The following parameters are unused in this code base
             # and therefore left undefined here:
             #
-            # builder: Optional[...] = ...,
-            # parse_only: Optional[...] = ...,
-            # from_encoding: Optional[...] = ...,
             # exclude_encodings: Optional[...] = ...,
             # element_classes: Optional[...] = ...,
             # **kwargs: object,
     ) -> None: ...
+
+    def new_tag(
+            self,
+            name: str,
+            # namespace=None, nsprefix=None, attrs={}, sourceline=None,
+            # sourcepos=None, **kwattrs,
+    ) -> Tag: ...
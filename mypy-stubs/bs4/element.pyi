@@ -1,4 +1,6 @@
 from typing import (
+    Any,
+    Callable,
     Iterable,
     Iterator,
     List,
@@ -15,7 +17,11 @@ _MatchAgainst = Union[str, bool]  # incomplete (e.g. Callable, Iterable, ...)
 
 
 class SoupStrainer:
-    ...
+    def __init__(
+            self,
+            name: Optional[Union[_MatchAgainst, Callable[..., Any]]] = ...,
+            # attrs={}, string=None, **kwargs,
+    ) -> None: ...
 
 
 class ResultSet(List[_T]):
@@ -27,11 +33,15 @@ class ResultSet(List[_T]):
 
 
 class PageElement:
-    ...
+    def extract(self, _self_index: Optional[int] = ...) -> 'PageElement': ...
 
 
 class Tag(PageElement):
     name: str
+    contents: List[PageElement]
+
+    @property
+    def descendants(self) -> Iterator[PageElement]: ...
 
     next_element: Optional[Tag]
     next_sibling: Optional[Tag]
@@ -47,6 +57,8 @@ class Tag(PageElement):
 
     def __setitem__(self, key: str, value: str) -> None: ...
 
+    def has_attr(self, key: str) -> bool: ...
+
     def get_text(
             self,
             separator: str = ...,
@@ -68,7 +80,7 @@ class Tag(PageElement):
 
     def find_all(
             self,
-            name: str = ...,
+            name: Union[str, Callable[['Tag'], bool]] = ...,
             attrs: Mapping[str, _MatchAgainst] = ...,
             recursive: bool = ...,
             text: Optional[str] = ...,
@@ -85,6 +97,13 @@ class Tag(PageElement):
             **kwargs: _MatchAgainst,
     ) -> Optional['Tag']: ...
 
+    def find_parent(
+            self,
+            name: Optional[str] = ...,
+            attrs: Mapping[str, _MatchAgainst] = ...,
+            **kwargs: _MatchAgainst,
+    ) -> Optional['Tag']: ...
+
     def find_previous(
             self,
             name: Optional[str] = ...,
@@ -106,6 +125,8 @@ class Tag(PageElement):
             # namespaces=None, **kwargs,
     ) -> Optional['Tag']: ...
 
+    def append(self, tag: Union[str, PageElement]) -> None: ...
+
     def replace_with(self, replace_with: Union[str, 'Tag']) -> 'Tag': ...
 
     def __iter__(self) -> Iterator['Tag']: ...
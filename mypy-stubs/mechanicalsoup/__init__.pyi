@@ -1 +1,3 @@
+from .browser import Browser as Browser
+from .form import Form as Form
 from .stateful_browser import StatefulBrowser as StatefulBrowser
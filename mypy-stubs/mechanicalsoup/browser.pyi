@@ -1,14 +1,17 @@
-from typing import Any, Mapping, Optional
+from typing import Any, Dict, Mapping, Optional
 
 import bs4
 import requests
 
+
 class _Response(requests.Response):
     @property
     def soup(self) -> Optional[bs4.BeautifulSoup]: ...
 
 
 class Browser:
+    session: requests.Session
+
     def __init__(
             self,
             # TODO: Replace Any with Session
@@ -42,4 +45,12 @@ class Browser:
             # *args, **kwargs,
     ) -> _Response: ...
 
+    @classmethod
+    def get_request_kwargs(
+            cls,
+            form: bs4.element.Tag,
+            url: Optional[str] = ...,
+            # **kwargs,
+    ) -> Dict[str, Any]: ...
+
     def get_cookiejar(self) -> requests.cookies.RequestsCookieJar: ...
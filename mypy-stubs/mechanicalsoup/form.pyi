@@ -1,2 +1,13 @@
+from typing import Optional, Union
+
+import bs4
+
+
 class Form:
-    ...
+    form: bs4.element.Tag
+
+    def __init__(self, form: bs4.element.Tag) -> None: ...
+
+    def __setitem__(self, name: str, value: str) -> None: ...
+
+    def choose_submit(self, submit: Optional[Union[str, bool]]) -> None: ...
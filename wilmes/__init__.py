@@ -1,28 +1,179 @@
-from ._client import Client, Connection
-from ._types import (
-    Message,
-    MessageId,
-    MessageInfo,
-    NewsItem,
-    NewsItemId,
-    NewsItemInfo,
-    Person,
-    Pupil,
-    PupilId,
-    ReplyMessage,
-)
+import importlib
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    from ._archive import ArchivedResponse, ResponseArchive
+    from ._async_client import AsyncConnection  # noqa: F401
+    from ._client import Client, Connection
+    from ._export import iter_export_items, write_csv, write_jsonl, write_mbox
+    from ._front_page import FrontPageStatus, check_front_page
+    from ._http_cache import HttpCache
+    from ._instrumentation import (
+        MetricsCollector,
+        Observer,
+        ParseEvent,
+        RequestEvent,
+    )
+    from ._multi import (
+        Account,
+        AccountMessage,
+        AccountResult,
+        MultiClient,
+        load_accounts,
+    )
+    from ._polling import PollSchedule
+    from ._replay import ReplayConnection
+    from ._search import SearchHit, SearchIndex
+    from ._server import NotFound, ResultCache, WilmesService, make_server
+    from ._session_store import SessionStore
+    from ._store import MessageStore, SyncResult
+    from ._transport import TransportConfig, TransportStats
+    from ._types import (
+        BodyText,
+        LazyMessage,
+        Message,
+        MessageId,
+        MessageInfo,
+        MessageUpdate,
+        NewsItem,
+        NewsItemId,
+        NewsItemInfo,
+        Person,
+        Pupil,
+        PupilId,
+        ReplyMessage,
+        render_text,
+    )
 
 __all__ = [
+    'Account',
+    'AccountMessage',
+    'AccountResult',
+    'ArchivedResponse',
+    'BodyText',
     'Client',
     'Connection',
+    'FrontPageStatus',
+    'HttpCache',
+    'LazyMessage',
     'Message',
     'MessageId',
     'MessageInfo',
+    'MessageStore',
+    'MessageUpdate',
+    'MetricsCollector',
+    'MultiClient',
     'NewsItem',
     'NewsItemId',
     'NewsItemInfo',
+    'NotFound',
+    'Observer',
+    'ParseEvent',
     'Person',
+    'PollSchedule',
     'Pupil',
     'PupilId',
+    'ReplayConnection',
     'ReplyMessage',
+    'RequestEvent',
+    'ResponseArchive',
+    'ResultCache',
+    'SearchHit',
+    'SearchIndex',
+    'SessionStore',
+    'SyncResult',
+    'TransportConfig',
+    'TransportStats',
+    'WilmesService',
+    'check_front_page',
+    'iter_export_items',
+    'load_accounts',
+    'make_server',
+    'render_text',
+    'write_csv',
+    'write_jsonl',
+    'write_mbox',
 ]
+
+# Modules of the exported names.  The modules are imported only when
+# the names are requested, since most of them need the HTTP and HTML
+# parsing libraries which are slow to import.  AsyncConnection is left
+# out of __all__, since it needs the optional aiohttp dependency.
+_MODULES: Dict[str, str] = {
+    'Account': '_multi',
+    'AccountMessage': '_multi',
+    'AccountResult': '_multi',
+    'ArchivedResponse': '_archive',
+    'BodyText': '_types',
+    'AsyncConnection': '_async_client',
+    'Client': '_client',
+    'Connection': '_client',
+    'FrontPageStatus': '_front_page',
+    'HttpCache': '_http_cache',
+    'LazyMessage': '_types',
+    'Message': '_types',
+    'MessageId': '_types',
+    'MessageInfo': '_types',
+    'MessageStore': '_store',
+    'MessageUpdate': '_types',
+    'MetricsCollector': '_instrumentation',
+    'MultiClient': '_multi',
+    'NewsItem': '_types',
+    'NewsItemId': '_types',
+    'NewsItemInfo': '_types',
+    'NotFound': '_server',
+    'Observer': '_instrumentation',
+    'ParseEvent': '_instrumentation',
+    'Person': '_types',
+    'PollSchedule': '_polling',
+    'Pupil': '_types',
+    'PupilId': '_types',
+    'ReplayConnection': '_replay',
+    'ReplyMessage': '_types',
+    'RequestEvent': '_instrumentation',
+    'ResponseArchive': '_archive',
+    'ResultCache': '_server',
+    'SearchHit': '_search',
+    'SearchIndex': '_search',
+    'SessionStore': '_session_store',
+    'SyncResult': '_store',
+    'TransportConfig': '_transport',
+    'TransportStats': '_transport',
+    'WilmesService': '_server',
+    'check_front_page': '_front_page',
+    'iter_export_items': '_export',
+    'load_accounts': '_multi',
+    'make_server': '_server',
+    'render_text': '_types',
+    'write_csv': '_export',
+    'write_jsonl': '_export',
+    'write_mbox': '_export',
+}
+
+
+# Module -> (optional dependency, extra installing it)
+_OPTIONAL_DEPENDENCIES: Dict[str, Tuple[str, str]] = {
+    '_async_client': ('aiohttp', 'async'),
+}
+
+
+def __getattr__(name: str) -> object:
+    module_name = _MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    try:
+        module = importlib.import_module(f'.{module_name}', __name__)
+    except ModuleNotFoundError as error:
+        (dependency, extra) = _OPTIONAL_DEPENDENCIES.get(module_name, ('', ''))
+        if not dependency or error.name != dependency:
+            raise
+        raise ImportError(
+            f'{name} needs {dependency}, install it with'
+            f' "pip install wilmes[{extra}]"') from error
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_MODULES))
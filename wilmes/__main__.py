@@ -1,15 +1,64 @@
 import argparse
 import getpass
+import json
 import sys
-from typing import Sequence
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Sequence, Tuple
 
-from ._client import Client
+from ._front_page import check_front_page
+from ._session_store import SessionStore
+
+# The other modules need the HTTP and HTML parsing libraries, which
+# are slow to import, so they are imported by the functions using
+# them.  This keeps e.g. the check-only runs fast.
+if TYPE_CHECKING:
+    from ._client import Client
+    from ._http_cache import HttpCache
+    from ._instrumentation import MetricsCollector, Observer
+    from ._search import SearchHit
+    from ._server import WilmesService
 
 
 def main(argv: Sequence[str] = sys.argv) -> None:
+    command = COMMANDS.get(argv[1]) if len(argv) > 1 else None
+    if command:
+        command([f'{argv[0]} {argv[1]}'] + list(argv[2:]))
+        return
     args = parse_args(argv)
-    client = get_client(args)
-    with client.connect() as connection:
+    if args.check_only and not args.metrics and not args.archive:
+        check_only(args)
+        return
+    from ._instrumentation import MetricsCollector
+
+    metrics = MetricsCollector() if args.metrics else None
+    client = get_client(args, observer=metrics)
+    try:
+        run(client, args)
+    finally:
+        if metrics:
+            write_metrics(metrics, args.metrics, args.metrics_format)
+
+
+def check_only(args: argparse.Namespace) -> None:
+    """
+    Print the new message counts of the pupils.
+
+    This uses the front page check, which needs only the standard
+    library.
+    """
+    (username, password) = ask_credentials(args)
+    session_store = (
+        SessionStore(args.session_file) if args.session_file else None)
+    status = check_front_page(
+        args.url, username, password, session_store=session_store)
+    for pupil in status.pupils.values():
+        count = status.new_message_counts.get(pupil.id, 0)
+        print(f'{pupil.name}: {count}')
+
+
+def run(client: 'Client', args: argparse.Namespace) -> None:
+    with client.connect(reuse_session=bool(args.session_file)) as connection:
         if args.check_only:
             for pupil in connection.pupils.values():
                 count = connection.new_message_counts.get(pupil.id, 0)
@@ -23,19 +72,41 @@ def main(argv: Sequence[str] = sys.argv) -> None:
                 for message_info in message_infos:
                     print(message_info)
         else:
-            new_messages = connection.get_new_messages()
-            for (n, pupil) in enumerate(new_messages.keys()):
+            for pupil_id in connection.new_message_counts:
+                pupil = connection.pupils[pupil_id]
                 print(f'Pupil: {pupil.name}')
-                print('')
-                for message in new_messages[pupil]:
+                print('', flush=True)
+                messages = connection.iter_messages(
+                    pupil_id, unread_only=True)
+                for message in messages:
                     print(message)
-                    print('')
+                    print('', flush=True)
 
 
 def parse_args(argv: Sequence[str]) -> argparse.Namespace:
     parser = argparse.ArgumentParser(prog=argv[0])
+    add_connection_arguments(parser)
+    parser.add_argument(
+        '--check-only', '-c', action='store_true',
+        help="Only check if there is new messages available")
     parser.add_argument(
-        '--url', '-U', required=True,
+        '--list', '-l', action='store_true',
+        help="List message headers")
+    parser.add_argument(
+        '--metrics', metavar='FILE',
+        help="Write timings of the requests and parsing to a file")
+    parser.add_argument(
+        '--metrics-format', choices=['json', 'prometheus'], default='json',
+        help="Format of the metrics file")
+    return parser.parse_args(argv[1:])
+
+
+def add_connection_arguments(
+        parser: argparse.ArgumentParser,
+        required: bool = True,
+) -> None:
+    parser.add_argument(
+        '--url', '-U', required=required,
         help="Base URL for the connection")
     parser.add_argument(
         '--username', '-u', required=False,
@@ -44,18 +115,324 @@ def parse_args(argv: Sequence[str]) -> argparse.Namespace:
     #     '--password', '-p', type=str,
     #     help="Password for the login")
     parser.add_argument(
-        '--check-only', '-c', action='store_true',
-        help="Only check if there is new messages available")
+        '--session-file', '-s',
+        help="File for keeping the login session between runs")
     parser.add_argument(
-        '--list', '-l', action='store_true',
-        help="List message headers")
-    return parser.parse_args(argv[1:])
+        '--jobs', '-j', type=int, default=1,
+        help="Number of messages to fetch in parallel")
+    parser.add_argument(
+        '--archive', metavar='DIR',
+        help="Directory for archiving the fetched pages")
 
 
-def get_client(args: argparse.Namespace) -> Client:
+def ask_credentials(args: argparse.Namespace) -> Tuple[str, str]:
     username = (args.username or input('Username: '))
     password = getpass.getpass()
-    return Client(args.url, username, password)
+    return (username, password)
+
+
+def get_client(
+        args: argparse.Namespace,
+        observer: Optional['Observer'] = None,
+        http_cache: Optional['HttpCache'] = None,
+) -> 'Client':
+    from ._archive import ResponseArchive
+    from ._client import Client
+
+    (username, password) = ask_credentials(args)
+    session_store = (
+        SessionStore(args.session_file) if args.session_file else None)
+    archive = ResponseArchive(args.archive) if args.archive else None
+    return Client(
+        args.url, username, password,
+        max_workers=args.jobs, session_store=session_store,
+        observer=observer, http_cache=http_cache, archive=archive)
+
+
+def write_metrics(
+        metrics: 'MetricsCollector',
+        path: str,
+        metrics_format: str,
+) -> None:
+    with open(path, 'w') as fp:
+        if metrics_format == 'prometheus':
+            fp.write(metrics.to_prometheus())
+        else:
+            json.dump(metrics.to_dict(), fp, indent=2)
+            fp.write('\n')
+
+
+def multi_main(argv: Sequence[str]) -> None:
+    from ._multi import AccountMessage, MultiClient, load_accounts
+
+    args = parse_multi_args(argv)
+    accounts = load_accounts(args.config, get_password=ask_password)
+    multi_client = MultiClient(
+        accounts,
+        max_workers=args.workers,
+        max_per_origin=args.per_origin,
+        jobs_per_account=args.jobs)
+    failed = False
+    for event in multi_client.iter_new_messages():
+        if isinstance(event, AccountMessage):
+            print(f'Account: {event.account}')
+            print(f'Pupil: {event.pupil.name}')
+            print('')
+            print(event.message)
+            print('', flush=True)
+        elif event.ok:
+            print(
+                f'{event.account}: {event.message_count} new messages '
+                f'(login {event.login_seconds:.2f} s, '
+                f'total {event.total_seconds:.2f} s)', file=sys.stderr)
+        else:
+            failed = True
+            print(
+                f'{event.account}: Failed after '
+                f'{event.total_seconds:.2f} s: {event.error}',
+                file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+def parse_multi_args(argv: Sequence[str]) -> argparse.Namespace:
+    from ._multi import DEFAULT_MAX_PER_ORIGIN, DEFAULT_MAX_WORKERS
+
+    parser = argparse.ArgumentParser(
+        prog=argv[0],
+        description="Fetch new messages of several accounts")
+    parser.add_argument(
+        '--config', required=True,
+        help="TOML file listing the accounts")
+    parser.add_argument(
+        '--workers', '-w', type=int, default=DEFAULT_MAX_WORKERS,
+        help="Number of accounts to poll in parallel")
+    parser.add_argument(
+        '--per-origin', type=int, default=DEFAULT_MAX_PER_ORIGIN,
+        help="Number of accounts to poll in parallel from the same site")
+    parser.add_argument(
+        '--jobs', '-j', type=int, default=1,
+        help="Number of messages to fetch in parallel per account")
+    return parser.parse_args(argv[1:])
+
+
+def watch_main(argv: Sequence[str]) -> None:
+    from ._http_cache import HttpCache
+    from ._polling import PollSchedule
+
+    args = parse_watch_args(argv)
+    schedule = PollSchedule(
+        args.min_interval, args.max_interval,
+        night_interval=(args.night_interval or None))
+    client = get_client(args, http_cache=HttpCache())
+    with client.connect(reuse_session=bool(args.session_file)) as connection:
+        try:
+            for (pupil, message) in connection.watch(schedule):
+                print(f'Pupil: {pupil.name}')
+                print('')
+                print(message)
+                print('', flush=True)
+        except KeyboardInterrupt:
+            pass
+
+
+def parse_watch_args(argv: Sequence[str]) -> argparse.Namespace:
+    from ._polling import (
+        DEFAULT_MAX_INTERVAL,
+        DEFAULT_MIN_INTERVAL,
+        DEFAULT_NIGHT_INTERVAL,
+    )
+
+    parser = argparse.ArgumentParser(
+        prog=argv[0],
+        description="Print new messages as they arrive")
+    add_connection_arguments(parser)
+    parser.add_argument(
+        '--min-interval', type=float, default=DEFAULT_MIN_INTERVAL,
+        help="Seconds between the polls after a new message")
+    parser.add_argument(
+        '--max-interval', type=float, default=DEFAULT_MAX_INTERVAL,
+        help="Maximum seconds between the polls")
+    parser.add_argument(
+        '--night-interval', type=float, default=DEFAULT_NIGHT_INTERVAL,
+        help="Seconds between the polls at night, 0 to poll as by day")
+    return parser.parse_args(argv[1:])
+
+
+def export_main(argv: Sequence[str]) -> None:
+    from ._export import EXPORT_FORMATS, iter_export_items
+
+    args = parse_export_args(argv)
+    writer = EXPORT_FORMATS[args.format]
+    client = get_client(args)
+    with client.connect(reuse_session=bool(args.session_file)) as connection:
+        items = iter_export_items(
+            connection, since=args.since, news=not args.no_news)
+        if args.output == '-':
+            count = writer(items, sys.stdout)
+        else:
+            with open(args.output, 'w', encoding='utf-8', newline='') as fp:
+                count = writer(items, fp)
+    print(f'Exported {count} items', file=sys.stderr)
+
+
+def parse_export_args(argv: Sequence[str]) -> argparse.Namespace:
+    from ._export import EXPORT_FORMATS
+
+    parser = argparse.ArgumentParser(
+        prog=argv[0],
+        description="Export all messages and news items")
+    add_connection_arguments(parser)
+    parser.add_argument(
+        '--format', '-f', choices=list(EXPORT_FORMATS), default='jsonl',
+        help="Format of the exported file")
+    parser.add_argument(
+        '--output', '-o', default='-',
+        help="File to export to, or - for the standard output")
+    parser.add_argument(
+        '--since', type=parse_date,
+        help="Export only items from this date (YYYY-MM-DD) onwards")
+    parser.add_argument(
+        '--no-news', action='store_true',
+        help="Export only the messages")
+    return parser.parse_args(argv[1:])
+
+
+def search_main(argv: Sequence[str]) -> None:
+    from ._http_cache import HttpCache
+    from ._store import MessageStore
+
+    args = parse_search_args(argv)
+    with MessageStore(args.store) as store:
+        if args.sync:
+            client = get_client(args, http_cache=HttpCache())
+            reuse_session = bool(args.session_file)
+            with client.connect(reuse_session=reuse_session) as connection:
+                result = connection.sync(store)
+            print(
+                f'Synced {len(result.messages)} messages and '
+                f'{len(result.news_items)} news items', file=sys.stderr)
+        hits = store.search(' '.join(args.words), limit=args.limit)
+    for hit in hits:
+        print(format_search_hit(hit))
+        print(f'    {hit.snippet}', flush=True)
+
+
+def parse_search_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog=argv[0],
+        description="Search the messages and news items of a local store")
+    add_connection_arguments(parser, required=False)
+    parser.add_argument(
+        '--store', required=True,
+        help="SQLite file of the message store")
+    parser.add_argument(
+        '--sync', action='store_true',
+        help="Download new messages and news items to the store first")
+    parser.add_argument(
+        '--limit', '-n', type=int, default=20,
+        help="Maximum number of results")
+    parser.add_argument(
+        'words', nargs='+',
+        help="Words to search for, matched as prefixes")
+    args = parser.parse_args(argv[1:])
+    if args.sync and not args.url:
+        parser.error('--sync needs --url')
+    return args
+
+
+def format_search_hit(hit: 'SearchHit') -> str:
+    timestamp = (hit.timestamp or '')[:16].replace('T', ' ')
+    if hit.kind == 'news_item':
+        what = f'News item {hit.item_id}'
+    elif hit.kind == 'reply':
+        what = f'Message {hit.item_id}, reply {hit.reply_number}'
+    else:
+        what = f'Message {hit.item_id}'
+    return f'{timestamp} {what} (pupil {hit.pupil_id}): {hit.subject}'
+
+
+def serve_main(argv: Sequence[str]) -> None:
+    from ._http_cache import HttpCache
+    from ._server import WilmesService, make_server
+
+    args = parse_serve_args(argv)
+    client = get_client(args, http_cache=HttpCache())
+    with WilmesService(client, ttl=args.ttl) as service:
+        service.connect()
+        server = make_server(service, args.host, args.port)
+        stop = threading.Event()
+        if args.keepalive:
+            threading.Thread(
+                target=keep_alive, args=(service, args.keepalive, stop),
+                daemon=True).start()
+        (host, port) = server.server_address[:2]
+        print(f'Serving on http://{host!s}:{port}', file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+            server.server_close()
+
+
+def keep_alive(
+        service: 'WilmesService',
+        interval: float,
+        stop: threading.Event,
+) -> None:
+    while not stop.wait(interval):
+        try:
+            service.keep_alive()
+        except Exception as error:
+            print(f'Keep-alive failed: {error}', file=sys.stderr)
+
+
+def parse_serve_args(argv: Sequence[str]) -> argparse.Namespace:
+    from ._server import (
+        DEFAULT_HOST,
+        DEFAULT_KEEPALIVE_INTERVAL,
+        DEFAULT_PORT,
+        DEFAULT_TTL,
+    )
+
+    parser = argparse.ArgumentParser(
+        prog=argv[0],
+        description="Serve the messages and news items as JSON over HTTP")
+    add_connection_arguments(parser)
+    parser.add_argument(
+        '--host', default=DEFAULT_HOST,
+        help="Address to listen on")
+    parser.add_argument(
+        '--port', '-p', type=int, default=DEFAULT_PORT,
+        help="Port to listen on")
+    parser.add_argument(
+        '--ttl', type=float, default=DEFAULT_TTL,
+        help="Seconds to serve the fetched results from memory")
+    parser.add_argument(
+        '--keepalive', type=float, default=DEFAULT_KEEPALIVE_INTERVAL,
+        help="Seconds between refreshes of the session, 0 to disable")
+    return parser.parse_args(argv[1:])
+
+
+def parse_date(string: str) -> datetime:
+    from ._settings import TZ
+
+    return TZ.localize(datetime.strptime(string, '%Y-%m-%d'))
+
+
+def ask_password(account_name: str) -> str:
+    return getpass.getpass(f'Password for {account_name}: ')
+
+
+COMMANDS: Dict[str, Callable[[Sequence[str]], None]] = {
+    'export': export_main,
+    'multi': multi_main,
+    'search': search_main,
+    'serve': serve_main,
+    'watch': watch_main,
+}
 
 
 if __name__ == '__main__':
@@ -0,0 +1,153 @@
+"""
+Archive of the raw responses fetched from the site.
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from types import TracebackType
+from typing import Iterator, Optional, Tuple, Type
+
+from ._serialization import datetime_from_str, datetime_to_str
+
+INDEX_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    origin TEXT NOT NULL,
+    url TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    PRIMARY KEY (origin, url)
+);
+'''
+
+COMPRESSION_LEVEL = 6
+
+
+@dataclass
+class ArchivedResponse:
+    origin: str
+    url: str  # Relative to the origin, e.g. "/!123/news"
+    content: bytes
+    content_type: str
+    fetched_at: datetime
+
+
+class ResponseArchive:
+    """
+    Content-addressed on-disk archive of the fetched pages.
+
+    The contents of the responses are stored compressed, once per
+    distinct content, to files named by the SHA-256 hash of the
+    content.  An SQLite index in the same directory maps each
+    (origin, relative URL) pair to the content of its latest
+    response.
+
+    The archive can be shared by the worker threads of a connection.
+    Use `ReplayConnection` to parse the archived pages again.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(os.path.join(path, 'objects'), exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(path, 'index.sqlite'), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.executescript(INDEX_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> 'ResponseArchive':
+        return self
+
+    def __exit__(
+            self,
+            exc_type: Optional[Type[BaseException]],
+            exc_value: Optional[BaseException],
+            traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def save(
+            self,
+            origin: str,
+            url: str,
+            content: bytes,
+            content_type: str,
+            fetched_at: Optional[datetime] = None,
+    ) -> str:
+        """
+        Save the content of a response to a URL relative to the origin.
+
+        Return the hash of the content.
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        object_path = self._get_object_path(content_hash)
+        if not os.path.exists(object_path):
+            self._write_object(object_path, content)
+        timestamp = fetched_at or datetime.now(timezone.utc)
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses'
+                ' (origin, url, content_hash, content_type, fetched_at)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (origin, url, content_hash, content_type,
+                 datetime_to_str(timestamp)))
+        return content_hash
+
+    def load(self, origin: str, url: str) -> Optional[ArchivedResponse]:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT content_hash, content_type, fetched_at'
+                ' FROM responses WHERE origin = ? AND url = ?',
+                (origin, url)).fetchone()
+        if not row:
+            return None
+        (content_hash, content_type, fetched_at) = row
+        with open(self._get_object_path(content_hash), 'rb') as fp:
+            content = zlib.decompress(fp.read())
+        return ArchivedResponse(
+            origin=origin,
+            url=url,
+            content=content,
+            content_type=content_type,
+            fetched_at=datetime_from_str(fetched_at))
+
+    def iter_urls(
+            self,
+            origin: Optional[str] = None,
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        Iterate the archived (origin, relative URL) pairs.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT origin, url FROM responses'
+                + (' WHERE origin = ?' if origin is not None else '')
+                + ' ORDER BY origin, url',
+                (origin,) if origin is not None else ()).fetchall()
+        return iter(rows)
+
+    def _get_object_path(self, content_hash: str) -> str:
+        return os.path.join(
+            self.path, 'objects', content_hash[:2], content_hash[2:] + '.z')
+
+    def _write_object(self, object_path: str, content: bytes) -> None:
+        directory = os.path.dirname(object_path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first, so that a concurrent writer
+        # of the same content or a crash never leaves a partial file
+        (fd, temp_path) = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(zlib.compress(content, COMPRESSION_LEVEL))
+            os.replace(temp_path, object_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
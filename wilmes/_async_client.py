@@ -0,0 +1,321 @@
+import asyncio
+import json
+import time
+from types import TracebackType
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Type
+
+import aiohttp
+import bs4
+import mechanicalsoup
+from bs4.element import Tag
+
+from ._client import (
+    JSON_REQUEST_HEADERS,
+    MESSAGE_LIST_PATH,
+    MESSAGE_PAGE_REGIONS,
+    MESSAGE_PATH,
+    NEWS_ITEM_PAGE_REGIONS,
+    NEWS_ITEM_PATH,
+    NEWS_LIST_PAGE_REGIONS,
+    NEWS_LIST_PATH,
+    _ConnectionBase,
+    _MessageParts,
+)
+from ._front_page import (
+    LOGIN_FORM_SELECTOR,
+    LOGIN_PAGE_PATH,
+    LOGOUT_PATH,
+    SESSION_COOKIE,
+    TOKEN_PATH,
+    check_login_result,
+    get_login_fields,
+)
+from ._html_parsing import DEFAULT_HTML_PARSER, FULL_HTML_PARSER, HtmlParser
+from ._instrumentation import Observer, RequestEvent, observe_parse
+from ._transport import TransportConfig, TransportStats
+from ._types import (
+    Message,
+    MessageId,
+    MessageInfo,
+    NewsItem,
+    NewsItemId,
+    NewsItemInfo,
+    Pupil,
+    PupilId,
+)
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+class AsyncConnection(_ConnectionBase):
+    """
+    Connection to the site using asyncio.
+
+    Works like `Connection`, but the fetching methods are coroutines
+    and `get_new_messages` fetches the messages of all pupils
+    concurrently.  The number of simultaneous requests is limited by
+    `max_concurrency`.
+    """
+    @classmethod
+    async def open(
+            cls,
+            url: str,
+            username: str,
+            password: str,
+            *,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+            html_parser: HtmlParser = DEFAULT_HTML_PARSER,
+            observer: Optional[Observer] = None,
+            transport: Optional[TransportConfig] = None,
+    ) -> 'AsyncConnection':
+        """
+        Log in to the site.
+
+        The transport configures the connection pool, timeouts and
+        compression of the HTTP requests and the retries of the page
+        fetches, see `TransportConfig`.
+        """
+        transport = transport or TransportConfig()
+        session = aiohttp.ClientSession(
+            # Allow cookies from IP address hosts too, like a browser does
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            connector=aiohttp.TCPConnector(
+                limit=transport.get_pool_size(max_concurrency)),
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=transport.connect_timeout,
+                sock_read=transport.read_timeout),
+            headers={'Accept-Encoding': transport.accept_encoding})
+        try:
+            async with session.get(f'{url}{TOKEN_PATH}') as response:
+                response.raise_for_status()
+            login_page_url = f'{url}{LOGIN_PAGE_PATH}'
+            async with session.get(login_page_url) as response:
+                response.raise_for_status()
+                login_page = FULL_HTML_PARSER.parse(
+                    await response.read(), response.charset)
+            session_id = _get_cookie(session, SESSION_COOKIE)
+            request_kwargs = _get_login_request_kwargs(
+                login_page, login_page_url,
+                get_login_fields(username, password, session_id))
+            async with session.request(
+                    request_kwargs['method'],
+                    request_kwargs['url'],
+                    data=request_kwargs['data'],
+            ) as response:
+                response.raise_for_status()
+                check_login_result(str(response.url))
+                front_page = FULL_HTML_PARSER.parse(
+                    await response.read(), response.charset)
+        except BaseException:
+            await session.close()
+            raise
+        return cls(
+            url, session, front_page,
+            max_concurrency=max_concurrency, html_parser=html_parser,
+            observer=observer, transport=transport)
+
+    async def close(self) -> None:
+        try:
+            await self.logout()
+        finally:
+            await self.session.close()
+
+    async def __aenter__(self) -> 'AsyncConnection':
+        return self
+
+    async def __aexit__(
+            self,
+            exc_type: Optional[Type[BaseException]],
+            exc_value: Optional[BaseException],
+            traceback: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    def __init__(
+            self,
+            url: str,
+            session: aiohttp.ClientSession,
+            front_page: bs4.BeautifulSoup,
+            *,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+            html_parser: HtmlParser = DEFAULT_HTML_PARSER,
+            observer: Optional[Observer] = None,
+            transport: Optional[TransportConfig] = None,
+    ) -> None:
+        super().__init__(url, html_parser, observer)
+        self.session = session
+        self.transport = transport or TransportConfig()
+        self.transport_stats = TransportStats()
+        self.front_page = front_page
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        with observe_parse(self.observer, 'front_page'):
+            self._parse_front_page(self.front_page)
+
+    async def get_new_messages(self) -> Dict[Pupil, List[Message]]:
+        pupils = [self.pupils[x] for x in self.new_message_counts]
+        message_lists = await asyncio.gather(*(
+            self._fetch_unread_messages(pupil.id) for pupil in pupils))
+        return dict(zip(pupils, message_lists))
+
+    async def _fetch_unread_messages(
+            self,
+            pupil_id: PupilId,
+    ) -> List[Message]:
+        message_infos = await self.fetch_message_list(pupil_id)
+        unreads = (x for x in message_infos if x.is_unread)
+        return list(await asyncio.gather(*(
+            self.fetch_message(x) for x in unreads)))
+
+    async def fetch_message_list(
+            self,
+            pupil_id: PupilId,
+    ) -> List[MessageInfo]:
+        """
+        List messages of a pupil.
+        """
+        (content, _encoding) = await self._fetch(
+            MESSAGE_LIST_PATH.format(pupil_id=pupil_id), MESSAGE_LIST_PATH,
+            headers=JSON_REQUEST_HEADERS)
+        with observe_parse(self.observer, 'message_list'):
+            return self._parse_message_list(pupil_id, json.loads(content))
+
+    async def fetch_message(self, message_info: MessageInfo) -> Message:
+        self._check_origin(message_info)
+        body = await self._fetch_message_body(
+            message_info.pupil_id, message_info.id)
+        return self._parse_message(message_info, body)
+
+    async def _fetch_message_body(
+            self,
+            pupil_id: PupilId,
+            message_id: MessageId,
+    ) -> _MessageParts:
+        url = MESSAGE_PATH.format(pupil_id=pupil_id, message_id=message_id)
+        page = await self._browse(url, MESSAGE_PAGE_REGIONS, MESSAGE_PATH)
+        return self._get_message_body(page, url)
+
+    async def fetch_news_list(self, pupil_id: PupilId) -> List[NewsItemInfo]:
+        page = await self._browse(
+            NEWS_LIST_PATH.format(pupil_id=pupil_id), NEWS_LIST_PAGE_REGIONS,
+            NEWS_LIST_PATH)
+        with observe_parse(self.observer, 'news_list'):
+            return self._parse_news_list(pupil_id, page)
+
+    async def fetch_news_item(self, news_item_info: NewsItemInfo) -> NewsItem:
+        elem = await self._fetch_news_item_body(
+            news_item_info.pupil_id, news_item_info.id)
+        with observe_parse(self.observer, 'news_item'):
+            return self._parse_news_item(news_item_info, elem)
+
+    async def _fetch_news_item_body(
+            self,
+            pupil_id: PupilId,
+            news_item_id: NewsItemId,
+    ) -> Tag:
+        url = NEWS_ITEM_PATH.format(
+            pupil_id=pupil_id, news_item_id=news_item_id)
+        page = await self._browse(url, NEWS_ITEM_PAGE_REGIONS, NEWS_ITEM_PATH)
+        return self._get_news_item_body(page, url)
+
+    async def logout(self) -> None:
+        """
+        Log out of the site.
+        """
+        async with self.session.post(
+                f'{self.url}{LOGOUT_PATH}') as response:
+            response.raise_for_status()
+
+    async def _browse(
+            self,
+            relative_url: str,
+            regions: Optional[Sequence[str]] = None,
+            url_template: Optional[str] = None,
+    ) -> bs4.BeautifulSoup:
+        url_template = url_template or relative_url
+        (content, encoding) = await self._fetch(relative_url, url_template)
+        with observe_parse(self.observer, 'html', url_template):
+            return self.html_parser.parse(content, encoding, regions)
+
+    async def _fetch(
+            self,
+            relative_url: str,
+            url_template: str,
+            headers: Optional[Mapping[str, str]] = None,
+    ) -> Tuple[bytes, Optional[str]]:
+        """
+        Get the content and encoding of a page of the site.
+        """
+        url = self.url + relative_url
+        status: Optional[int] = None
+        content = b''
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                (status, content, charset) = await self._get(url, headers)
+                return (content, charset)
+            except aiohttp.ClientResponseError as error:
+                status = error.status
+                raise
+            finally:
+                if self.observer:
+                    self.observer.on_request(RequestEvent(
+                        url_template=url_template,
+                        url=url,
+                        method='GET',
+                        status=status,
+                        bytes=len(content),
+                        seconds=time.perf_counter() - start))
+
+    async def _get(
+            self,
+            url: str,
+            headers: Optional[Mapping[str, str]] = None,
+    ) -> Tuple[int, bytes, Optional[str]]:
+        """
+        Get the status, content and encoding of a URL.
+
+        Connection errors, timeouts and the retry statuses of the
+        transport are retried with backoff.
+        """
+        retry_number = 0
+        while True:
+            try:
+                async with self.session.get(url, headers=headers) as response:
+                    content = await response.read()
+                    if (response.status not in self.transport.retry_statuses
+                            or retry_number >= self.transport.retries):
+                        self.transport_stats.add(
+                            retries=retry_number,
+                            bytes_received=(
+                                response.content_length or len(content)),
+                            bytes_decoded=len(content))
+                        response.raise_for_status()
+                        return (response.status, content, response.charset)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if retry_number >= self.transport.retries:
+                    self.transport_stats.add(retries=retry_number, error=True)
+                    raise
+            retry_number += 1
+            await asyncio.sleep(self.transport.get_backoff(retry_number))
+
+
+def _get_cookie(session: aiohttp.ClientSession, name: str) -> Optional[str]:
+    for cookie in session.cookie_jar:
+        if cookie.key == name:
+            return cookie.value
+    return None
+
+
+def _get_login_request_kwargs(
+        login_page: bs4.BeautifulSoup,
+        login_page_url: str,
+        values: Mapping[str, str],
+) -> Dict[str, Any]:
+    form_elem = login_page.select_one(LOGIN_FORM_SELECTOR)
+    if not form_elem:
+        raise Exception('Cannot find the login form')
+    form = mechanicalsoup.Form(form_elem)
+    for (name, value) in values.items():
+        form[name] = value
+    form.choose_submit(None)
+    return mechanicalsoup.Browser.get_request_kwargs(form.form, login_page_url)
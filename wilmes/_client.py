@@ -1,32 +1,73 @@
 import re
+import sys
+import threading
+import time
 import urllib.parse
-from datetime import date, datetime, timedelta
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
 from types import TracebackType
 from typing import (
+    Any,
     Callable,
+    Deque,
     Dict,
     Iterable,
+    Iterator,
     List,
+    Mapping,
     Optional,
-    Protocol,
+    Sequence,
+    Set,
     Tuple,
     Type,
+    TypeVar,
+    Union,
 )
 
 import bs4
 import mechanicalsoup
 import requests
 from bs4.element import Tag
-from dateutil.parser import parse as parse_datetime
 
+from ._archive import ResponseArchive
 from ._bs_utils import stringify_contents
-from ._email_unmangling import unmangle_emails
-from ._emojis import replace_emoji_imgs
-from ._settings import TZ
+from ._dom_pipeline import DomPipeline, ElementHandler
+from ._email_unmangling import (
+    EMAIL_CLASS,
+    replace_email_link,
+    replace_email_text,
+)
+from ._emojis import replace_emoji_img
+from ._front_page import (
+    LOGIN_FORM_SELECTOR,
+    LOGIN_PAGE_PATH,
+    LOGOUT_PATH,
+    SESSION_COOKIE,
+    TOKEN_PATH,
+    Link,
+    check_language,
+    check_login_result,
+    get_login_fields,
+    parse_new_message_counts,
+    parse_pupils,
+)
+from ._html_parsing import DEFAULT_HTML_PARSER, HtmlParser
+from ._http_cache import HttpCache
+from ._instrumentation import Observer, observe_parse, observe_request
+from ._polling import PollSchedule
+from ._recipients import split_person_list
+from ._session_store import SessionStore
+from ._store import MessageStore, SyncResult
+from ._timestamps import parse_timestamp
+from ._transport import TransportAdapter, TransportConfig, TransportStats
 from ._types import (
+    LazyMessage,
     Message,
     MessageId,
     MessageInfo,
+    MessageUpdate,
     NewsItem,
     NewsItemId,
     NewsItemInfo,
@@ -36,21 +77,36 @@ from ._types import (
     ReplyMessage,
 )
 
-PUPIL_LINK_RX = re.compile(r'^/!(\d+)/?$')
-MESSAGE_NOTIFICATION_LINK_RX = re.compile(r'^/!(\d+)/messages$')
-PERSON_LIST_RX = re.compile(r'([^(,]+(\([^)]*\)[^(,]*)*)((, )|$)')
 PROFILE_HREF_RX = re.compile(r'.*/profiles/([^/]+)/(\d+)')
 NEWS_ITEM_LINK_RX = re.compile(r'/!(\d+)/news/(?P<news_id>\d+)$')
 REPLY_HEADER_RX = re.compile(
     r'(?P<from>.*)\xa0? replied [^0-9]*(?P<date>[0-9][0-9.:/ ]+)$')
-SPECIAL_DATES: Dict[str, Callable[[], date]] = {
-    'today': date.today,
-    'yesterday': lambda: date.today() - timedelta(days=1),
-}
-YEARLESS_DATE_RX = re.compile(
-    r'^((0?[1-9])|[1-2][0-9]|3[01])\.((0?[1-9])|(1[0-2]))\.$')
 
-ENGLISH_LANG_ID = 3
+MESSAGE_LIST_PATH = '/!{pupil_id}/messages/list'
+MESSAGE_PATH = '/!{pupil_id}/messages/{message_id}?recipients'
+NEWS_LIST_PATH = '/!{pupil_id}/news'
+NEWS_ITEM_PATH = '/!{pupil_id}/news/{news_item_id}'
+JSON_REQUEST_HEADERS = {'X-Requested-With': 'XMLHttpRequest'}
+
+# Number of the recently seen persons shared per connection
+PERSON_CACHE_SIZE = 1024
+
+# Regions of the pages needed by the parsing, see HtmlParser
+FRONT_PAGE_LINK_REGIONS = ('a', LOGIN_FORM_SELECTOR, '.name-container')
+MESSAGE_PAGE_REGIONS = (
+    'table', '#recipients-cell', '.ckeditor', '.m-replybox')
+NEWS_LIST_PAGE_REGIONS = ('a', 'h2', '.well')
+NEWS_ITEM_PAGE_REGIONS = ('.panel-body',)
+
+# Rewrites done to the message and news item contents
+CONTENT_REWRITES = DomPipeline([
+    ('img', replace_emoji_img),
+    ('a', replace_email_link),
+    ('.' + EMAIL_CLASS, replace_email_text),
+])
+
+_T = TypeVar('_T')
+_R = TypeVar('_R')
 
 SENDER_TYPES = {
     1: 'teachers',
@@ -61,140 +117,162 @@ SENDER_TYPES = {
 
 
 class Client:
-    def __init__(self, url: str, username: str, password: str) -> None:
+    def __init__(
+            self,
+            url: str,
+            username: str,
+            password: str,
+            *,
+            max_workers: int = 1,
+            session_store: Optional[SessionStore] = None,
+            html_parser: HtmlParser = DEFAULT_HTML_PARSER,
+            observer: Optional[Observer] = None,
+            http_cache: Optional[HttpCache] = None,
+            transport: Optional[TransportConfig] = None,
+            archive: Optional[ResponseArchive] = None,
+    ) -> None:
         self.url = url
         self.username = username
         self.password = password
+        self.max_workers = max_workers
+        self.session_store = session_store
+        self.html_parser = html_parser
+        self.observer = observer
+        self.http_cache = http_cache
+        self.transport = transport
+        self.archive = archive
 
-    def connect(self) -> 'Connection':
-        return Connection.open(self.url, self.username, self.password)
-
-
-class Connection:
-    @classmethod
-    def open(
-            cls,
-            url: str,
-            username: str,
-            password: str,
-    ) -> 'Connection':
+    def connect(self, reuse_session: bool = False) -> 'Connection':
         """
-        Log in to the site.
+        Connect to the site.
+
+        If reuse_session is true, try to continue the session saved
+        to the session store first and log in only if that fails.
+        The session is then kept alive when the connection is closed.
         """
-        browser = mechanicalsoup.StatefulBrowser(raise_on_404=True)
-        browser.open(f'{url}/token')
-        browser.open(f'{url}/?langid={ENGLISH_LANG_ID}')
-        browser.select_form('.login-form')
-        browser['Login'] = username
-        browser['Password'] = password
-        session_id = browser.get_cookiejar().get('Wilma2LoginID')
-        if session_id is None:
-            raise Exception('Cannot find Wilma2LoginID cookie for SESSIONID')
-        browser['SESSIONID'] = session_id
-        response = browser.submit_selected()
-        response.raise_for_status()
-        parsed_url = urllib.parse.urlparse(response.url)
-        query = urllib.parse.parse_qs(parsed_url.query, keep_blank_values=True)
-        if 'loginfailed' in query:
-            raise Exception('Login failed')
-        if parsed_url.query:
-            raise Exception('Unexpected result')
-        return cls(url, browser)
+        if not reuse_session:
+            return Connection.open(
+                self.url, self.username, self.password,
+                max_workers=self.max_workers, html_parser=self.html_parser,
+                observer=self.observer, http_cache=self.http_cache,
+                transport=self.transport, archive=self.archive)
+        if not self.session_store:
+            raise ValueError('Cannot reuse session without a session store')
+        connection = Connection.resume(
+            self.url, self.session_store,
+            max_workers=self.max_workers, html_parser=self.html_parser,
+            observer=self.observer, http_cache=self.http_cache,
+            transport=self.transport, archive=self.archive)
+        if connection:
+            return connection
+        return Connection.open(
+            self.url, self.username, self.password,
+            max_workers=self.max_workers, session_store=self.session_store,
+            html_parser=self.html_parser, observer=self.observer,
+            http_cache=self.http_cache, transport=self.transport,
+            archive=self.archive)
 
-    def close(self) -> None:
-        self.logout()
 
-    def __enter__(self) -> 'Connection':
-        return self
+class _MessageParts:
+    """
+    Elements of a message page needed for parsing it.
 
-    def __exit__(
-            self,
-            exc_type: Optional[Type[BaseException]],
-            exc_value: Optional[Exception],
-            traceback: Optional[TracebackType],
-    ) -> None:
-        self.close()
+    The elements are collected in the same pass over the page as the
+    content rewrites are done.
+    """
+    def __init__(self, body: Tag) -> None:
+        self.body = body
+        self.table_ths: List[Tag] = []
+        self.recipients_cell: Optional[Tag] = None
+        self.content: Optional[Tag] = None
+        self.reply_boxes: List[Tag] = []
+
+    def get_handlers(self) -> List[Tuple[str, ElementHandler]]:
+        return [
+            ('th', self._add_th),
+            ('#recipients-cell', self._set_recipients_cell),
+            ('.ckeditor.hidden', self._set_content),
+            ('.m-replybox', self.reply_boxes.append),
+        ]
+
+    def _add_th(self, th: Tag) -> None:
+        if th.find_parent('table'):
+            self.table_ths.append(th)
+
+    def _set_recipients_cell(self, element: Tag) -> None:
+        if not self.recipients_cell:
+            self.recipients_cell = element
+
+    def _set_content(self, element: Tag) -> None:
+        if not self.content:
+            self.content = element
+
+
+class _ConnectionBase:
+    """
+    Page parsing shared by the connection implementations.
+
+    The subclasses do the fetching and pass the fetched pages to the
+    ``_parse_*`` methods.
+    """
+    pupils: Dict[PupilId, Pupil]
+    new_message_counts: Dict[PupilId, int]
+    own_name: str
 
     def __init__(
             self,
             url: str,
-            browser: mechanicalsoup.StatefulBrowser,
+            html_parser: HtmlParser,
+            observer: Optional[Observer] = None,
     ) -> None:
-        self.url = url
-        self.browser = browser
-        self.front_page = self._get_current_page_or_fail()
-        links = self.front_page.find_all('a', href=True)
-        self._check_language(links)
-        self.pupils = self._parse_pupils(links)
-        self.new_message_counts = self._parse_new_message_counts(links)
-        own_name_span = self.front_page.select_one('.name-container .teacher')
-        if not own_name_span:
-            raise Exception('Cannot find the span containing your name')
-        self.own_name = own_name_span.text
-
-    def _check_language(self, links: Iterable[Tag]) -> None:
-        for a_elem in links:
-            if a_elem.get('href', '').endswith('passwd/settings'):
-                if a_elem.text == "Account settings":
-                    return
-                raise Exception(
-                    f"Invalid language: 'Account settings' is {a_elem.text!r}")
-        raise Exception("Cannot find element for checking language")
+        # The URL is stored as the origin of every fetched item, so
+        # share the same string between the connections
+        self.url = sys.intern(url)
+        self.html_parser = html_parser
+        self.observer = observer
+        self._persons = lru_cache(maxsize=PERSON_CACHE_SIZE)(Person)
 
-    def _parse_pupils(self, links: Iterable[Tag]) -> Dict[PupilId, Pupil]:
-        """
-        Get list of pupils.
+    def _get_person(
+            self,
+            name: str,
+            id: Optional[int] = None,
+            type: Optional[str] = None,
+    ) -> Person:
         """
-        pupil_map: Dict[PupilId, str] = {}
-        for link in links:
-            match = PUPIL_LINK_RX.match(link.get('href', ''))
-            if match:
-                pupil_id = PupilId(match.group(1))
-                if pupil_id not in pupil_map:
-                    pupil_map[pupil_id] = link.text
-        return {id: Pupil(id, name) for (id, name) in pupil_map.items()}
+        Get a Person with the given attributes.
 
-    def _parse_new_message_counts(
-            self,
-            links: Iterable[Tag],
-    ) -> Dict[PupilId, int]:
-        result: Dict[PupilId, int] = {}
-        for link in links:
-            match = MESSAGE_NOTIFICATION_LINK_RX.match(link.get('href', ''))
-            if match:
-                pupil_id = PupilId(match.group(1))
-                first_word = link.text.split()[0]
-                if first_word.isdigit():
-                    amount = int(first_word)
-                    result[pupil_id] = amount
-        return result
+        The instances of the recently seen persons are shared within
+        the connection, since the same senders and recipients occur in
+        most of the messages.  The number of the shared instances is
+        limited by PERSON_CACHE_SIZE, so that a long running
+        connection does not collect all the persons it has seen.
+        """
+        return self._persons(name, id, type)
 
-    def get_new_messages(self) -> Dict[Pupil, List[Message]]:
-        result: Dict[Pupil, List[Message]] = {}
-        for (pupil_id, count) in self.new_message_counts.items():
-            pupil = self.pupils[pupil_id]
-            message_infos = self.fetch_message_list(pupil_id)
-            unreads = (x for x in message_infos if x.is_unread)
-            result[pupil] = [self.fetch_message(x) for x in unreads]
-        return result
+    def _parse_front_page(self, front_page: bs4.BeautifulSoup) -> None:
+        links = _get_links(front_page)
+        check_language(links)
+        self.pupils = parse_pupils(links)
+        self.new_message_counts = parse_new_message_counts(links)
+        own_name_span = front_page.select_one('.name-container .teacher')
+        if not own_name_span:
+            raise Exception('Cannot find the span containing your name')
+        self.own_name = own_name_span.text
 
-    def fetch_message_list(self, pupil_id: PupilId) -> List[MessageInfo]:
-        """
-        List messages of a pupil.
-        """
-        response = self.browser.get(
-            self.browser.absolute_url(f'/!{pupil_id}/messages/list'),
-            headers={'X-Requested-With': 'XMLHttpRequest'})
-        response.raise_for_status()
+    def _parse_message_list(
+            self,
+            pupil_id: PupilId,
+            data: Dict[str, Any],
+    ) -> List[MessageInfo]:
         return [
             MessageInfo(
                 id=MessageId(x['Id']),
                 origin=self.url,
                 pupil_id=pupil_id,
                 subject=x['Subject'],
-                last_timestamp=_parse_timestamp(x['TimeStamp']),
-                folder=x['Folder'],
-                sender=Person(
+                last_timestamp=parse_timestamp(x['TimeStamp']),
+                folder=sys.intern(x['Folder']),
+                sender=self._get_person(
                     name=x['Sender'],
                     id=x['SenderId'],
                     type=SENDER_TYPES.get(x['SenderType']),
@@ -202,118 +280,192 @@ class Connection:
                 reply_count=x.get('Replies', 0),
                 is_unread=(x.get('Status', 0) == 1),
             )
-            for x in response.json()['Messages']
+            for x in data['Messages']
         ]
 
-    def fetch_message(self, message_info: MessageInfo) -> Message:
-        if message_info.origin != self.url:
+    def _check_origin(self, info: Union[MessageInfo, NewsItemInfo]) -> None:
+        if info.origin != self.url:
             raise ValueError(
                 f'Invalid message origin: '
-                f'{message_info.origin} (expected {self.url})')
-        body = self._fetch_message_body(message_info.pupil_id, message_info.id)
-        timestamp = self._parse_sent_time(body)
-        recipients = self._parse_recipients(body)
-        message_content = self._parse_message_content(body)
-        replies = self._parse_replies(body)
+                f'{info.origin} (expected {self.url})')
+
+    def _parse_message(
+            self,
+            message_info: MessageInfo,
+            parts: _MessageParts,
+    ) -> Message:
+        with observe_parse(self.observer, 'sent_time'):
+            timestamp = self._parse_sent_time(parts)
+        with observe_parse(self.observer, 'recipients'):
+            recipients = self._parse_recipients(parts)
+        with observe_parse(self.observer, 'message_content'):
+            message_content = self._parse_message_content(parts)
+        with observe_parse(self.observer, 'replies'):
+            replies = self._parse_replies(parts)
         message = Message.from_info_and_attrs(
             message_info, timestamp, recipients, message_content, replies)
         return message
 
-    def _fetch_message_body(
+    def _get_message_body(
             self,
-            pupil_id: PupilId,
-            message_id: MessageId,
-    ) -> Tag:
-        """
-        Get message contents as HTML string.
-        """
-        url = f'/!{pupil_id}/messages/{message_id}?recipients'
-        page = self._browse(url)
+            page: bs4.BeautifulSoup,
+            url: str,
+    ) -> _MessageParts:
         body = page.find('body')
         if not body:
             raise Exception(f'Cannot parse message: {url}')
-        replace_emoji_imgs(body)
-        unmangle_emails(body)
-        return body
+        parts = _MessageParts(body)
+        with observe_parse(self.observer, 'message_body'):
+            CONTENT_REWRITES.extended(parts.get_handlers()).run(body)
+        return parts
 
-    def _parse_sent_time(self, body: Tag) -> datetime:
-        table_ths = body.select('table th')
-        sent_ths = [x for x in table_ths if x.text.startswith('Sent:')]
+    def _parse_sent_time(self, parts: _MessageParts) -> datetime:
+        sent_ths = [x for x in parts.table_ths if x.text.startswith('Sent:')]
         if len(sent_ths) == 1 and sent_ths[0].parent:
             sent_td = sent_ths[0].parent.find('td')
             if sent_td:
-                return _parse_timestamp(sent_td.text)
+                return parse_timestamp(sent_td.text)
         raise Exception('Cannot find table cell contaiting sending time')
 
-    def _parse_recipients(self, body: Tag) -> List[Person]:
-        recip_div = body.select_one('#recipients-cell')
+    def _parse_recipients(self, parts: _MessageParts) -> List[Person]:
+        """
+        Parse the recipients of a message.
+
+        A recipient listed several times is included only once, at
+        its first position.
+        """
+        recip_div = parts.recipients_cell
         if not recip_div:
             raise Exception('Cannot find recipients div')
-        result: List[Person] = []
+        result: Dict[Person, None] = {}
         for part in recip_div:
             if isinstance(part, str):
-                matches = PERSON_LIST_RX.finditer(part.strip().rstrip(','))
-                names = (x.group(1).strip() for x in matches)
-                result.extend(Person(x) for x in names if x)
+                names = split_person_list(part.strip().rstrip(','))
+                result.update((self._get_person(x), None) for x in names)
             else:
-                result.append(self._parse_person_element(part))
-        if len(result) == 1 and result[0] == Person('Hidden'):
+                result[self._parse_person_element(part)] = None
+        if len(result) == 1 and Person('Hidden') in result:
             return []
-        return result
+        return list(result)
 
-    def _parse_message_content(self, body: Tag) -> str:
-        message_div = body.select_one('.ckeditor.hidden')
+    def _parse_message_content(self, parts: _MessageParts) -> str:
+        message_div = parts.content
         if not message_div:
             raise Exception('Cannot find message div')
         return stringify_contents(message_div)
 
-    def _parse_replies(self, body: Tag) -> List[ReplyMessage]:
-        reply_divs = body.find_all(attrs={'class': 'm-replybox'})
-        replies = [self._parse_reply_message(x) for x in reply_divs]
+    def _parse_replies(self, parts: _MessageParts) -> List[ReplyMessage]:
+        replies = [self._parse_reply_message(x) for x in parts.reply_boxes]
         return replies
 
-    def _parse_reply_message(self, div: Tag) -> ReplyMessage:
+    def _parse_reply_updates(
+            self,
+            parts: _MessageParts,
+            known_replies: Sequence[ReplyMessage],
+    ) -> Tuple[List[ReplyMessage], List[ReplyMessage]]:
+        """
+        Parse the replies of a message page, reusing the known replies.
+
+        Only the headers are parsed from the replies older than the
+        newest known reply, and the known replies with the same
+        timestamps and senders are used for them.  The rest are parsed
+        fully and compared to the known replies.
+
+        Return all the replies and the new replies.
+        """
+        last_timestamp = max(
+            (x.timestamp for x in known_replies), default=None)
+        unmatched = list(known_replies)
+        replies: List[ReplyMessage] = []
+        new_replies: List[ReplyMessage] = []
+        for div in parts.reply_boxes:
+            reply: Optional[ReplyMessage] = None
+            if last_timestamp:
+                (header, from_text, date_text) = self._parse_reply_header(div)
+                timestamp = parse_timestamp(date_text)
+                if timestamp < last_timestamp:
+                    sender = self._parse_reply_sender(header, from_text)
+                    reply = _find(unmatched, lambda x: (
+                        x.timestamp == timestamp and x.sender == sender))
+            if reply is None:
+                parsed = self._parse_reply_message(div)
+                reply = _find(unmatched, lambda x: x == parsed)
+                if reply is None:
+                    new_replies.append(parsed)
+                    replies.append(parsed)
+                    continue
+            unmatched.remove(reply)
+            replies.append(reply)
+        return (replies, new_replies)
+
+    def _parse_reply_header(self, div: Tag) -> Tuple[Tag, str, str]:
+        """
+        Get the header element, the sender text and date text of a reply.
+        """
         header = div.find('h2')
-        content = div.select_one('.inner')
         match = REPLY_HEADER_RX.match(header.text if header else '')
-        if not header or not match or not content:
+        if not header or not match:
+            raise Exception(f'Cannot parse reply: {div}')
+        return (header, match.group('from'), match.group('date'))
+
+    def _parse_reply_message(self, div: Tag) -> ReplyMessage:
+        (header, from_text, date_text) = self._parse_reply_header(div)
+        content = div.select_one('.inner')
+        if not content:
             raise Exception(f'Cannot parse reply: {div}')
-        header_data = match.groupdict()
-        profile_link = header.select_one('a.profile-link')
-        if profile_link:
-            person = self._parse_profile_link(profile_link)
-        else:
-            from_text = header_data['from']
-            name = from_text if from_text.lower() != 'you' else self.own_name
-            person = Person(name)
         return ReplyMessage(
-            timestamp=_parse_timestamp(header_data['date']),
-            sender=person,
+            timestamp=parse_timestamp(date_text),
+            sender=self._parse_reply_sender(header, from_text),
             body=stringify_contents(content))
 
-    def fetch_news_list(self, pupil_id: PupilId) -> List[NewsItemInfo]:
-        page = self._browse(f'/!{pupil_id}/news')
-        link_matches = (
-            (a_elem, NEWS_ITEM_LINK_RX.match(a_elem.get('href', '')))
-            for a_elem in page.find_all('a', href=True)
-            if a_elem and a_elem.get('class')
-        )
-        news_map: Dict[int, Tuple[str, Optional[datetime], bool]] = {
-            # news_id -> (subject, date)
-            int(match.group('news_id')): (a_elem.text.strip(), None, False)
-            for (a_elem, match) in link_matches
-            if match
-        }
-        for well in page.select('.well'):
-            date_h2 = well.find_previous('h2')
-            date = _parse_timestamp(date_h2.text) if date_h2 else None
-            title_elem = well.find('h3')
-            a_elem = well.find('a', href=True)
-            href = a_elem.get('href', '') if a_elem else ''
-            match = NEWS_ITEM_LINK_RX.match(href)
-            if title_elem and match:
-                (subject, is_new) = self._parse_news_title(title_elem)
-                news_map[int(match.group('news_id'))] = (subject, date, is_new)
+    def _parse_reply_sender(self, header: Tag, from_text: str) -> Person:
+        profile_link = header.select_one('a.profile-link')
+        if profile_link:
+            return self._parse_profile_link(profile_link)
+        name = from_text if from_text.lower() != 'you' else self.own_name
+        return self._get_person(name)
+
+    def _parse_news_list(
+            self,
+            pupil_id: PupilId,
+            page: bs4.BeautifulSoup,
+    ) -> List[NewsItemInfo]:
+        """
+        Parse the news items from the links and wells of the page.
+
+        The page is walked once, keeping track of the latest date
+        header, which is the date of the wells following it.
+        """
+        news_map: Dict[int, Tuple[str, Optional[datetime], bool]] = {}
+        # news_id -> (subject, date, is_new)
+        well_news_map: Dict[int, Tuple[str, Optional[datetime], bool]] = {}
+        date_h2: Optional[Tag] = None
+        dated_h2: Optional[Tag] = None
+        date: Optional[datetime] = None
+        for element in page.find_all(_is_news_list_element):
+            if element.name == 'h2':
+                date_h2 = element
+                continue
+            if element.name == 'a' and element.get('class'):
+                match = NEWS_ITEM_LINK_RX.match(element.get('href', ''))
+                if match:
+                    news_map[int(match.group('news_id'))] = (
+                        element.text.strip(), None, False)
+            if 'well' in element.get('class', ()):
+                title_elem = element.find('h3')
+                a_elem = element.find('a', href=True)
+                href = a_elem.get('href', '') if a_elem else ''
+                match = NEWS_ITEM_LINK_RX.match(href)
+                if title_elem and match:
+                    if date_h2 is not dated_h2:
+                        dated_h2 = date_h2
+                        date = (
+                            parse_timestamp(date_h2.text) if date_h2
+                            else None)
+                    (subject, is_new) = self._parse_news_title(title_elem)
+                    well_news_map[int(match.group('news_id'))] = (
+                        subject, date, is_new)
+        news_map.update(well_news_map)
         return [
             NewsItemInfo(
                 id=NewsItemId(news_id),
@@ -336,10 +488,11 @@ class Connection:
         is_new = ('new' in labels)
         return (subject, is_new)
 
-    def fetch_news_item(self, news_item_info: NewsItemInfo) -> NewsItem:
-        elem = self._fetch_news_item_body(
-            news_item_info.pupil_id, news_item_info.id)
-
+    def _parse_news_item(
+            self,
+            news_item_info: NewsItemInfo,
+            elem: Tag,
+    ) -> NewsItem:
         def select(element: Tag, selector: str) -> Tag:
             result = element.select_one(selector)
             if not result:
@@ -350,7 +503,7 @@ class Connection:
         body_element = select(elem, '#news-content')
         metadata = select(elem, '.horizontal-link-container')
         date_span = select(metadata, 'span.small')
-        timestamp = _parse_timestamp(date_span.text.split()[-1])
+        timestamp = parse_timestamp(date_span.text.split()[-1])
         date_span.replace_with('')
         sender = self._parse_news_item_sender(metadata)
 
@@ -360,24 +513,18 @@ class Connection:
             sender=sender,
             body=stringify_contents(body_element))
 
-    def _fetch_news_item_body(
-            self,
-            pupil_id: PupilId,
-            news_item_id: NewsItemId,
-    ) -> Tag:
-        url = f'/!{pupil_id}/news/{news_item_id}'
-        page = self._browse(url)
+    def _get_news_item_body(self, page: bs4.BeautifulSoup, url: str) -> Tag:
         body = page.select_one('.panel-body')
         if not body:
             raise Exception(f'Cannot parse news item: {url}')
-        replace_emoji_imgs(body)
-        unmangle_emails(body)
+        with observe_parse(self.observer, 'news_item_body'):
+            CONTENT_REWRITES.run(body)
         return body
 
     def _parse_news_item_sender(self, metadata: Tag) -> Person:
         person = self._parse_person_element(metadata)
-        person.name = _switch_parenthesed_parts(person.name)
-        return person
+        return self._get_person(
+            _switch_parenthesed_parts(person.name), person.id, person.type)
 
     def _parse_person_element(self, element: Tag) -> Person:
         profile_link: Optional[Tag]
@@ -389,43 +536,655 @@ class Connection:
             return self._parse_profile_link(profile_link)
         else:
             text_lines = element.text.strip().splitlines() or ['']
-            return Person(text_lines[0].strip())
+            return self._get_person(text_lines[0].strip())
 
     def _parse_profile_link(self, profile_link: Tag) -> Person:
         profile_href = profile_link.get('href', '')
         match = PROFILE_HREF_RX.match(profile_href)
         if not match:
             raise Exception(f'Cannot parse profile link: {profile_link}')
-        return Person(
+        return self._get_person(
             name=profile_link.text,
             id=int(match.group(2)),
             type=match.group(1),
         )
 
+
+class Connection(_ConnectionBase):
+    @classmethod
+    def open(
+            cls,
+            url: str,
+            username: str,
+            password: str,
+            *,
+            max_workers: int = 1,
+            session_store: Optional[SessionStore] = None,
+            html_parser: HtmlParser = DEFAULT_HTML_PARSER,
+            observer: Optional[Observer] = None,
+            http_cache: Optional[HttpCache] = None,
+            transport: Optional[TransportConfig] = None,
+            archive: Optional[ResponseArchive] = None,
+    ) -> 'Connection':
+        """
+        Log in to the site.
+
+        If max_workers is greater than one, the bulk fetching methods
+        fetch and parse pages in a thread pool of that size.
+
+        If a session store is given, the session is saved to it and
+        the connection does not log out when closed, so that the
+        session can be resumed later with `resume`.
+
+        If an observer is given, it is notified about the requests
+        and the parsing phases of the connection, see `Observer`.
+
+        If an HTTP cache is given, the message lists, news lists,
+        messages and news items are fetched through it, see
+        `HttpCache`.  Note that the objects returned from the cache
+        may be shared with the earlier results, so they should not be
+        modified.
+
+        The transport configures the connection pool, timeouts,
+        compression and retries of the HTTP requests, see
+        `TransportConfig`.  The requests are counted to
+        `transport_stats`.
+
+        If an archive is given, the front page and all the pages and
+        message lists fetched by the connection are saved to it, see
+        `ResponseArchive`.
+        """
+        browser = _make_browser(transport, max_workers)
+        token_url = f'{url}{TOKEN_PATH}'
+        observe_request(
+            observer, TOKEN_PATH, 'GET', token_url,
+            lambda: browser.open(token_url))
+        login_page_url = f'{url}{LOGIN_PAGE_PATH}'
+        observe_request(
+            observer, '/', 'GET', login_page_url,
+            lambda: browser.open(login_page_url))
+        browser.select_form(LOGIN_FORM_SELECTOR)
+        session_id = browser.get_cookiejar().get(SESSION_COOKIE)
+        for (name, value) in get_login_fields(
+                username, password, session_id).items():
+            browser[name] = value
+        response = observe_request(
+            observer, '/login', 'POST', browser.absolute_url('/login'),
+            browser.submit_selected)
+        response.raise_for_status()
+        check_login_result(response.url)
+        if session_store:
+            session_store.save(browser.get_cookiejar())
+        if archive is not None:
+            _archive_response(archive, url, '/', response)
+        return cls(
+            url, browser,
+            max_workers=max_workers, session_store=session_store,
+            html_parser=html_parser, observer=observer,
+            http_cache=http_cache, transport=transport, archive=archive)
+
+    @classmethod
+    def resume(
+            cls,
+            url: str,
+            session_store: SessionStore,
+            *,
+            max_workers: int = 1,
+            html_parser: HtmlParser = DEFAULT_HTML_PARSER,
+            observer: Optional[Observer] = None,
+            http_cache: Optional[HttpCache] = None,
+            transport: Optional[TransportConfig] = None,
+            archive: Optional[ResponseArchive] = None,
+    ) -> Optional['Connection']:
+        """
+        Continue a session saved to the session store.
+
+        Return None if there is no saved session or it has expired.
+        """
+        browser = _make_browser(transport, max_workers)
+        if not session_store.load(browser.get_cookiejar()):
+            return None
+        front_page_url = f'{url}/'
+        try:
+            response = observe_request(
+                observer, '/', 'GET', front_page_url,
+                lambda: browser.open(front_page_url))
+            response.raise_for_status()
+        except requests.HTTPError:
+            return None
+        page = browser.get_current_page()
+        if not page or not _is_logged_in_page(page):
+            return None
+        if archive is not None:
+            _archive_response(archive, url, '/', response)
+        return cls(
+            url, browser,
+            max_workers=max_workers, session_store=session_store,
+            html_parser=html_parser, observer=observer,
+            http_cache=http_cache, transport=transport, archive=archive)
+
+    def close(self) -> None:
+        self._is_closed = True
+        self._shutdown_workers()
+        if self.session_store:
+            self.session_store.save(self.browser.get_cookiejar())
+        else:
+            self.logout()
+        self._transport_adapter.close()
+
+    @property
+    def transport_stats(self) -> TransportStats:
+        return self._transport_adapter.stats
+
+    def __enter__(self) -> 'Connection':
+        return self
+
+    def __exit__(
+            self,
+            exc_type: Optional[Type[BaseException]],
+            exc_value: Optional[Exception],
+            traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def __init__(
+            self,
+            url: str,
+            browser: mechanicalsoup.StatefulBrowser,
+            *,
+            max_workers: int = 1,
+            session_store: Optional[SessionStore] = None,
+            html_parser: HtmlParser = DEFAULT_HTML_PARSER,
+            observer: Optional[Observer] = None,
+            http_cache: Optional[HttpCache] = None,
+            transport: Optional[TransportConfig] = None,
+            archive: Optional[ResponseArchive] = None,
+    ) -> None:
+        super().__init__(url, html_parser, observer)
+        self.browser = browser
+        self.max_workers = max_workers
+        self.session_store = session_store
+        self.http_cache = http_cache
+        self.archive = archive
+        adapter = browser.session.get_adapter(url)
+        if not isinstance(adapter, TransportAdapter):
+            adapter = TransportAdapter(
+                transport or TransportConfig(), max_workers)
+            adapter.mount_to(browser.session)
+        self._transport_adapter = adapter
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._worker_state = threading.local()
+        self._is_closed = False
+        self.front_page = self._get_current_page_or_fail()
+        with observe_parse(self.observer, 'front_page'):
+            self._parse_front_page(self.front_page)
+
+    def get_new_messages(self) -> Dict[Pupil, List[Message]]:
+        unreads: List[MessageInfo] = []
+        for (pupil_id, count) in self.new_message_counts.items():
+            message_infos = self.fetch_message_list(pupil_id)
+            unreads.extend(x for x in message_infos if x.is_unread)
+        result: Dict[Pupil, List[Message]] = {
+            self.pupils[pupil_id]: []
+            for pupil_id in self.new_message_counts
+        }
+        for message in self.fetch_messages(unreads):
+            result[self.pupils[message.pupil_id]].append(message)
+        return result
+
+    def iter_new_messages(self) -> Iterator[Tuple[Pupil, Message]]:
+        """
+        Iterate the unread messages of all pupils with their pupil.
+
+        The messages are yielded as soon as they are fetched, in the
+        same order as they would be returned by `get_new_messages`.
+        """
+        for pupil_id in self.new_message_counts:
+            pupil = self.pupils[pupil_id]
+            for message in self.iter_messages(pupil_id, unread_only=True):
+                yield (pupil, message)
+
+    def refresh_new_message_counts(self) -> Dict[PupilId, int]:
+        """
+        Update the new message counts from the front page.
+
+        Only the links of the front page are parsed, so this is cheap
+        enough to be polled.  Raise an exception if the session has
+        expired.
+        """
+        response = self._browse_simple('/', url_template='/')
+        page = self._parse_page(response, FRONT_PAGE_LINK_REGIONS, '/')
+        if not _is_logged_in_page(page):
+            raise Exception('Session has expired')
+        with observe_parse(self.observer, 'new_message_counts'):
+            self.new_message_counts = parse_new_message_counts(
+                _get_links(page))
+        return self.new_message_counts
+
+    def watch(
+            self,
+            schedule: Optional[PollSchedule] = None,
+            *,
+            sleep: Callable[[float], None] = time.sleep,
+    ) -> Iterator[Tuple[Pupil, Message]]:
+        """
+        Watch for new messages of all pupils.
+
+        First the currently unread messages are yielded and then the
+        new unread messages as they arrive.  Between the polls only
+        the new message counts are refreshed and the message list is
+        fetched only for the pupils whose count has changed.  The
+        intervals between the polls are taken from the schedule.
+
+        The iteration does not end by itself.  It raises an exception
+        if the session expires.
+        """
+        if schedule is None:
+            schedule = PollSchedule()
+        counts: Dict[PupilId, int] = {}
+        seen_ids: Dict[PupilId, Set[MessageId]] = {}
+        while True:
+            new_counts = dict(self.new_message_counts)
+            active = False
+            for pupil_id in self.pupils:
+                count = new_counts.get(pupil_id, 0)
+                if count == counts.get(pupil_id, 0):
+                    continue
+                if not count:
+                    seen_ids.pop(pupil_id, None)
+                    continue
+                unread = [
+                    x for x in self.fetch_message_list(pupil_id)
+                    if x.is_unread]
+                previous_ids = seen_ids.get(pupil_id, set())
+                seen_ids[pupil_id] = {x.id for x in unread}
+                new_infos = [x for x in unread if x.id not in previous_ids]
+                active = active or bool(new_infos)
+                pupil = self.pupils[pupil_id]
+                for message in self._imap_in_workers(
+                        self.fetch_message, new_infos):
+                    yield (pupil, message)
+            counts = new_counts
+            sleep(schedule.next_interval(active))
+            self.refresh_new_message_counts()
+
+    def iter_messages(
+            self,
+            pupil_id: PupilId,
+            since: Optional[datetime] = None,
+            *,
+            unread_only: bool = False,
+    ) -> Iterator[Message]:
+        """
+        Iterate the messages of a pupil in the order of the message list.
+
+        If since is given, only the messages which have been sent or
+        replied to at or after it are included.  Each message is
+        yielded as soon as it is fetched and at most a few messages
+        per worker are fetched ahead of the consumer.
+        """
+        message_infos = _filter_message_infos(
+            self.fetch_message_list(pupil_id), since, unread_only)
+        return self._imap_in_workers(self.fetch_message, message_infos)
+
+    def list_messages(
+            self,
+            pupil_id: PupilId,
+            since: Optional[datetime] = None,
+            *,
+            unread_only: bool = False,
+    ) -> List[LazyMessage]:
+        """
+        List the messages of a pupil without fetching them yet.
+
+        Only the message list is fetched.  Each message page is
+        fetched when its contents are first needed, see `LazyMessage`,
+        or with `prefetch`.  The filtering is as in `iter_messages`.
+
+        The pages cannot be fetched after the connection is closed.
+        """
+        return [
+            LazyMessage(x, self._fetch_lazy_message)
+            for x in _filter_message_infos(
+                self.fetch_message_list(pupil_id), since, unread_only)]
+
+    def _fetch_lazy_message(self, message_info: MessageInfo) -> Message:
+        if self._is_closed:
+            raise Exception(
+                f'Cannot fetch message {message_info.id}: '
+                'the connection is closed, prefetch the message first')
+        return self.fetch_message(message_info)
+
+    def prefetch(self, messages: Iterable[LazyMessage]) -> None:
+        """
+        Fetch the given lazy messages, in parallel if max_workers > 1.
+
+        The messages which are already fetched are skipped.
+        """
+        self._map_in_workers(
+            LazyMessage.load, [x for x in messages if not x.is_loaded])
+
+    def iter_news(
+            self,
+            pupil_id: PupilId,
+            since: Optional[datetime] = None,
+    ) -> Iterator[NewsItem]:
+        """
+        Iterate the news items of a pupil in the order of the news list.
+
+        If since is given, only the news items dated at or after it
+        are included.  News items without a date in the list are then
+        left out too.
+        """
+        news_item_infos = _filter_news_item_infos(
+            self.fetch_news_list(pupil_id), since)
+        return self._imap_in_workers(self.fetch_news_item, news_item_infos)
+
+    def sync(
+            self,
+            store: MessageStore,
+            pupil_ids: Optional[Iterable[PupilId]] = None,
+    ) -> SyncResult:
+        """
+        Download new and changed messages and news items to the store.
+
+        A message is downloaded only if it is not in the store yet or
+        its last timestamp or reply count in the message list differs
+        from the stored one.  News items are downloaded if they are
+        not in the store yet.  The search index of the store is
+        updated with the downloaded items only.
+
+        Return the downloaded items.
+        """
+        pupil_id_list = list(self.pupils if pupil_ids is None else pupil_ids)
+        changed_message_infos: List[MessageInfo] = []
+        new_news_item_infos: List[NewsItemInfo] = []
+        for pupil_id in pupil_id_list:
+            message_states = store.get_message_states(self.url, pupil_id)
+            changed_message_infos.extend(
+                x for x in self.fetch_message_list(pupil_id)
+                if message_states.get(x.id) != (
+                    x.last_timestamp, x.reply_count))
+            news_item_ids = store.get_news_item_ids(self.url, pupil_id)
+            new_news_item_infos.extend(
+                x for x in self.fetch_news_list(pupil_id)
+                if x.id not in news_item_ids)
+        result = SyncResult(
+            messages=self.fetch_messages(changed_message_infos),
+            news_items=self.fetch_news_items(new_news_item_infos))
+        store.save_messages(result.messages)
+        store.save_news_items(result.news_items)
+        return result
+
+    def fetch_message_list(self, pupil_id: PupilId) -> List[MessageInfo]:
+        """
+        List messages of a pupil.
+        """
+        def parse(response: requests.Response) -> List[MessageInfo]:
+            with observe_parse(self.observer, 'message_list'):
+                return self._parse_message_list(pupil_id, response.json())
+
+        return self._fetch_cached(
+            MESSAGE_LIST_PATH.format(pupil_id=pupil_id), MESSAGE_LIST_PATH,
+            parse, reuse=list, headers=JSON_REQUEST_HEADERS)
+
+    def fetch_messages(
+            self,
+            message_infos: Iterable[MessageInfo],
+    ) -> List[Message]:
+        """
+        Fetch several messages, in parallel if max_workers > 1.
+        """
+        return self._map_in_workers(self.fetch_message, message_infos)
+
+    def fetch_message(self, message_info: MessageInfo) -> Message:
+        self._check_origin(message_info)
+        url = MESSAGE_PATH.format(
+            pupil_id=message_info.pupil_id, message_id=message_info.id)
+
+        def parse(response: requests.Response) -> Message:
+            page = self._parse_page(
+                response, MESSAGE_PAGE_REGIONS, MESSAGE_PATH)
+            body = self._get_message_body(page, url)
+            return self._parse_message(message_info, body)
+
+        def reuse(message: Message) -> Message:
+            # The message info may have changed, e.g. the message may
+            # have been read, even if the page has not
+            return Message.from_info_and_attrs(
+                message_info, message.timestamp, message.recipients,
+                message.body, message.replies)
+
+        return self._fetch_cached(url, MESSAGE_PATH, parse, reuse)
+
+    def update_message(
+            self,
+            previous: Message,
+            message_info: Optional[MessageInfo] = None,
+    ) -> MessageUpdate:
+        """
+        Update a previously fetched message.
+
+        If the message info from a newer message list is given and
+        its last timestamp and reply count are the same as in the
+        previous message, the message page is not fetched at all.
+        Otherwise the page is fetched, but only the replies newer than
+        the previous ones are parsed fully.  The sent time, recipients
+        and body of the message are taken from the previous message.
+        Without a message info, the reply count and last timestamp are
+        updated from the fetched replies.
+        """
+        info = previous if message_info is None else message_info
+        self._check_origin(info)
+        if (info.pupil_id, info.id) != (previous.pupil_id, previous.id):
+            raise ValueError(
+                f'Message {info.id} is not an update of {previous.id}')
+        replies = previous.replies
+        new_replies: List[ReplyMessage] = []
+        if (message_info is None
+                or info.last_timestamp != previous.last_timestamp
+                or info.reply_count != previous.reply_count):
+            url = MESSAGE_PATH.format(
+                pupil_id=info.pupil_id, message_id=info.id)
+            response = self._browse_simple(url, url_template=MESSAGE_PATH)
+            page = self._parse_page(
+                response, MESSAGE_PAGE_REGIONS, MESSAGE_PATH)
+            parts = self._get_message_body(page, url)
+            with observe_parse(self.observer, 'replies'):
+                (replies, new_replies) = self._parse_reply_updates(
+                    parts, previous.replies)
+            if message_info is None:
+                info = _get_info_with_replies(previous, replies, new_replies)
+        changed_fields = [
+            name for name in MessageInfo.__slots__
+            if getattr(info, name) != getattr(previous, name)]
+        message = Message.from_info_and_attrs(
+            info, previous.timestamp, previous.recipients, previous.body,
+            replies)
+        return MessageUpdate(message, new_replies, changed_fields)
+
+    def fetch_news_list(self, pupil_id: PupilId) -> List[NewsItemInfo]:
+        def parse(response: requests.Response) -> List[NewsItemInfo]:
+            page = self._parse_page(
+                response, NEWS_LIST_PAGE_REGIONS, NEWS_LIST_PATH)
+            with observe_parse(self.observer, 'news_list'):
+                return self._parse_news_list(pupil_id, page)
+
+        return self._fetch_cached(
+            NEWS_LIST_PATH.format(pupil_id=pupil_id), NEWS_LIST_PATH,
+            parse, reuse=list)
+
+    def fetch_news_items(
+            self,
+            news_item_infos: Iterable[NewsItemInfo],
+            since: Optional[datetime] = None,
+            *,
+            unread_only: bool = False,
+    ) -> List[NewsItem]:
+        """
+        Fetch several news items, in parallel if max_workers > 1.
+
+        The items can be limited to the ones dated at or after since,
+        as in `iter_news`, and to the unread ones.  Only the included
+        items are fetched.
+        """
+        return self._map_in_workers(
+            self.fetch_news_item,
+            _filter_news_item_infos(news_item_infos, since, unread_only))
+
+    def fetch_news_item(self, news_item_info: NewsItemInfo) -> NewsItem:
+        url = NEWS_ITEM_PATH.format(
+            pupil_id=news_item_info.pupil_id, news_item_id=news_item_info.id)
+
+        def parse(response: requests.Response) -> NewsItem:
+            page = self._parse_page(
+                response, NEWS_ITEM_PAGE_REGIONS, NEWS_ITEM_PATH)
+            elem = self._get_news_item_body(page, url)
+            with observe_parse(self.observer, 'news_item'):
+                return self._parse_news_item(news_item_info, elem)
+
+        def reuse(news_item: NewsItem) -> NewsItem:
+            return NewsItem.from_info_and_attrs(
+                news_item_info, timestamp=news_item.timestamp,
+                sender=news_item.sender, body=news_item.body)
+
+        return self._fetch_cached(url, NEWS_ITEM_PATH, parse, reuse)
+
     def logout(self) -> None:
         """
         Log out of the site.
         """
-        logout_url = self.browser.absolute_url('/logout')
-        response = self.browser.post(logout_url)
+        logout_url = self.browser.absolute_url(LOGOUT_PATH)
+        response = observe_request(
+            self.observer, LOGOUT_PATH, 'POST', logout_url,
+            lambda: self.browser.post(logout_url))
         response.raise_for_status()
         self.browser = mechanicalsoup.StatefulBrowser()
+        if self.session_store:
+            self.session_store.clear()
 
-    def _browse(
+    def _map_in_workers(
             self,
-            relative_url: str,
+            func: Callable[[_T], _R],
+            items: Iterable[_T],
+    ) -> List[_R]:
+        return list(self._imap_in_workers(func, items))
+
+    def _imap_in_workers(
+            self,
+            func: Callable[[_T], _R],
+            items: Iterable[_T],
+    ) -> Iterator[_R]:
+        """
+        Map the items with func lazily, keeping the order of the items.
+
+        The workers are kept at most two items per worker ahead of the
+        consumer, so that the results do not pile up in memory.
+        """
+        if self.max_workers <= 1:
+            for item in items:
+                yield func(item)
+            return
+        if not self._executor:
+            self._executor = ThreadPoolExecutor(
+                self.max_workers,
+                thread_name_prefix='wilmes-worker',
+                initializer=self._init_worker)
+        pending: Deque[Future[_R]] = deque()
+        try:
+            for item in items:
+                pending.append(self._executor.submit(func, item))
+                if len(pending) >= 2 * self.max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _shutdown_workers(self) -> None:
+        if self._executor:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _init_worker(self) -> None:
+        """
+        Initialize a worker thread with its own session.
+
+        The session of the browser cannot be shared between threads.
+        Therefore each worker gets its own session, which uses the
+        cookies of the logged in session.  The connection pool is
+        shared though.
+        """
+        session = requests.Session()
+        self._transport_adapter.mount_to(session)
+        session.headers.update(self.browser.session.headers)
+        session.cookies.update(self.browser.get_cookiejar())
+        self._worker_state.session = session
+
+    def _parse_page(
+            self,
+            response: requests.Response,
+            regions: Optional[Sequence[str]],
+            url_template: str,
     ) -> bs4.BeautifulSoup:
-        self._browse_simple(relative_url)
-        return self._get_current_page_or_fail()
+        with observe_parse(self.observer, 'html', url_template):
+            return self.html_parser.parse(
+                response.content, _get_http_encoding(response), regions)
+
+    def _fetch_cached(
+            self,
+            relative_url: str,
+            url_template: str,
+            parse: Callable[[requests.Response], _R],
+            reuse: Callable[[_R], _R],
+            headers: Optional[Mapping[str, str]] = None,
+    ) -> _R:
+        """
+        Fetch and parse a page through the HTTP cache, if there is one.
+        """
+        def fetch(extra_headers: Mapping[str, str]) -> requests.Response:
+            return self._browse_simple(
+                relative_url, headers={**(headers or {}), **extra_headers},
+                url_template=url_template)
+
+        if self.http_cache is None:
+            return parse(fetch({}))
+        url = urllib.parse.urljoin(self.url, relative_url)
+        return self.http_cache.fetch(url, fetch, parse, reuse)
 
     def _browse_simple(
             self,
             relative_url: str,
+            headers: Optional[Mapping[str, str]] = None,
+            url_template: Optional[str] = None,
     ) -> requests.Response:
-        response = self.browser.open_relative(relative_url)
+        """
+        Get a page of the site.
+
+        The URL template is the relative URL before formatting the ids
+        to it.  It identifies the page to the observer.
+        """
+        url = urllib.parse.urljoin(self.url, relative_url)
+        response = observe_request(
+            self.observer, url_template or relative_url, 'GET', url,
+            lambda: self._send_get(relative_url, url, headers))
         response.raise_for_status()
+        if self.archive is not None and response.status_code == 200:
+            _archive_response(self.archive, self.url, relative_url, response)
         return response
 
+    def _send_get(
+            self,
+            relative_url: str,
+            url: str,
+            headers: Optional[Mapping[str, str]],
+    ) -> requests.Response:
+        worker_session: Optional[requests.Session] = getattr(
+            self._worker_state, 'session', None)
+        session = worker_session or self.browser.session
+        return session.get(url, headers=headers)
+
     def _get_current_page_or_fail(self) -> bs4.BeautifulSoup:
         page = self.browser.get_current_page()
         if not page:
@@ -433,20 +1192,94 @@ class Connection:
         return page
 
 
-class _PytzTimezone(Protocol):
-    def localize(self, dt: datetime) -> datetime: ...
+def _make_browser(
+        transport: Optional[TransportConfig],
+        max_workers: int,
+) -> mechanicalsoup.StatefulBrowser:
+    browser = mechanicalsoup.StatefulBrowser(raise_on_404=True)
+    adapter = TransportAdapter(transport or TransportConfig(), max_workers)
+    adapter.mount_to(browser.session)
+    return browser
+
+
+def _archive_response(
+        archive: ResponseArchive,
+        origin: str,
+        relative_url: str,
+        response: requests.Response,
+) -> None:
+    archive.save(
+        origin, relative_url, response.content,
+        response.headers.get('Content-Type', ''))
+
+
+def _get_http_encoding(response: requests.Response) -> Optional[str]:
+    """
+    Get encoding of the response if it is specified in the HTTP headers.
+
+    Otherwise the encoding is detected by the parser, e.g. from the
+    meta tags of the page.
+    """
+    content_type = response.headers.get('Content-Type', '')
+    return response.encoding if 'charset' in content_type else None
+
+
+def _filter_message_infos(
+        message_infos: Iterable[MessageInfo],
+        since: Optional[datetime] = None,
+        unread_only: bool = False,
+) -> List[MessageInfo]:
+    return [
+        x for x in message_infos
+        if (since is None or x.last_timestamp >= since)
+        and (x.is_unread or not unread_only)]
+
+
+def _filter_news_item_infos(
+        news_item_infos: Iterable[NewsItemInfo],
+        since: Optional[datetime] = None,
+        unread_only: bool = False,
+) -> List[NewsItemInfo]:
+    return [
+        x for x in news_item_infos
+        if (since is None or (x.timestamp and x.timestamp >= since))
+        and (x.is_unread or not unread_only)]
+
+
+def _is_news_list_element(tag: Tag) -> bool:
+    return (
+        tag.name == 'h2'
+        or (tag.name == 'a' and tag.has_attr('href'))
+        or 'well' in tag.get('class', ()))
+
+
+def _get_info_with_replies(
+        previous: MessageInfo,
+        replies: Sequence[ReplyMessage],
+        new_replies: Sequence[ReplyMessage],
+) -> MessageInfo:
+    values = {name: getattr(previous, name) for name in MessageInfo.__slots__}
+    values['reply_count'] = len(replies)
+    values['last_timestamp'] = max(
+        [previous.last_timestamp] + [x.timestamp for x in new_replies])
+    return MessageInfo(**values)
+
+
+def _find(
+        items: Iterable[_T],
+        predicate: Callable[[_T], bool],
+) -> Optional[_T]:
+    return next((x for x in items if predicate(x)), None)
+
+
+def _get_links(page: bs4.BeautifulSoup) -> List[Link]:
+    return [(x.get('href', ''), x.text) for x in page.find_all('a', href=True)]
 
 
-def _parse_timestamp(string: str, tz: _PytzTimezone = TZ) -> datetime:
-    special_date_function = SPECIAL_DATES.get(string.strip().lower())
-    if special_date_function:
-        string = str(special_date_function())
-    elif YEARLESS_DATE_RX.match(string):
-        string += str(datetime.now().year)
-    dt = parse_datetime(string, dayfirst=(string.count('.') >= 2))
-    if dt.tzinfo:
-        return dt
-    return tz.localize(dt)
+def _is_logged_in_page(page: bs4.BeautifulSoup) -> bool:
+    return (
+        not page.select_one(LOGIN_FORM_SELECTOR)
+        and bool(page.select_one('.name-container .teacher')))
 
 
 def _switch_parenthesed_parts(string: str) -> str:
@@ -0,0 +1,87 @@
+from typing import Callable, Dict, Iterable, List, Set, Tuple, Union
+
+from bs4.element import Tag
+
+ElementHandler = Callable[[Tag], None]
+
+
+class DomPipeline:
+    """
+    Runs element handlers on a tree in a single pass.
+
+    Each handler is registered with a simple selector: a tag name,
+    "#id" or ".class" (or ".class1.class2" to require several
+    classes).  The handlers of an element are called in the order they
+    were added, and the elements are visited in document order.
+
+    A handler may replace or remove the element it gets.  The
+    descendants of a removed element are not visited.
+    """
+    def __init__(
+            self,
+            handlers: Iterable[Tuple[str, ElementHandler]] = (),
+    ) -> None:
+        self._handlers: List[Tuple[str, ElementHandler]] = []
+        self._by_name: Dict[str, List[Tuple[int, ElementHandler]]] = {}
+        self._by_id: Dict[str, List[Tuple[int, ElementHandler]]] = {}
+        self._by_class: Dict[
+            str, List[Tuple[int, Set[str], ElementHandler]]] = {}
+        for (selector, handler) in handlers:
+            self.add(selector, handler)
+
+    def add(self, selector: str, handler: ElementHandler) -> None:
+        index = len(self._handlers)
+        self._handlers.append((selector, handler))
+        if selector.startswith('#'):
+            self._by_id.setdefault(selector[1:], []).append((index, handler))
+        elif selector.startswith('.'):
+            classes = set(selector[1:].split('.'))
+            # Index by one of the classes and check the rest on match
+            key = min(classes)
+            self._by_class.setdefault(key, []).append(
+                (index, classes, handler))
+        else:
+            self._by_name.setdefault(selector, []).append((index, handler))
+
+    def extended(
+            self,
+            handlers: Iterable[Tuple[str, ElementHandler]],
+    ) -> 'DomPipeline':
+        """
+        Get a new pipeline with the given handlers added after these.
+        """
+        return DomPipeline(self._handlers + list(handlers))
+
+    def run(self, root: Tag) -> None:
+        removed: Set[int] = set()
+        for element in list(root.descendants):
+            if not isinstance(element, Tag):
+                continue
+            if element.parent is None or id(element.parent) in removed:
+                removed.add(id(element))
+                continue
+            for handler in self._get_handlers(element):
+                handler(element)
+                if element.parent is None:
+                    removed.add(id(element))
+                    break
+
+    def _get_handlers(self, element: Tag) -> List[ElementHandler]:
+        matches = list(self._by_name.get(element.name, ()))
+        if self._by_id:
+            element_id = element.get('id')
+            if element_id:
+                matches.extend(self._by_id.get(element_id, ()))
+        if self._by_class:
+            class_value: Union[str, List[str]] = element.get('class', [])
+            element_classes = (
+                class_value.split() if isinstance(class_value, str)
+                else class_value)
+            for class_name in element_classes:
+                for (index, classes, handler) in self._by_class.get(
+                        class_name, ()):
+                    if classes.issubset(element_classes):
+                        matches.append((index, handler))
+        if len(matches) > 1:
+            matches.sort(key=(lambda x: x[0]))
+        return [handler for (_index, handler) in matches]
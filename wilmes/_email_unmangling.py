@@ -3,6 +3,7 @@ import binascii
 from bs4.element import Tag
 
 URL_PART = '/cdn-cgi/l/email-protection#'
+EMAIL_CLASS = '__cf_email__'
 
 
 def unmangle_emails(element: Tag) -> None:
@@ -12,18 +13,26 @@ def unmangle_emails(element: Tag) -> None:
 
 def _replace_email_links(element: Tag) -> None:
     for a_elem in element.find_all('a'):
-        href = a_elem.get('href', '')
-        (_before, _sep, after_url_part) = href.partition(URL_PART)
-        if after_url_part:
-            a_elem['href'] = 'mailto:' + _unmangle(after_url_part)
+        replace_email_link(a_elem)
+
+
+def replace_email_link(a_elem: Tag) -> None:
+    href = a_elem.get('href', '')
+    (_before, _sep, after_url_part) = href.partition(URL_PART)
+    if after_url_part:
+        a_elem['href'] = 'mailto:' + _unmangle(after_url_part)
 
 
 def _replace_email_texts(element: Tag) -> None:
-    for elem in element.find_all(attrs={'class': '__cf_email__'}):
-        hex_string = elem.get('data-cfemail')
-        if hex_string:
-            email = _unmangle(hex_string)
-            elem.replace_with(email)
+    for elem in element.find_all(attrs={'class': EMAIL_CLASS}):
+        replace_email_text(elem)
+
+
+def replace_email_text(elem: Tag) -> None:
+    hex_string = elem.get('data-cfemail')
+    if hex_string:
+        email = _unmangle(hex_string)
+        elem.replace_with(email)
 
 
 def _unmangle(hex_string: str) -> str:
@@ -49,8 +49,12 @@ EMOJI_IMG_SRC_RX = re.compile(r'.*/smiley/images/([^/]*).png')
 
 def replace_emoji_imgs(element: Tag) -> None:
     for img in element.find_all('img'):
-        match = EMOJI_IMG_SRC_RX.match(img.get('src', ''))
-        if match:
-            emoji = EMOJI_MAP.get(match.group(1))
-            if emoji:
-                img.replace_with(emoji)
+        replace_emoji_img(img)
+
+
+def replace_emoji_img(img: Tag) -> None:
+    match = EMOJI_IMG_SRC_RX.match(img.get('src', ''))
+    if match:
+        emoji = EMOJI_MAP.get(match.group(1))
+        if emoji:
+            img.replace_with(emoji)
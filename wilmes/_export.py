@@ -0,0 +1,277 @@
+"""
+Streaming export of messages and news items to archive formats.
+
+The writers take an iterable of items and write each item as soon as
+it is received, so that the memory use does not depend on the number
+of exported items.
+"""
+import csv
+import email.policy
+import email.utils
+import json
+import re
+import urllib.parse
+from datetime import datetime, timezone
+from email.message import EmailMessage
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+from ._client import Connection
+from ._serialization import (
+    JsonDict,
+    datetime_to_str,
+    message_to_dict,
+    news_item_to_dict,
+)
+from ._types import Message, NewsItem, Person, PupilId, ReplyMessage
+
+ExportItem = Union[Message, NewsItem]
+Writer = Callable[[Iterable[ExportItem], TextIO], int]
+
+CSV_COLUMNS = [
+    'kind', 'origin', 'pupil_id', 'id', 'reply_number', 'subject',
+    'timestamp', 'last_timestamp', 'folder', 'sender_name', 'sender_id',
+    'sender_type', 'recipients', 'reply_count', 'is_unread', 'body']
+
+_MBOX_FROM_LINE_RX = re.compile(r'^(>*From )', re.MULTILINE)
+
+_CsvRow = List[object]
+
+
+def iter_export_items(
+        connection: Connection,
+        pupil_ids: Optional[Iterable[PupilId]] = None,
+        since: Optional[datetime] = None,
+        *,
+        news: bool = True,
+) -> Iterator[ExportItem]:
+    """
+    Iterate the messages and news items of the pupils for exporting.
+
+    The messages of each pupil are followed by its news items.  The
+    items are fetched as the iteration proceeds.
+    """
+    for pupil_id in (connection.pupils if pupil_ids is None else pupil_ids):
+        yield from connection.iter_messages(pupil_id, since)
+        if news:
+            yield from connection.iter_news(pupil_id, since)
+
+
+def write_jsonl(items: Iterable[ExportItem], fp: TextIO) -> int:
+    """
+    Write the items as JSON Lines.
+
+    Each line is the JSON serialization of an item, as used by the
+    message store, with a "kind" key of "message" or "news_item".
+
+    Return the number of written items.
+    """
+    count = 0
+    for item in items:
+        fp.write(json.dumps(_item_to_dict(item), ensure_ascii=False))
+        fp.write('\n')
+        count += 1
+    return count
+
+
+def write_mbox(items: Iterable[ExportItem], fp: TextIO) -> int:
+    """
+    Write the items to a mbox file in the mboxrd format.
+
+    Every message, reply and news item is written as an email with
+    plain text and HTML versions of the body.  The replies refer to
+    their message with the In-Reply-To header.
+
+    Return the number of written items.
+    """
+    count = 0
+    for item in items:
+        if isinstance(item, Message):
+            _write_mbox_entry(fp, item.timestamp, _message_to_email(item))
+            for (n, reply) in enumerate(item.replies, 1):
+                _write_mbox_entry(
+                    fp, reply.timestamp, _reply_to_email(item, n, reply))
+        else:
+            _write_mbox_entry(fp, item.timestamp, _news_item_to_email(item))
+        count += 1
+    return count
+
+
+def write_csv(items: Iterable[ExportItem], fp: TextIO) -> int:
+    """
+    Write the items as CSV with a row per message, reply and news item.
+
+    The rows of the replies follow the row of their message and have
+    the reply number set.  The recipients are joined with "; ".
+
+    Return the number of written items.
+    """
+    writer = csv.writer(fp, lineterminator='\n')
+    writer.writerow(CSV_COLUMNS)
+    count = 0
+    for item in items:
+        if isinstance(item, Message):
+            writer.writerow(_get_message_row(item))
+            writer.writerows(
+                _get_reply_row(item, n, reply)
+                for (n, reply) in enumerate(item.replies, 1))
+        else:
+            writer.writerow(_get_news_item_row(item))
+        count += 1
+    return count
+
+
+EXPORT_FORMATS: Dict[str, Writer] = {
+    'jsonl': write_jsonl,
+    'mbox': write_mbox,
+    'csv': write_csv,
+}
+
+
+def _item_to_dict(item: ExportItem) -> JsonDict:
+    if isinstance(item, Message):
+        return {'kind': 'message', **message_to_dict(item)}
+    return {'kind': 'news_item', **news_item_to_dict(item)}
+
+
+def _message_to_email(message: Message) -> EmailMessage:
+    host = _get_host(message.origin)
+    result = _make_email(host, message.subject, message)
+    if message.recipients:
+        result['To'] = ', '.join(
+            _format_address(x, host) for x in message.recipients)
+    result['Message-ID'] = _get_message_id(host, message)
+    result['X-Wilmes-Pupil'] = message.pupil_id
+    result['X-Wilmes-Folder'] = _clean_header(message.folder)
+    return result
+
+
+def _reply_to_email(
+        message: Message,
+        number: int,
+        reply: ReplyMessage,
+) -> EmailMessage:
+    host = _get_host(message.origin)
+    message_id = _get_message_id(host, message)
+    result = _make_email(host, f'Re: {message.subject}', reply)
+    result['Message-ID'] = _get_message_id(host, message, number)
+    result['In-Reply-To'] = message_id
+    result['References'] = message_id
+    result['X-Wilmes-Pupil'] = message.pupil_id
+    result['X-Wilmes-Folder'] = _clean_header(message.folder)
+    return result
+
+
+def _news_item_to_email(news_item: NewsItem) -> EmailMessage:
+    host = _get_host(news_item.origin)
+    result = _make_email(host, news_item.subject, news_item)
+    result['Message-ID'] = (
+        f'<news-{news_item.pupil_id}-{news_item.id}@{host}>')
+    result['X-Wilmes-Pupil'] = news_item.pupil_id
+    return result
+
+
+def _make_email(
+        host: str,
+        subject: str,
+        item: Union[Message, ReplyMessage, NewsItem],
+) -> EmailMessage:
+    """
+    Make an email of the headers and body shown by `to_text`.
+    """
+    result = EmailMessage(policy=email.policy.default)
+    result['Subject'] = _clean_header(subject)
+    result['Date'] = email.utils.format_datetime(item.timestamp)
+    result['From'] = _format_address(item.sender, host)
+    result.set_content(item.get_cleaned_body_text())
+    result.add_alternative(item.body, subtype='html')
+    return result
+
+
+def _write_mbox_entry(
+        fp: TextIO,
+        timestamp: datetime,
+        email_message: EmailMessage,
+) -> None:
+    date = timestamp.astimezone(timezone.utc).strftime('%a %b %d %H:%M:%S %Y')
+    fp.write(f'From wilmes {date}\n')
+    fp.write(_MBOX_FROM_LINE_RX.sub(r'>\1', email_message.as_string()))
+    fp.write('\n')
+
+
+def _get_host(origin: str) -> str:
+    return urllib.parse.urlsplit(origin).hostname or 'localhost'
+
+
+def _get_message_id(host: str, message: Message, reply: int = 0) -> str:
+    suffix = f'-{reply}' if reply else ''
+    return f'<message-{message.pupil_id}-{message.id}{suffix}@{host}>'
+
+
+def _format_address(person: Person, host: str) -> str:
+    """
+    Format a person as an email address.
+
+    The persons have no email addresses on the site, so the address is
+    made of the profile type and id, or "unknown" if they are missing.
+    """
+    local_part = (
+        f'{person.type or "user"}-{person.id}' if person.id is not None
+        else 'unknown')
+    return email.utils.formataddr(
+        (_clean_header(person.name), f'{local_part}@{host}'))
+
+
+def _clean_header(value: str) -> str:
+    """
+    Collapse the whitespace of a header value to single spaces.
+
+    The email policy does not allow line breaks in the header values.
+    """
+    return ' '.join(value.split())
+
+
+def _get_message_row(message: Message) -> _CsvRow:
+    return [
+        'message', message.origin, message.pupil_id, message.id, '',
+        message.subject, datetime_to_str(message.timestamp),
+        datetime_to_str(message.last_timestamp), message.folder,
+        *_get_person_columns(message.sender),
+        '; '.join(x.name for x in message.recipients),
+        message.reply_count, message.is_unread, message.body]
+
+
+def _get_reply_row(
+        message: Message,
+        number: int,
+        reply: ReplyMessage,
+) -> _CsvRow:
+    return [
+        'reply', message.origin, message.pupil_id, message.id, number,
+        message.subject, datetime_to_str(reply.timestamp), '',
+        message.folder, *_get_person_columns(reply.sender), '', '', '',
+        reply.body]
+
+
+def _get_news_item_row(news_item: NewsItem) -> _CsvRow:
+    return [
+        'news_item', news_item.origin, news_item.pupil_id, news_item.id, '',
+        news_item.subject, datetime_to_str(news_item.timestamp), '', '',
+        *_get_person_columns(news_item.sender), '', '', news_item.is_unread,
+        news_item.body]
+
+
+def _get_person_columns(person: Person) -> Tuple[str, object, object]:
+    return (
+        person.name,
+        '' if person.id is None else person.id,
+        person.type or '')
@@ -0,0 +1,272 @@
+"""
+Checking the front page of the site with the standard library only.
+
+Getting the new message counts needs just a login and the links of
+the front page.  Doing that here, without the HTTP and HTML parsing
+libraries used for fetching the messages, keeps the start-up of e.g.
+"wilmes --check-only" fast.  The link parsing rules are shared with
+the connections.
+"""
+import html.parser
+import re
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass
+from http.cookiejar import CookieJar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ._session_store import SessionStore
+from ._types import Pupil, PupilId
+
+PUPIL_LINK_RX = re.compile(r'^/!(\d+)/?$')
+MESSAGE_NOTIFICATION_LINK_RX = re.compile(r'^/!(\d+)/messages$')
+
+ENGLISH_LANG_ID = 3
+SESSION_COOKIE = 'Wilma2LoginID'
+TOKEN_PATH = '/token'
+LOGIN_PAGE_PATH = f'/?langid={ENGLISH_LANG_ID}'
+LOGOUT_PATH = '/logout'
+LOGIN_FORM_CLASS = 'login-form'
+LOGIN_FORM_SELECTOR = f'.{LOGIN_FORM_CLASS}'
+DEFAULT_TIMEOUT = 30.0
+
+Link = Tuple[str, str]  # (href, text)
+
+_VOID_ELEMENTS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'source', 'track', 'wbr'])
+
+
+@dataclass
+class FrontPageStatus:
+    pupils: Dict[PupilId, Pupil]
+    new_message_counts: Dict[PupilId, int]
+
+
+def check_front_page(
+        url: str,
+        username: str,
+        password: str,
+        *,
+        session_store: Optional[SessionStore] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+) -> FrontPageStatus:
+    """
+    Get the pupils and their new message counts from the front page.
+
+    If a session store is given, the saved session is tried before
+    logging in and the session is saved back instead of logging out,
+    as done by `Client.connect` when reusing the session.
+    """
+    cookiejar = CookieJar()
+    opener = urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(cookiejar))
+    page: Optional[FrontPageParser] = None
+    if session_store and session_store.load(cookiejar):
+        try:
+            page = _get_page(opener, f'{url}/', timeout=timeout)
+        except urllib.error.HTTPError:
+            page = None
+        if page and not page.is_logged_in:
+            page = None
+    if page is None:
+        page = _log_in(opener, cookiejar, url, username, password, timeout)
+    check_language(page.links)
+    status = FrontPageStatus(
+        pupils=parse_pupils(page.links),
+        new_message_counts=parse_new_message_counts(page.links))
+    if session_store:
+        session_store.save(cookiejar)
+    else:
+        opener.open(f'{url}{LOGOUT_PATH}', b'', timeout=timeout).close()
+    return status
+
+
+def check_language(links: Iterable[Link]) -> None:
+    for (href, text) in links:
+        if href.endswith('passwd/settings'):
+            if text == "Account settings":
+                return
+            raise Exception(
+                f"Invalid language: 'Account settings' is {text!r}")
+    raise Exception("Cannot find element for checking language")
+
+
+def parse_pupils(links: Iterable[Link]) -> Dict[PupilId, Pupil]:
+    """
+    Get list of pupils.
+    """
+    pupil_map: Dict[PupilId, str] = {}
+    for (href, text) in links:
+        match = PUPIL_LINK_RX.match(href)
+        if match:
+            pupil_id = PupilId(match.group(1))
+            if pupil_id not in pupil_map:
+                pupil_map[pupil_id] = text
+    return {id: Pupil(id, name) for (id, name) in pupil_map.items()}
+
+
+def parse_new_message_counts(links: Iterable[Link]) -> Dict[PupilId, int]:
+    result: Dict[PupilId, int] = {}
+    for (href, text) in links:
+        match = MESSAGE_NOTIFICATION_LINK_RX.match(href)
+        if match:
+            pupil_id = PupilId(match.group(1))
+            first_word = text.split()[0]
+            if first_word.isdigit():
+                amount = int(first_word)
+                result[pupil_id] = amount
+    return result
+
+
+def get_login_fields(
+        username: str,
+        password: str,
+        session_id: Optional[str],
+) -> Dict[str, str]:
+    """
+    Get the values to fill in the login form.
+
+    The session id is the value of the session cookie set by the
+    login page.
+    """
+    if session_id is None:
+        raise Exception(f'Cannot find {SESSION_COOKIE} cookie for SESSIONID')
+    return {'Login': username, 'Password': password, 'SESSIONID': session_id}
+
+
+def check_login_result(response_url: str) -> None:
+    parsed_url = urllib.parse.urlparse(response_url)
+    query = urllib.parse.parse_qs(parsed_url.query, keep_blank_values=True)
+    if 'loginfailed' in query:
+        raise Exception('Login failed')
+    if parsed_url.query:
+        raise Exception('Unexpected result')
+
+
+class FrontPageParser(html.parser.HTMLParser):
+    """
+    Parser collecting the links and the login form of a page.
+
+    The nesting of the elements is tracked only as far as needed for
+    finding the name of the logged in user.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.links: List[Link] = []
+        self.has_login_form = False
+        self.login_form_action = ''
+        self.login_form_fields: List[Tuple[str, str]] = []
+        self.has_own_name = False
+        self._depth = 0
+        self._name_container_depth: Optional[int] = None
+        self._in_login_form = False
+        self._has_submit = False
+        self._link_href: Optional[str] = None
+        self._link_text: List[str] = []
+
+    @property
+    def is_logged_in(self) -> bool:
+        return not self.has_login_form and self.has_own_name
+
+    def handle_starttag(
+            self,
+            tag: str,
+            attrs: List[Tuple[str, Optional[str]]],
+    ) -> None:
+        attr_map = dict(attrs)
+        classes = (attr_map.get('class') or '').split()
+        if tag == 'a' and 'href' in attr_map:
+            self._link_href = attr_map['href'] or ''
+            self._link_text = []
+        if LOGIN_FORM_CLASS in classes:
+            self.has_login_form = True
+            if tag == 'form':
+                self._in_login_form = True
+                self.login_form_action = attr_map.get('action') or ''
+        if self._in_login_form and tag == 'input':
+            self._add_login_form_field(attr_map)
+        if self._name_container_depth is not None and 'teacher' in classes:
+            self.has_own_name = True
+        if 'name-container' in classes and self._name_container_depth is None:
+            self._name_container_depth = self._depth
+        if tag not in _VOID_ELEMENTS:
+            self._depth += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _VOID_ELEMENTS:
+            return
+        self._depth -= 1
+        if (self._name_container_depth is not None
+                and self._depth <= self._name_container_depth):
+            self._name_container_depth = None
+        if tag == 'a' and self._link_href is not None:
+            self.links.append((self._link_href, ''.join(self._link_text)))
+            self._link_href = None
+        elif tag == 'form':
+            self._in_login_form = False
+
+    def handle_data(self, data: str) -> None:
+        if self._link_href is not None:
+            self._link_text.append(data)
+
+    def _add_login_form_field(
+            self,
+            attr_map: Dict[str, Optional[str]],
+    ) -> None:
+        name = attr_map.get('name')
+        input_type = (attr_map.get('type') or 'text').lower()
+        if not name or input_type in ('button', 'reset', 'image'):
+            return
+        if input_type in ('checkbox', 'radio') and 'checked' not in attr_map:
+            return
+        if input_type == 'submit':
+            # Only the first submit button is sent, like by a browser
+            if self._has_submit:
+                return
+            self._has_submit = True
+        self.login_form_fields.append((name, attr_map.get('value') or ''))
+
+
+def _log_in(
+        opener: urllib.request.OpenerDirector,
+        cookiejar: CookieJar,
+        url: str,
+        username: str,
+        password: str,
+        timeout: float,
+) -> FrontPageParser:
+    opener.open(f'{url}{TOKEN_PATH}', timeout=timeout).close()
+    login_page_url = f'{url}{LOGIN_PAGE_PATH}'
+    login_page = _get_page(opener, login_page_url, timeout=timeout)
+    if not login_page.has_login_form:
+        raise Exception('Cannot find the login form')
+    session_id = next(
+        (x.value for x in cookiejar if x.name == SESSION_COOKIE), None)
+    fields = dict(login_page.login_form_fields)
+    fields.update(get_login_fields(username, password, session_id))
+    return _get_page(
+        opener, urllib.parse.urljoin(
+            login_page_url, login_page.login_form_action),
+        urllib.parse.urlencode(fields).encode('utf-8'),
+        timeout=timeout, check_login=True)
+
+
+def _get_page(
+        opener: urllib.request.OpenerDirector,
+        url: str,
+        data: Optional[bytes] = None,
+        *,
+        timeout: float,
+        check_login: bool = False,
+) -> FrontPageParser:
+    with opener.open(url, data, timeout=timeout) as response:
+        if check_login:
+            check_login_result(response.geturl())
+        charset = response.headers.get_content_charset() or 'utf-8'
+        content = response.read().decode(charset, errors='replace')
+    parser = FrontPageParser()
+    parser.feed(content)
+    parser.close()
+    return parser
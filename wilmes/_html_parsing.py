@@ -0,0 +1,105 @@
+from typing import Callable, Dict, Mapping, Optional, Protocol, Sequence, Union
+
+import bs4
+from bs4.element import SoupStrainer
+
+PARSER_FEATURES = 'lxml'
+
+
+class HtmlParser(Protocol):
+    """
+    Backend for parsing the fetched HTML pages.
+
+    The regions are simple selectors, i.e. a tag name, "#id" or
+    ".class", of the elements which are needed from the page.  The
+    parser may leave out everything else, but it must keep the
+    regions inside a body element in their original order.
+    """
+    def parse(
+            self,
+            markup: bytes,
+            encoding: Optional[str] = None,
+            regions: Optional[Sequence[str]] = None,
+    ) -> bs4.BeautifulSoup: ...
+
+
+class FullHtmlParser:
+    """
+    Parser building a BeautifulSoup tree of the whole page.
+    """
+    def parse(
+            self,
+            markup: bytes,
+            encoding: Optional[str] = None,
+            regions: Optional[Sequence[str]] = None,
+    ) -> bs4.BeautifulSoup:
+        return bs4.BeautifulSoup(
+            markup, features=PARSER_FEATURES, from_encoding=encoding)
+
+
+class RegionHtmlParser:
+    """
+    Parser building a BeautifulSoup tree of the given regions only.
+
+    Skipping the rest of the page with a SoupStrainer makes parsing
+    considerably faster, since building the tree dominates the
+    parsing time.
+    """
+    def parse(
+            self,
+            markup: bytes,
+            encoding: Optional[str] = None,
+            regions: Optional[Sequence[str]] = None,
+    ) -> bs4.BeautifulSoup:
+        if regions is None:
+            return FULL_HTML_PARSER.parse(markup, encoding)
+        strainer = SoupStrainer(_make_region_matcher(regions))
+        soup = bs4.BeautifulSoup(
+            markup, features=PARSER_FEATURES, from_encoding=encoding,
+            parse_only=strainer)
+        body = soup.new_tag('body')
+        for element in list(soup.contents):
+            body.append(element.extract())
+        soup.append(body)
+        return soup
+
+
+FULL_HTML_PARSER = FullHtmlParser()
+REGION_HTML_PARSER = RegionHtmlParser()
+DEFAULT_HTML_PARSER: HtmlParser = REGION_HTML_PARSER
+
+HTML_PARSERS: Dict[str, HtmlParser] = {
+    'full': FULL_HTML_PARSER,
+    'regions': REGION_HTML_PARSER,
+}
+
+_AttrValue = Union[str, Sequence[str], None]
+
+
+def _make_region_matcher(
+        regions: Sequence[str],
+) -> Callable[[str, Mapping[str, _AttrValue]], bool]:
+    names = set()
+    ids = set()
+    classes = set()
+    for region in regions:
+        if region.startswith('#'):
+            ids.add(region[1:])
+        elif region.startswith('.'):
+            classes.add(region[1:])
+        else:
+            names.add(region)
+
+    def matches(name: str, attrs: Mapping[str, _AttrValue]) -> bool:
+        if name in names:
+            return True
+        if ids and attrs.get('id') in ids:
+            return True
+        if classes:
+            class_value = attrs.get('class') or ()
+            if isinstance(class_value, str):
+                class_value = class_value.split()
+            return not classes.isdisjoint(class_value)
+        return False
+
+    return matches
@@ -0,0 +1,110 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Mapping, Optional, TypeVar
+
+import requests
+
+DEFAULT_MAX_ENTRIES = 1024
+
+_R = TypeVar('_R')
+
+
+@dataclass
+class CacheEntry:
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: str
+    value: Any
+
+
+class HttpCache:
+    """
+    Cache of fetched pages and the objects parsed from them.
+
+    The pages are requested conditionally with the ETag and
+    Last-Modified validators sent by the server.  If the server does
+    not send validators or sends the page anyway, the page is
+    compared to the cached one by a hash of its content.  When the
+    page is unchanged, the previously parsed object is reused instead
+    of parsing the page again.
+
+    The cache is kept in memory and the least recently used entries
+    are dropped when there are more than max_entries of them.
+    """
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.not_modified_count = 0
+        self.unchanged_count = 0
+        self.miss_count = 0
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def fetch(
+            self,
+            url: str,
+            fetch: Callable[[Mapping[str, str]], requests.Response],
+            parse: Callable[[requests.Response], _R],
+            reuse: Callable[[_R], _R],
+    ) -> _R:
+        """
+        Fetch and parse a page, reusing the cached object if possible.
+
+        The fetch function gets the headers to add to the request.
+        The reuse function gets the cached object and returns the
+        object to return for it, e.g. a copy of it.
+        """
+        entry = self._get(url)
+        response = fetch(_get_validator_headers(entry) if entry else {})
+        if entry and response.status_code == 304:
+            with self._lock:
+                self.not_modified_count += 1
+            return reuse(entry.value)
+        content_hash = hashlib.blake2b(
+            response.content, digest_size=16).hexdigest()
+        if entry and entry.content_hash == content_hash:
+            with self._lock:
+                self.unchanged_count += 1
+            value = entry.value
+            result = reuse(value)
+        else:
+            with self._lock:
+                self.miss_count += 1
+            value = result = parse(response)
+        self._put(url, CacheEntry(
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+            content_hash=content_hash,
+            value=value))
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, url: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry:
+                self._entries.move_to_end(url)
+            return entry
+
+    def _put(self, url: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _get_validator_headers(entry: CacheEntry) -> Dict[str, str]:
+    headers = {}
+    if entry.etag:
+        headers['If-None-Match'] = entry.etag
+    if entry.last_modified:
+        headers['If-Modified-Since'] = entry.last_modified
+    return headers
@@ -0,0 +1,260 @@
+"""
+Instrumentation of the requests and the parsing done by connections.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+)
+
+import requests
+
+from ._serialization import JsonDict
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0)
+
+
+@dataclass
+class RequestEvent:
+    """
+    HTTP request done by a connection.
+
+    The URL template is the path before the ids were filled in, e.g.
+    "/!{pupil_id}/messages/list".  The status is None if the request
+    failed without a response.
+    """
+    url_template: str
+    url: str
+    method: str
+    status: Optional[int]
+    bytes: int
+    seconds: float
+
+
+@dataclass
+class ParseEvent:
+    """
+    Parsing phase done by a connection.
+
+    The "html" phase, i.e. building the tree of a fetched page, has
+    the URL template of the page.
+    """
+    phase: str
+    seconds: float
+    url_template: Optional[str] = None
+
+
+class Observer(Protocol):
+    """
+    Receiver of the instrumentation events of a connection.
+
+    The methods are called from the threads doing the work, so they
+    should be fast and thread safe.
+    """
+    def on_request(self, event: RequestEvent) -> None: ...
+
+    def on_parse(self, event: ParseEvent) -> None: ...
+
+
+def observe_request(
+        observer: Optional[Observer],
+        url_template: str,
+        method: str,
+        url: str,
+        send: Callable[[], requests.Response],
+) -> requests.Response:
+    if observer is None:
+        return send()
+    start = time.perf_counter()
+    status: Optional[int] = None
+    size = 0
+    try:
+        response = send()
+        status = response.status_code
+        # The content is already read by send, unless streaming
+        size = len(response.content)
+        return response
+    finally:
+        observer.on_request(RequestEvent(
+            url_template=url_template,
+            url=url,
+            method=method,
+            status=status,
+            bytes=size,
+            seconds=time.perf_counter() - start))
+
+
+@contextmanager
+def observe_parse(
+        observer: Optional[Observer],
+        phase: str,
+        url_template: Optional[str] = None,
+) -> Iterator[None]:
+    if observer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observer.on_parse(ParseEvent(
+            phase, time.perf_counter() - start, url_template))
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def get_cumulative_counts(self) -> List[Tuple[str, int]]:
+        """
+        Get the cumulative counts of the buckets by their upper bound.
+
+        The last bucket, "+Inf", contains all the observations.
+        """
+        result: List[Tuple[str, int]] = []
+        total = 0
+        for (bound, count) in zip(self.buckets, self.counts):
+            total += count
+            result.append((repr(bound), total))
+        result.append(('+Inf', self.count))
+        return result
+
+    def to_dict(self) -> JsonDict:
+        return {
+            'buckets': dict(self.get_cumulative_counts()),
+            'sum': self.sum,
+            'count': self.count,
+        }
+
+
+class MetricsCollector:
+    """
+    Observer collecting the events to histograms.
+
+    The request durations are collected per URL template and status,
+    and the parse durations per phase.  The collected metrics can be
+    dumped as JSON or in the Prometheus text format.
+    """
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.request_seconds: Dict[Tuple[str, str], Histogram] = {}
+        self.response_bytes: Dict[str, int] = {}
+        self.parse_seconds: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def on_request(self, event: RequestEvent) -> None:
+        key = (event.url_template, str(event.status or 'error'))
+        with self._lock:
+            histogram = self.request_seconds.get(key)
+            if histogram is None:
+                histogram = self.request_seconds[key] = Histogram(
+                    self.buckets)
+            histogram.observe(event.seconds)
+            self.response_bytes[event.url_template] = (
+                self.response_bytes.get(event.url_template, 0)
+                + event.bytes)
+
+    def on_parse(self, event: ParseEvent) -> None:
+        key = (event.phase, event.url_template or '')
+        with self._lock:
+            histogram = self.parse_seconds.get(key)
+            if histogram is None:
+                histogram = self.parse_seconds[key] = Histogram(self.buckets)
+            histogram.observe(event.seconds)
+
+    def to_dict(self) -> JsonDict:
+        with self._lock:
+            return {
+                'requests': [
+                    {'url_template': url_template, 'status': status,
+                     **histogram.to_dict()}
+                    for ((url_template, status), histogram)
+                    in sorted(self.request_seconds.items())
+                ],
+                'response_bytes': [
+                    {'url_template': url_template, 'bytes': size}
+                    for (url_template, size)
+                    in sorted(self.response_bytes.items())
+                ],
+                'parsing': [
+                    {'phase': phase, 'url_template': url_template or None,
+                     **histogram.to_dict()}
+                    for ((phase, url_template), histogram)
+                    in sorted(self.parse_seconds.items())
+                ],
+            }
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            _add_prometheus_histogram(
+                lines, 'wilmes_request_duration_seconds',
+                'Duration of the HTTP requests',
+                {(('url', url_template), ('status', status)): histogram
+                 for ((url_template, status), histogram)
+                 in sorted(self.request_seconds.items())})
+            lines.append(
+                '# HELP wilmes_response_bytes_total '
+                'Size of the HTTP responses')
+            lines.append('# TYPE wilmes_response_bytes_total counter')
+            for (url_template, size) in sorted(self.response_bytes.items()):
+                labels = _format_labels((('url', url_template),))
+                lines.append(f'wilmes_response_bytes_total{labels} {size}')
+            _add_prometheus_histogram(
+                lines, 'wilmes_parse_duration_seconds',
+                'Duration of the parsing phases',
+                {(('phase', phase), ('url', url_template)): histogram
+                 for ((phase, url_template), histogram)
+                 in sorted(self.parse_seconds.items())})
+        return ''.join(f'{line}\n' for line in lines)
+
+
+_Labels = Tuple[Tuple[str, str], ...]
+
+
+def _add_prometheus_histogram(
+        lines: List[str],
+        name: str,
+        description: str,
+        histograms: Dict[_Labels, Histogram],
+) -> None:
+    lines.append(f'# HELP {name} {description}')
+    lines.append(f'# TYPE {name} histogram')
+    for (labels, histogram) in histograms.items():
+        for (bound, count) in histogram.get_cumulative_counts():
+            bucket_labels = _format_labels(labels + (('le', bound),))
+            lines.append(f'{name}_bucket{bucket_labels} {count}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {histogram.sum!r}')
+        lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+
+
+def _format_labels(labels: _Labels) -> str:
+    formatted = [
+        f'{name}="{_escape_label_value(value)}"'
+        for (name, value) in labels if value]
+    return '{' + ','.join(formatted) + '}' if formatted else ''
+
+
+def _escape_label_value(value: str) -> str:
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
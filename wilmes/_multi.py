@@ -0,0 +1,248 @@
+"""
+Polling of several accounts concurrently.
+"""
+import collections
+import os
+import queue
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Union,
+)
+
+from ._client import Client, Connection
+from ._html_parsing import DEFAULT_HTML_PARSER, HtmlParser
+from ._session_store import SessionStore
+from ._types import Message, Pupil
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_PER_ORIGIN = 2
+
+
+@dataclass
+class Account:
+    name: str
+    url: str
+    username: str
+    password: str
+    session_file: Optional[str] = None
+
+    @property
+    def origin(self) -> str:
+        return urllib.parse.urlsplit(self.url).netloc.lower()
+
+
+@dataclass
+class AccountMessage:
+    """
+    New message of an account.
+    """
+    account: str
+    pupil: Pupil
+    message: Message
+
+
+@dataclass
+class AccountResult:
+    """
+    Outcome of polling an account.
+
+    The wait time is the time from the start of the polling until the
+    account got its turn, i.e. the time spent waiting for the
+    concurrency limit of the origin and for a free worker.  The login
+    and total times do not include it.
+    """
+    account: str
+    message_count: int = 0
+    wait_seconds: float = 0.0
+    login_seconds: float = 0.0
+    total_seconds: float = 0.0
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+AccountEvent = Union[AccountMessage, AccountResult]
+
+
+class MultiClient:
+    """
+    Client for polling new messages of several accounts concurrently.
+
+    Each account is polled in a worker thread of its own, so that a
+    slow login of one account does not hold up the others.  The
+    number of accounts polled at once from the same site is limited
+    by max_per_origin.  The accounts waiting for that limit are kept
+    in a queue per site and do not occupy the workers, so the
+    accounts of the other sites get polled meanwhile.
+    """
+    def __init__(
+            self,
+            accounts: Iterable[Account],
+            *,
+            max_workers: int = DEFAULT_MAX_WORKERS,
+            max_per_origin: int = DEFAULT_MAX_PER_ORIGIN,
+            jobs_per_account: int = 1,
+            html_parser: HtmlParser = DEFAULT_HTML_PARSER,
+    ) -> None:
+        self.accounts = list(accounts)
+        self.max_workers = max_workers
+        self.max_per_origin = max_per_origin
+        self.jobs_per_account = jobs_per_account
+        self.html_parser = html_parser
+
+    def iter_new_messages(self) -> Iterator[AccountEvent]:
+        """
+        Iterate the new messages of all accounts as they are fetched.
+
+        The messages of the accounts are interleaved in the order they
+        are fetched.  After the last message of an account, an
+        AccountResult is yielded for it.  Failures are reported only
+        in the AccountResult, i.e. a failing account does not stop the
+        iteration.
+        """
+        if not self.accounts:
+            return
+        events: 'queue.Queue[AccountEvent]' = queue.Queue()
+        stop = threading.Event()
+        pending: Dict[str, Deque[Account]] = {}
+        for account in self.accounts:
+            pending.setdefault(
+                account.origin, collections.deque()).append(account)
+        lock = threading.Lock()
+        executor = ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix='wilmes-account')
+        enqueued = time.monotonic()
+
+        def submit_next(origin: str) -> None:
+            with lock:
+                if stop.is_set() or not pending[origin]:
+                    return
+                future = executor.submit(
+                    self._poll_account, pending[origin].popleft(),
+                    enqueued, events, stop)
+            # Give the slot of the origin to its next account when done
+            future.add_done_callback(lambda _: submit_next(origin))
+
+        try:
+            for origin in pending:
+                for _ in range(self.max_per_origin):
+                    submit_next(origin)
+            remaining = len(self.accounts)
+            while remaining:
+                event = events.get()
+                if isinstance(event, AccountResult):
+                    remaining -= 1
+                yield event
+        finally:
+            # Let the workers finish early, if the iteration is stopped
+            with lock:
+                stop.set()
+            executor.shutdown(wait=False)
+
+    def _poll_account(
+            self,
+            account: Account,
+            enqueued: float,
+            events: 'queue.Queue[AccountEvent]',
+            stop: threading.Event,
+    ) -> None:
+        if stop.is_set():
+            return
+        started = time.monotonic()
+        result = AccountResult(account.name, wait_seconds=started - enqueued)
+        try:
+            with self._connect(account) as connection:
+                result.login_seconds = time.monotonic() - started
+                for (pupil, message) in connection.iter_new_messages():
+                    if stop.is_set():
+                        break
+                    events.put(AccountMessage(account.name, pupil, message))
+                    result.message_count += 1
+        except Exception as error:
+            result.error = error
+        result.total_seconds = time.monotonic() - started
+        events.put(result)
+
+    def _connect(self, account: Account) -> Connection:
+        session_store = (
+            SessionStore(account.session_file) if account.session_file
+            else None)
+        client = Client(
+            account.url, account.username, account.password,
+            max_workers=self.jobs_per_account, session_store=session_store,
+            html_parser=self.html_parser)
+        return client.connect(reuse_session=bool(session_store))
+
+
+def load_accounts(
+        path: str,
+        get_password: Optional[Callable[[str], str]] = None,
+) -> List[Account]:
+    """
+    Load accounts from a TOML file.
+
+    The file should have an "accounts" array of tables with the keys
+    "url", "username" and optionally "name", "password",
+    "password_env" (name of an environment variable containing the
+    password) and "session_file".  If an account has no password,
+    it is asked with get_password, which gets the account name.
+    """
+    config = _load_toml(path)
+    accounts: List[Account] = []
+    for (n, entry) in enumerate(config.get('accounts', [])):
+        try:
+            url = entry['url']
+            username = entry['username']
+        except KeyError as error:
+            raise ValueError(
+                f'Account {n + 1} in {path} has no {error.args[0]}')
+        name = entry.get('name') or f'{username}@{url}'
+        password = _get_account_password(name, entry, get_password)
+        accounts.append(Account(
+            name=name,
+            url=url,
+            username=username,
+            password=password,
+            session_file=entry.get('session_file'),
+        ))
+    return accounts
+
+
+def _get_account_password(
+        name: str,
+        entry: Dict[str, Any],
+        get_password: Optional[Callable[[str], str]],
+) -> str:
+    password: Optional[str] = entry.get('password')
+    password_env = entry.get('password_env')
+    if password is None and password_env:
+        password = os.environ.get(password_env)
+    if password is None and get_password:
+        password = get_password(name)
+    if password is None:
+        raise ValueError(f'No password for account {name}')
+    return password
+
+
+def _load_toml(path: str) -> Dict[str, Any]:
+    if sys.version_info >= (3, 11):
+        import tomllib
+    else:
+        import tomli as tomllib
+    with open(path, 'rb') as fp:
+        return tomllib.load(fp)
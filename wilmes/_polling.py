@@ -0,0 +1,81 @@
+"""
+Scheduling of the polls done by a long-running watch.
+"""
+from datetime import datetime, time, timedelta
+from typing import Optional
+
+from ._settings import TZ
+
+DEFAULT_MIN_INTERVAL = 60.0
+DEFAULT_MAX_INTERVAL = 900.0
+DEFAULT_NIGHT_INTERVAL = 3600.0
+
+
+class PollSchedule:
+    """
+    Adaptive interval between the polls.
+
+    The interval is min_interval after a poll which found something
+    new and otherwise grows by the backoff factor up to max_interval.
+
+    From night_start to night_end, in the time zone of the site, the
+    interval is stretched to night_interval, but not past the end of
+    the night.  The night is skipped if night_interval is None.
+    """
+    def __init__(
+            self,
+            min_interval: float = DEFAULT_MIN_INTERVAL,
+            max_interval: float = DEFAULT_MAX_INTERVAL,
+            *,
+            backoff: float = 2.0,
+            night_interval: Optional[float] = DEFAULT_NIGHT_INTERVAL,
+            night_start: time = time(22),
+            night_end: time = time(6),
+    ) -> None:
+        if not 0 < min_interval <= max_interval:
+            raise ValueError(
+                'Intervals should satisfy 0 < min_interval <= max_interval')
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.night_interval = night_interval
+        self.night_start = night_start
+        self.night_end = night_end
+        self.interval = min_interval
+
+    def next_interval(
+            self,
+            active: bool,
+            now: Optional[datetime] = None,
+    ) -> float:
+        """
+        Get the number of seconds to wait before the next poll.
+
+        The active flag tells if the previous poll found something.
+        """
+        if active:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(
+                self.interval * self.backoff, self.max_interval)
+        if self.night_interval is None:
+            return self.interval
+        local_now = (now or datetime.now(TZ)).astimezone(TZ)
+        if not self._is_night(local_now.time()):
+            return self.interval
+        until_morning = self._get_night_end(local_now) - local_now
+        return max(self.interval, min(
+            self.night_interval, until_morning.total_seconds()))
+
+    def _is_night(self, moment: time) -> bool:
+        if self.night_start <= self.night_end:
+            return self.night_start <= moment < self.night_end
+        return moment >= self.night_start or moment < self.night_end
+
+    def _get_night_end(self, local_now: datetime) -> datetime:
+        night_end = TZ.localize(
+            datetime.combine(local_now.date(), self.night_end))
+        if night_end <= local_now:
+            night_end = TZ.localize(datetime.combine(
+                local_now.date() + timedelta(days=1), self.night_end))
+        return night_end
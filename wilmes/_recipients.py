@@ -0,0 +1,121 @@
+"""
+Tokenizer for the recipient lists of the message pages.
+"""
+import bisect
+import re
+from typing import Dict, List, Optional
+
+# Format of the recipient lists, e.g. "Name (Class 7A), Other Name".
+# The tokenizer below finds the same names as the finditer of this
+# regex, but in linear time.  The regex backtracks heavily on e.g.
+# unbalanced parentheses or commas without a space.
+PERSON_LIST_RX = re.compile(r'([^(,]+(\([^)]*\)[^(,]*)*)((, )|$)')
+
+# Name without commas or nested parentheses.  Matching it cannot
+# backtrack much, since its parts are delimited by the parentheses.
+_SIMPLE_NAME_RX = re.compile(r'(?:[^(),]+(?:\([^(),]*\)[^(),]*)*)?')
+
+_OPEN_OR_COMMA_RX = re.compile(r'[(,]')
+_CLOSE_RX = re.compile(r'\)')
+
+
+def split_person_list(text: str) -> List[str]:
+    """
+    Split a comma separated list of persons to their names.
+
+    A name runs to the last ", " (or the end of the text) after which
+    it could end, i.e. not inside a parenthesized part.  The names are
+    stripped and the empty names dropped.  Text which cannot be a name
+    is skipped, like by PERSON_LIST_RX.
+    """
+    parts = text.split(', ')
+    if all(_SIMPLE_NAME_RX.fullmatch(x) for x in parts):
+        # Each part is a whole name in this common case
+        return [name for name in (x.strip() for x in parts) if name]
+    return _Tokenizer(text).split()
+
+
+class _Tokenizer:
+    """
+    Matcher of PERSON_LIST_RX without backtracking.
+
+    A name starting at a position first runs up to the next "(" or
+    ",".  At a "(", it may continue past the matching ")" up to the
+    next "(" or "," again, and so on.  These run ends are the only
+    positions where the name can end, and the regex takes the last
+    of them which is followed by ", " or the end of the text.  The
+    run ends do not depend on where in the first run the name starts,
+    so the last possible end is computed once per run end.
+    """
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.length = len(text)
+        self.stops = [m.start() for m in _OPEN_OR_COMMA_RX.finditer(text)]
+        self.closes = [m.start() for m in _CLOSE_RX.finditer(text)]
+        self._last_ends: Dict[int, Optional[int]] = {}
+
+    def split(self) -> List[str]:
+        text = self.text
+        length = self.length
+        result: List[str] = []
+        pos = 0
+        while pos < length:
+            if text[pos] in '(,':
+                pos += 1
+                continue
+            run_end = self._get_run_end(pos)
+            end = self._get_simple_end(run_end)
+            if end is None:
+                end = self._get_last_end(run_end)
+            if end is None:
+                pos = run_end + 1
+                continue
+            name = text[pos:end].strip()
+            if name:
+                result.append(name)
+            pos = end + 2 if end < length else length
+        return result
+
+    def _get_run_end(self, pos: int) -> int:
+        index = bisect.bisect_left(self.stops, pos)
+        return self.stops[index] if index < len(self.stops) else self.length
+
+    def _get_simple_end(self, run_end: int) -> Optional[int]:
+        """
+        Get the end of a name like "Name" or "Name (Class)" directly.
+
+        Return None if the name has some other form.
+        """
+        if run_end < self.length and self.text[run_end] == '(':
+            index = bisect.bisect_right(self.closes, run_end)
+            if index == len(self.closes):
+                return None
+            run_end = self._get_run_end(self.closes[index] + 1)
+        if run_end == self.length or self.text.startswith(', ', run_end):
+            return run_end
+        return None
+
+    def _get_last_end(self, run_end: int) -> Optional[int]:
+        # Follow the run ends until a known one or the last one
+        path: List[int] = []
+        pos: Optional[int] = run_end
+        while pos is not None and pos not in self._last_ends:
+            path.append(pos)
+            pos = self._get_next_run_end(pos)
+        last_end = self._last_ends[pos] if pos is not None else None
+        for pos in reversed(path):
+            if last_end is None and self._can_end_at(pos):
+                last_end = pos
+            self._last_ends[pos] = last_end
+        return last_end
+
+    def _get_next_run_end(self, run_end: int) -> Optional[int]:
+        if run_end >= self.length or self.text[run_end] != '(':
+            return None
+        index = bisect.bisect_right(self.closes, run_end)
+        if index == len(self.closes):
+            return None
+        return self._get_run_end(self.closes[index] + 1)
+
+    def _can_end_at(self, pos: int) -> bool:
+        return pos == self.length or self.text.startswith(', ', pos)
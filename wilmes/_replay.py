@@ -0,0 +1,74 @@
+"""
+Connection serving the pages from a response archive.
+"""
+from typing import Mapping, Optional
+
+import bs4
+import mechanicalsoup
+import requests
+import requests.utils
+
+from ._archive import ResponseArchive
+from ._client import Connection
+from ._html_parsing import DEFAULT_HTML_PARSER, HtmlParser
+from ._instrumentation import Observer
+
+
+class ReplayConnection(Connection):
+    """
+    Connection reading the pages from a response archive.
+
+    No requests are sent to the site.  The archived pages are parsed
+    as if they were just fetched, so that e.g. the archived messages
+    can be parsed again after fixing a parser, with `iter_messages` or
+    `sync`, and the parsers can be benchmarked with real pages.
+
+    The archive should contain the front page of the origin, which is
+    saved when a connection with an archive logs in.  A page missing
+    from the archive is handled like a 404 response.
+    """
+    def __init__(
+            self,
+            archive: ResponseArchive,
+            url: str,
+            *,
+            max_workers: int = 1,
+            html_parser: HtmlParser = DEFAULT_HTML_PARSER,
+            observer: Optional[Observer] = None,
+    ) -> None:
+        self.source = archive
+        super().__init__(
+            url, mechanicalsoup.StatefulBrowser(),
+            max_workers=max_workers, html_parser=html_parser,
+            observer=observer)
+
+    def logout(self) -> None:
+        """
+        Do nothing, since there is no session on the site.
+        """
+
+    def _send_get(
+            self,
+            relative_url: str,
+            url: str,
+            headers: Optional[Mapping[str, str]],
+    ) -> requests.Response:
+        archived = self.source.load(self.url, relative_url)
+        response = requests.Response()
+        response.url = url
+        if archived is None:
+            response.status_code = 404
+            response.reason = 'Not Found'
+            response._content = b''
+            return response
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers['Content-Type'] = archived.content_type
+        response.encoding = requests.utils.get_encoding_from_headers(
+            response.headers)
+        response._content = archived.content
+        return response
+
+    def _get_current_page_or_fail(self) -> bs4.BeautifulSoup:
+        response = self._browse_simple('/')
+        return self._parse_page(response, None, '/')
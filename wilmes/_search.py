@@ -0,0 +1,286 @@
+"""
+Full-text search index of messages, replies and news items.
+"""
+import re
+import sqlite3
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from ._serialization import datetime_to_str
+from ._types import Message, NewsItem, PupilId, _MessageWithBody
+
+SEARCH_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS search_rows (
+    rowid INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    pupil_id TEXT NOT NULL,
+    item_id INTEGER NOT NULL,
+    reply_number INTEGER,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS search_rows_item
+    ON search_rows (kind, origin, pupil_id, item_id);
+'''
+
+FTS_TEXT_SCHEMA = '''
+CREATE VIRTUAL TABLE search_text USING fts5(
+    subject, sender, recipients, body
+);
+'''
+
+# For SQLite builds without FTS5
+PLAIN_TEXT_SCHEMA = '''
+CREATE TABLE search_text (
+    rowid INTEGER PRIMARY KEY,
+    subject TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    recipients TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+'''
+
+SNIPPET_WORDS = 12
+
+# The subject is indexed only in the row of the message, so that a
+# match in it is not repeated for each reply, but the hits of the
+# replies show it too
+_HIT_SUBJECT_SQL = (
+    '(SELECT st.subject FROM search_rows sr'
+    ' JOIN search_text st ON st.rowid = sr.rowid'
+    ' WHERE sr.kind = r.kind AND sr.origin = r.origin'
+    ' AND sr.pupil_id = r.pupil_id AND sr.item_id = r.item_id'
+    ' AND sr.reply_number IS NULL)')
+
+_Row = Tuple[
+    Optional[int], Optional[str], str, str, str, str]
+# (reply_number, timestamp, subject, sender, recipients, body)
+
+
+@dataclass
+class SearchHit:
+    """
+    Message, reply or news item matching a search.
+
+    The kind is "message", "reply" or "news_item".  For a reply, the
+    item id is the id of its message and the reply number is its
+    1-based position in the replies.  The snippet is a part of the
+    matching text with the matches in [brackets].
+    """
+    kind: str
+    origin: str
+    pupil_id: PupilId
+    item_id: int
+    reply_number: Optional[int]
+    timestamp: Optional[str]
+    subject: str
+    snippet: str
+
+
+class SearchIndex:
+    """
+    SQLite FTS5 index of the subjects, senders, recipients and plain
+    text bodies of messages, replies and news items.
+
+    The index is kept in the given database.  Re-indexing an item
+    replaces its earlier rows, so the index can be updated
+    incrementally as items are fetched.  The changes are not
+    committed by the index.
+
+    If the SQLite library has no FTS5 extension, the texts are kept in
+    a plain table and searched with LIKE instead, which is slower and
+    matches the words anywhere in the words of the text.
+    """
+    def __init__(self, db: sqlite3.Connection) -> None:
+        self._db = db
+        self.is_new = not db.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'search_rows'"
+        ).fetchone()
+        db.executescript(SEARCH_SCHEMA)
+        self.has_fts = self._create_text_table()
+
+    def _create_text_table(self) -> bool:
+        """
+        Create the table of the texts if needed.
+
+        Return true if it is an FTS5 table.
+        """
+        row = self._db.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'search_text'"
+        ).fetchone()
+        if row:
+            return 'fts5' in row[0].lower()
+        try:
+            self._db.executescript(FTS_TEXT_SCHEMA)
+        except sqlite3.OperationalError as error:
+            if 'fts5' not in str(error):
+                raise
+            self._db.executescript(PLAIN_TEXT_SCHEMA)
+            return False
+        return True
+
+    def index_messages(self, messages: Iterable[Message]) -> None:
+        for message in messages:
+            recipients = ', '.join(x.name for x in message.recipients)
+            rows: List[_Row] = [(
+                None, datetime_to_str(message.timestamp), message.subject,
+                message.sender.name, recipients, _get_text(message))]
+            rows.extend(
+                (n, datetime_to_str(reply.timestamp), '',
+                 reply.sender.name, '', _get_text(reply))
+                for (n, reply) in enumerate(message.replies, 1))
+            self._replace(
+                'message', message.origin, message.pupil_id, message.id,
+                rows)
+
+    def index_news_items(self, news_items: Iterable[NewsItem]) -> None:
+        for news_item in news_items:
+            self._replace(
+                'news_item', news_item.origin, news_item.pupil_id,
+                news_item.id, [(
+                    None, datetime_to_str(news_item.timestamp),
+                    news_item.subject, news_item.sender.name, '',
+                    _get_text(news_item))])
+
+    def search(self, text: str, limit: int = 20) -> List[SearchHit]:
+        """
+        Search for items containing all the words of the text.
+
+        The words match as prefixes, e.g. "koulu" matches "koulun"
+        too.  The best matches are returned first.
+        """
+        words = text.split()
+        if not self.has_fts:
+            return self._search_without_fts(words, limit)
+        query = make_search_query(words)
+        if not query:
+            return []
+        rows = self._db.execute(
+            'SELECT r.kind, r.origin, r.pupil_id, r.item_id,'
+            f' r.reply_number, r.timestamp, {_HIT_SUBJECT_SQL},'
+            f" snippet(search_text, -1, '[', ']', '...', {SNIPPET_WORDS})"
+            ' FROM search_text t JOIN search_rows r ON r.rowid = t.rowid'
+            ' WHERE search_text MATCH ? ORDER BY rank LIMIT ?',
+            (query, limit))
+        return [
+            SearchHit(
+                kind=('reply' if reply_number else kind),
+                origin=origin,
+                pupil_id=PupilId(pupil_id),
+                item_id=item_id,
+                reply_number=reply_number,
+                timestamp=timestamp,
+                subject=subject,
+                snippet=snippet)
+            for (kind, origin, pupil_id, item_id, reply_number, timestamp,
+                 subject, snippet) in rows]
+
+    def _search_without_fts(
+            self,
+            words: Sequence[str],
+            limit: int,
+    ) -> List[SearchHit]:
+        if not words:
+            return []
+        condition = ' AND '.join(
+            "(t.subject || ' ' || t.sender || ' ' || t.recipients"
+            " || ' ' || t.body) LIKE ? ESCAPE '\\'" for _ in words)
+        patterns = tuple(
+            '%{}%'.format(re.sub(r'([%_\\])', r'\\\1', word))
+            for word in words)
+        rows = self._db.execute(
+            'SELECT r.kind, r.origin, r.pupil_id, r.item_id,'
+            f' r.reply_number, r.timestamp, {_HIT_SUBJECT_SQL},'
+            ' t.subject, t.sender, t.recipients, t.body'
+            ' FROM search_text t JOIN search_rows r ON r.rowid = t.rowid'
+            f' WHERE {condition} ORDER BY r.timestamp DESC LIMIT ?',
+            patterns + (limit,))
+        return [
+            SearchHit(
+                kind=('reply' if reply_number else kind),
+                origin=origin,
+                pupil_id=PupilId(pupil_id),
+                item_id=item_id,
+                reply_number=reply_number,
+                timestamp=timestamp,
+                subject=subject,
+                snippet=make_snippet(
+                    [body, row_subject, sender, recipients], words))
+            for (kind, origin, pupil_id, item_id, reply_number, timestamp,
+                 subject, row_subject, sender, recipients, body) in rows]
+
+    def clear(self) -> None:
+        self._db.execute('DELETE FROM search_text')
+        self._db.execute('DELETE FROM search_rows')
+
+    def _replace(
+            self,
+            kind: str,
+            origin: str,
+            pupil_id: PupilId,
+            item_id: int,
+            rows: Sequence[_Row],
+    ) -> None:
+        key = (kind, origin, pupil_id, item_id)
+        old_rowids = [rowid for (rowid,) in self._db.execute(
+            'SELECT rowid FROM search_rows WHERE kind = ? AND origin = ?'
+            ' AND pupil_id = ? AND item_id = ?', key)]
+        if old_rowids:
+            self._db.executemany(
+                'DELETE FROM search_text WHERE rowid = ?',
+                ((x,) for x in old_rowids))
+            self._db.executemany(
+                'DELETE FROM search_rows WHERE rowid = ?',
+                ((x,) for x in old_rowids))
+        for (reply_number, timestamp, subject, sender, recipients,
+             body) in rows:
+            cursor = self._db.execute(
+                'INSERT INTO search_rows (kind, origin, pupil_id, item_id,'
+                ' reply_number, timestamp) VALUES (?, ?, ?, ?, ?, ?)',
+                key + (reply_number, timestamp))
+            self._db.execute(
+                'INSERT INTO search_text'
+                ' (rowid, subject, sender, recipients, body)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (cursor.lastrowid, subject, sender, recipients, body))
+
+
+def _get_text(item: _MessageWithBody) -> str:
+    return '\n'.join(item.get_body_text().paragraphs)
+
+
+def make_snippet(texts: Sequence[str], words: Sequence[str]) -> str:
+    """
+    Make a snippet of the first text containing any of the words.
+
+    The words of the text containing the searched words are put in
+    [brackets], like in the snippets of FTS5.
+    """
+    word_rx = re.compile(
+        '|'.join(re.escape(x) for x in words), re.IGNORECASE)
+    for text in texts:
+        parts = text.split()
+        index = next(
+            (n for (n, x) in enumerate(parts) if word_rx.search(x)), None)
+        if index is None:
+            continue
+        start = max(0, min(index - 1, len(parts) - SNIPPET_WORDS))
+        end = start + SNIPPET_WORDS
+        return (
+            ('...' if start > 0 else '')
+            + ' '.join(
+                f'[{x}]' if word_rx.search(x) else x
+                for x in parts[start:end])
+            + ('...' if end < len(parts) else ''))
+    return ''
+
+
+def make_search_query(words: Iterable[str]) -> str:
+    """
+    Make an FTS5 query matching all the words as prefixes.
+
+    The words are quoted, so that they are never interpreted as the
+    query syntax of FTS5.
+    """
+    return ' '.join(
+        '"{}"*'.format(word.replace('"', '""')) for word in words if word)
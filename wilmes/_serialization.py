@@ -0,0 +1,148 @@
+"""
+Conversion of the data types to and from JSON compatible dicts.
+
+The conversions are written out by hand rather than using
+`dataclasses.asdict`, since that deep copies everything and is
+considerably slower.
+"""
+import sys
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from ._settings import TZ
+from ._types import (
+    Message,
+    MessageId,
+    MessageInfo,
+    NewsItem,
+    NewsItemId,
+    NewsItemInfo,
+    Person,
+    PupilId,
+    ReplyMessage,
+)
+
+JsonDict = Dict[str, Any]
+
+
+def person_to_dict(person: Person) -> JsonDict:
+    return {'name': person.name, 'id': person.id, 'type': person.type}
+
+
+def person_from_dict(data: JsonDict) -> Person:
+    return Person(name=data['name'], id=data['id'], type=data['type'])
+
+
+def message_info_to_dict(info: MessageInfo) -> JsonDict:
+    return {
+        'id': info.id,
+        'origin': info.origin,
+        'pupil_id': info.pupil_id,
+        'subject': info.subject,
+        'last_timestamp': datetime_to_str(info.last_timestamp),
+        'folder': info.folder,
+        'sender': person_to_dict(info.sender),
+        'reply_count': info.reply_count,
+        'is_unread': info.is_unread,
+    }
+
+
+def message_info_from_dict(data: JsonDict) -> MessageInfo:
+    return MessageInfo(
+        id=MessageId(data['id']),
+        origin=sys.intern(data['origin']),
+        pupil_id=PupilId(data['pupil_id']),
+        subject=data['subject'],
+        last_timestamp=datetime_from_str(data['last_timestamp']),
+        folder=sys.intern(data['folder']),
+        sender=person_from_dict(data['sender']),
+        reply_count=data['reply_count'],
+        is_unread=data['is_unread'],
+    )
+
+
+def message_to_dict(message: Message) -> JsonDict:
+    result = message_info_to_dict(message)
+    result.update({
+        'timestamp': datetime_to_str(message.timestamp),
+        'recipients': [person_to_dict(x) for x in message.recipients],
+        'body': message.body,
+        'replies': [reply_to_dict(x) for x in message.replies],
+    })
+    return result
+
+
+def message_from_dict(data: JsonDict) -> Message:
+    return Message.from_info_and_attrs(
+        message_info_from_dict(data),
+        timestamp=datetime_from_str(data['timestamp']),
+        recipients=(person_from_dict(x) for x in data['recipients']),
+        body=data['body'],
+        replies=(reply_from_dict(x) for x in data['replies']),
+    )
+
+
+def reply_to_dict(reply: ReplyMessage) -> JsonDict:
+    return {
+        'timestamp': datetime_to_str(reply.timestamp),
+        'sender': person_to_dict(reply.sender),
+        'body': reply.body,
+    }
+
+
+def reply_from_dict(data: JsonDict) -> ReplyMessage:
+    return ReplyMessage(
+        timestamp=datetime_from_str(data['timestamp']),
+        sender=person_from_dict(data['sender']),
+        body=data['body'],
+    )
+
+
+def news_item_info_to_dict(info: NewsItemInfo) -> JsonDict:
+    return {
+        'id': info.id,
+        'origin': info.origin,
+        'pupil_id': info.pupil_id,
+        'subject': info.subject,
+        'timestamp': (
+            datetime_to_str(info.timestamp) if info.timestamp else None),
+        'is_unread': info.is_unread,
+    }
+
+
+def news_item_info_from_dict(data: JsonDict) -> NewsItemInfo:
+    timestamp: Optional[str] = data['timestamp']
+    return NewsItemInfo(
+        id=NewsItemId(data['id']),
+        origin=sys.intern(data['origin']),
+        pupil_id=PupilId(data['pupil_id']),
+        subject=data['subject'],
+        timestamp=datetime_from_str(timestamp) if timestamp else None,
+        is_unread=data['is_unread'],
+    )
+
+
+def news_item_to_dict(news_item: NewsItem) -> JsonDict:
+    result = news_item_info_to_dict(news_item)
+    result.update({
+        'sender': person_to_dict(news_item.sender),
+        'body': news_item.body,
+    })
+    return result
+
+
+def news_item_from_dict(data: JsonDict) -> NewsItem:
+    return NewsItem.from_info_and_attrs(
+        news_item_info_from_dict(data),
+        timestamp=datetime_from_str(data['timestamp']),
+        sender=person_from_dict(data['sender']),
+        body=data['body'],
+    )
+
+
+def datetime_to_str(dt: datetime) -> str:
+    return dt.isoformat()
+
+
+def datetime_from_str(string: str) -> datetime:
+    return datetime.fromisoformat(string).astimezone(TZ)
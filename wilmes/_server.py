@@ -0,0 +1,335 @@
+"""
+Local HTTP service sharing a connection between several consumers.
+"""
+import json
+import re
+import threading
+import time
+import urllib.parse
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+from ._client import Client, Connection
+from ._serialization import (
+    JsonDict,
+    message_info_to_dict,
+    message_to_dict,
+    news_item_info_to_dict,
+    news_item_to_dict,
+)
+from ._types import MessageId, MessageInfo, NewsItemId, NewsItemInfo, PupilId
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8470
+DEFAULT_TTL = 60.0
+DEFAULT_KEEPALIVE_INTERVAL = 600.0
+
+_R = TypeVar('_R')
+
+
+class NotFound(LookupError):
+    """
+    Requested pupil, message or news item does not exist.
+    """
+
+
+class ResultCache:
+    """
+    In-memory cache of results with single-flight computation.
+
+    A result is computed only once at a time per key: callers asking
+    for a key which is already being computed wait for that result
+    instead of computing it again.  The results are then kept for ttl
+    seconds.  Failures are passed to the waiting callers too, but are
+    not kept.
+    """
+    def __init__(
+            self,
+            ttl: float = DEFAULT_TTL,
+            *,
+            clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.clock = clock
+        self.hit_count = 0
+        self.miss_count = 0
+        self.coalesced_count = 0
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._in_flight: Dict[str, 'Future[Any]'] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, compute: Callable[[], _R]) -> _R:
+        """
+        Get the result for a key, computing it if needed.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > self.clock():
+                self.hit_count += 1
+                return entry[1]  # type: ignore[no-any-return]
+            future = self._in_flight.get(key)
+            is_owner = future is None
+            if future is None:
+                future = Future()
+                self._in_flight[key] = future
+                self.miss_count += 1
+            else:
+                self.coalesced_count += 1
+        if not is_owner:
+            return future.result()  # type: ignore[no-any-return]
+        try:
+            result = compute()
+        except BaseException as error:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(error)
+            raise
+        self.put(key, result)
+        with self._lock:
+            del self._in_flight[key]
+        future.set_result(result)
+        return result
+
+    def put(self, key: str, value: object) -> None:
+        with self._lock:
+            now = self.clock()
+            expired = [k for (k, v) in self._entries.items() if v[0] <= now]
+            for expired_key in expired:
+                del self._entries[expired_key]
+            self._entries[key] = (now + self.ttl, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hit_count,
+                'misses': self.miss_count,
+                'coalesced': self.coalesced_count,
+                'entries': len(self._entries),
+            }
+
+
+class WilmesService:
+    """
+    Cached access to the site through a single logged in connection.
+
+    The connection is opened once and reused by all the requests, and
+    opened again if its session expires.  The site is used by one
+    request at a time, while the identical requests share the result
+    through the result cache.
+    """
+    def __init__(self, client: Client, *, ttl: float = DEFAULT_TTL) -> None:
+        self.client = client
+        self.cache = ResultCache(ttl)
+        self.login_count = 0
+        self._connection: Optional[Connection] = None
+        self._lock = threading.Lock()
+
+    def connect(self) -> None:
+        """
+        Open the connection now rather than on the first request.
+        """
+        with self._lock:
+            self._get_connection()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+
+    def __enter__(self) -> 'WilmesService':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def keep_alive(self) -> None:
+        """
+        Refresh the new message counts to keep the session alive.
+        """
+        self.cache.put('counts', self._call(self._fetch_counts))
+
+    def get_pupils(self) -> List[JsonDict]:
+        connection = self._call(lambda connection: connection)
+        return [{'id': x.id, 'name': x.name}
+                for x in connection.pupils.values()]
+
+    def get_counts(self) -> Dict[PupilId, int]:
+        return self.cache.get('counts', lambda: self._call(self._fetch_counts))
+
+    def get_message_list(self, pupil_id: PupilId) -> List[JsonDict]:
+        return [message_info_to_dict(x)
+                for x in self._get_message_infos(pupil_id)]
+
+    def get_message(
+            self,
+            pupil_id: PupilId,
+            message_id: MessageId,
+    ) -> JsonDict:
+        infos = self._get_message_infos(pupil_id)
+        info = next((x for x in infos if x.id == message_id), None)
+        if info is None:
+            raise NotFound(f'Unknown message: {message_id}')
+        message = self.cache.get(
+            f'message/{pupil_id}/{message_id}',
+            lambda: self._call(lambda c: c.fetch_message(info)))
+        return message_to_dict(message)
+
+    def get_news_list(self, pupil_id: PupilId) -> List[JsonDict]:
+        return [news_item_info_to_dict(x)
+                for x in self._get_news_item_infos(pupil_id)]
+
+    def get_news_item(
+            self,
+            pupil_id: PupilId,
+            news_item_id: NewsItemId,
+    ) -> JsonDict:
+        infos = self._get_news_item_infos(pupil_id)
+        info = next((x for x in infos if x.id == news_item_id), None)
+        if info is None:
+            raise NotFound(f'Unknown news item: {news_item_id}')
+        news_item = self.cache.get(
+            f'news_item/{pupil_id}/{news_item_id}',
+            lambda: self._call(lambda c: c.fetch_news_item(info)))
+        return news_item_to_dict(news_item)
+
+    def get_stats(self) -> JsonDict:
+        return {'cache': self.cache.get_stats(), 'logins': self.login_count}
+
+    def _get_message_infos(self, pupil_id: PupilId) -> List[MessageInfo]:
+        self._check_pupil(pupil_id)
+        return self.cache.get(
+            f'messages/{pupil_id}',
+            lambda: self._call(lambda c: c.fetch_message_list(pupil_id)))
+
+    def _get_news_item_infos(self, pupil_id: PupilId) -> List[NewsItemInfo]:
+        self._check_pupil(pupil_id)
+        return self.cache.get(
+            f'news/{pupil_id}',
+            lambda: self._call(lambda c: c.fetch_news_list(pupil_id)))
+
+    def _check_pupil(self, pupil_id: PupilId) -> None:
+        connection = self._call(lambda connection: connection)
+        if pupil_id not in connection.pupils:
+            raise NotFound(f'Unknown pupil: {pupil_id}')
+
+    @staticmethod
+    def _fetch_counts(connection: Connection) -> Dict[PupilId, int]:
+        counts = connection.refresh_new_message_counts()
+        return {x: counts.get(x, 0) for x in connection.pupils}
+
+    def _call(self, func: Callable[[Connection], _R]) -> _R:
+        with self._lock:
+            connection = self._get_connection()
+            try:
+                return func(connection)
+            except Exception:
+                if self._is_logged_in(connection):
+                    raise
+            # The session has expired, so log in again and retry once
+            self._connection = None
+            try:
+                connection.close()
+            except Exception:
+                pass  # Logging out of the expired session may fail
+            return func(self._get_connection())
+
+    def _get_connection(self) -> Connection:
+        if self._connection is None:
+            self._connection = self.client.connect(
+                reuse_session=bool(self.client.session_store))
+            self.login_count += 1
+        return self._connection
+
+    @staticmethod
+    def _is_logged_in(connection: Connection) -> bool:
+        try:
+            connection.refresh_new_message_counts()
+        except Exception:
+            return False
+        return True
+
+
+_Route = Tuple[Pattern[str], Callable[[WilmesService, List[str]], Any]]
+
+ROUTES: List[_Route] = [
+    (re.compile(r'/pupils'),
+     lambda service, args: service.get_pupils()),
+    (re.compile(r'/counts'),
+     lambda service, args: service.get_counts()),
+    (re.compile(r'/stats'),
+     lambda service, args: service.get_stats()),
+    (re.compile(r'/pupils/(\d+)/messages'),
+     lambda service, args: service.get_message_list(PupilId(args[0]))),
+    (re.compile(r'/pupils/(\d+)/messages/(\d+)'),
+     lambda service, args: service.get_message(
+         PupilId(args[0]), MessageId(int(args[1])))),
+    (re.compile(r'/pupils/(\d+)/news'),
+     lambda service, args: service.get_news_list(PupilId(args[0]))),
+    (re.compile(r'/pupils/(\d+)/news/(\d+)'),
+     lambda service, args: service.get_news_item(
+         PupilId(args[0]), NewsItemId(int(args[1])))),
+]
+
+
+def make_server(
+        service: WilmesService,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+) -> ThreadingHTTPServer:
+    """
+    Make an HTTP server serving the data of the service as JSON.
+
+    The paths are /pupils, /counts, /stats and, per pupil,
+    /pupils/<id>/messages, /pupils/<id>/messages/<message id>,
+    /pupils/<id>/news and /pupils/<id>/news/<news item id>.
+    """
+    return ThreadingHTTPServer((host, port), _make_handler(service))
+
+
+def _make_handler(
+        service: WilmesService,
+) -> Type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            path = urllib.parse.urlparse(self.path).path.rstrip('/')
+            for (path_rx, view) in ROUTES:
+                match = path_rx.fullmatch(path)
+                if match:
+                    break
+            else:
+                self._send({'error': 'Not found'}, status=404)
+                return
+            try:
+                result = view(service, list(match.groups()))
+            except NotFound as error:
+                self._send({'error': str(error)}, status=404)
+            except Exception as error:
+                self._send({'error': str(error)}, status=502)
+            else:
+                self._send(result)
+
+        def _send(self, data: object, status: int = 200) -> None:
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
@@ -0,0 +1,61 @@
+import os
+import tempfile
+from http.cookiejar import CookieJar, LoadError, LWPCookieJar
+
+
+class SessionStore:
+    """
+    File backed storage for the cookies of a logged in session.
+
+    Use a separate file for each account, since the file contains
+    the session cookies of a single login.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def load(self, cookiejar: CookieJar) -> bool:
+        """
+        Load the stored cookies to the given cookie jar.
+
+        Return True if there was a stored session.
+        """
+        file_jar = LWPCookieJar(self.path)
+        try:
+            file_jar.load(ignore_discard=True, ignore_expires=True)
+        except (FileNotFoundError, LoadError):
+            return False
+        cookies = list(file_jar)
+        for cookie in cookies:
+            cookiejar.set_cookie(cookie)
+        return bool(cookies)
+
+    def save(self, cookiejar: CookieJar) -> None:
+        """
+        Save the cookies of the given cookie jar.
+
+        The file is readable by the owner only, since the session
+        cookie gives access to the account.
+        """
+        file_jar = LWPCookieJar()
+        for cookie in cookiejar:
+            file_jar.set_cookie(cookie)
+        # The temporary file is created with owner only permissions
+        (fd, temp_path) = tempfile.mkstemp(
+            prefix='.session-', dir=os.path.dirname(self.path) or '.')
+        try:
+            with open(fd, 'w') as fp:
+                fp.write('#LWP-Cookies-2.0\n')
+                # Session cookies are "discard" cookies, so they must
+                # be explicitly saved
+                fp.write(file_jar.as_lwp_str(
+                    ignore_discard=True, ignore_expires=True))
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
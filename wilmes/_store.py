@@ -0,0 +1,185 @@
+import json
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import TracebackType
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Type
+
+from ._search import SearchHit, SearchIndex
+from ._serialization import (
+    datetime_from_str,
+    datetime_to_str,
+    message_from_dict,
+    message_to_dict,
+    news_item_from_dict,
+    news_item_to_dict,
+)
+from ._types import Message, MessageId, NewsItem, NewsItemId, PupilId
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS messages (
+    origin TEXT NOT NULL,
+    pupil_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    last_timestamp TEXT NOT NULL,
+    reply_count INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (origin, pupil_id, id)
+);
+CREATE TABLE IF NOT EXISTS news_items (
+    origin TEXT NOT NULL,
+    pupil_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (origin, pupil_id, id)
+);
+'''
+
+
+@dataclass
+class SyncResult:
+    """
+    Messages and news items downloaded by `Connection.sync`.
+    """
+    messages: List[Message] = field(default_factory=list)
+    news_items: List[NewsItem] = field(default_factory=list)
+
+
+class MessageStore:
+    """
+    Local SQLite database of fetched messages and news items.
+
+    The items are keyed by (origin, pupil_id, id).  The saved items
+    are also added to a full-text search index, see `search`.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._db = sqlite3.connect(path)
+        with self._db:
+            self._db.executescript(SCHEMA)
+            self.search_index = SearchIndex(self._db)
+            if self.search_index.is_new:
+                self._index_stored_items()
+
+    def search(self, text: str, limit: int = 20) -> List[SearchHit]:
+        """
+        Search the saved messages, replies and news items.
+
+        See `SearchIndex.search`.
+        """
+        return self.search_index.search(text, limit)
+
+    def rebuild_search_index(self) -> None:
+        with self._db:
+            self.search_index.clear()
+            self._index_stored_items()
+
+    def _index_stored_items(self) -> None:
+        self.search_index.index_messages(
+            message_from_dict(json.loads(data))
+            for (data,) in self._db.execute('SELECT data FROM messages'))
+        self.search_index.index_news_items(
+            news_item_from_dict(json.loads(data))
+            for (data,) in self._db.execute('SELECT data FROM news_items'))
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> 'MessageStore':
+        return self
+
+    def __exit__(
+            self,
+            exc_type: Optional[Type[BaseException]],
+            exc_value: Optional[BaseException],
+            traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def get_message_states(
+            self,
+            origin: str,
+            pupil_id: PupilId,
+    ) -> Dict[MessageId, Tuple[datetime, int]]:
+        """
+        Get last timestamp and reply count of the stored messages.
+        """
+        rows = self._db.execute(
+            'SELECT id, last_timestamp, reply_count FROM messages'
+            ' WHERE origin = ? AND pupil_id = ?', (origin, pupil_id))
+        return {
+            MessageId(id): (datetime_from_str(last_timestamp), reply_count)
+            for (id, last_timestamp, reply_count) in rows
+        }
+
+    def get_message(
+            self,
+            origin: str,
+            pupil_id: PupilId,
+            message_id: MessageId,
+    ) -> Optional[Message]:
+        row = self._db.execute(
+            'SELECT data FROM messages'
+            ' WHERE origin = ? AND pupil_id = ? AND id = ?',
+            (origin, pupil_id, message_id)).fetchone()
+        return message_from_dict(json.loads(row[0])) if row else None
+
+    def get_messages(self, origin: str, pupil_id: PupilId) -> List[Message]:
+        rows = self._db.execute(
+            'SELECT data FROM messages'
+            ' WHERE origin = ? AND pupil_id = ? ORDER BY id',
+            (origin, pupil_id))
+        return [message_from_dict(json.loads(data)) for (data,) in rows]
+
+    def save_messages(self, messages: Iterable[Message]) -> None:
+        messages = list(messages)
+        with self._db:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO messages'
+                ' (origin, pupil_id, id, last_timestamp, reply_count, data)'
+                ' VALUES (?, ?, ?, ?, ?, ?)', (
+                    (x.origin, x.pupil_id, x.id,
+                     datetime_to_str(x.last_timestamp), x.reply_count,
+                     json.dumps(message_to_dict(x)))
+                    for x in messages))
+            self.search_index.index_messages(messages)
+
+    def get_news_item_ids(
+            self,
+            origin: str,
+            pupil_id: PupilId,
+    ) -> Set[NewsItemId]:
+        rows = self._db.execute(
+            'SELECT id FROM news_items WHERE origin = ? AND pupil_id = ?',
+            (origin, pupil_id))
+        return {NewsItemId(id) for (id,) in rows}
+
+    def get_news_item(
+            self,
+            origin: str,
+            pupil_id: PupilId,
+            news_item_id: NewsItemId,
+    ) -> Optional[NewsItem]:
+        row = self._db.execute(
+            'SELECT data FROM news_items'
+            ' WHERE origin = ? AND pupil_id = ? AND id = ?',
+            (origin, pupil_id, news_item_id)).fetchone()
+        return news_item_from_dict(json.loads(row[0])) if row else None
+
+    def get_news_items(self, origin: str, pupil_id: PupilId) -> List[NewsItem]:
+        rows = self._db.execute(
+            'SELECT data FROM news_items'
+            ' WHERE origin = ? AND pupil_id = ? ORDER BY id',
+            (origin, pupil_id))
+        return [news_item_from_dict(json.loads(data)) for (data,) in rows]
+
+    def save_news_items(self, news_items: Iterable[NewsItem]) -> None:
+        news_items = list(news_items)
+        with self._db:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO news_items'
+                ' (origin, pupil_id, id, data) VALUES (?, ?, ?, ?)', (
+                    (x.origin, x.pupil_id, x.id,
+                     json.dumps(news_item_to_dict(x)))
+                    for x in news_items))
+            self.search_index.index_news_items(news_items)
@@ -0,0 +1,97 @@
+"""
+Parsing of the timestamps shown on the site.
+
+The site uses only a few formats, which are parsed with regular
+expressions.  Anything else is parsed with dateutil.
+"""
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Protocol
+
+from dateutil.parser import parse as parse_datetime
+
+from ._settings import TZ
+
+SPECIAL_DATES: Dict[str, Callable[[], date]] = {
+    'today': date.today,
+    'yesterday': lambda: date.today() - timedelta(days=1),
+}
+YEARLESS_DATE_RX = re.compile(
+    r'^((0?[1-9])|[1-2][0-9]|3[01])\.((0?[1-9])|(1[0-2]))\.$')
+ISO_TIMESTAMP_RX = re.compile(
+    r'^(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})'
+    r'(?:[ T](?P<hour>\d{1,2}):(?P<minute>\d{2})(?::(?P<second>\d{2}))?)?$')
+FINNISH_TIMESTAMP_RX = re.compile(
+    r'^(?P<day>\d{1,2})\.(?P<month>\d{1,2})\.(?P<year>\d{4})'
+    r'(?: +(?P<hour>\d{1,2}):(?P<minute>\d{2})'
+    r'(?::(?P<second>\d{2}))?)?$')
+
+CACHE_SIZE = 4096
+
+
+class _PytzTimezone(Protocol):
+    def localize(self, dt: datetime) -> datetime: ...
+
+    def __hash__(self) -> int: ...
+
+
+def parse_timestamp(string: str, tz: _PytzTimezone = TZ) -> datetime:
+    string = string.strip()
+    special_date_function = SPECIAL_DATES.get(string.lower())
+    if special_date_function:
+        string = str(special_date_function())
+    elif YEARLESS_DATE_RX.match(string):
+        string += str(datetime.now().year)
+    # Only the timestamps of the known formats are cached, since the
+    # meaning of the special and yearless dates depends on the current
+    # date, and dateutil fills in the missing parts from it too
+    dt = _parse_known_timestamp(string, tz)
+    if dt is None:
+        return parse_timestamp_with_dateutil(string, tz)
+    return dt
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_known_timestamp(
+        string: str,
+        tz: _PytzTimezone,
+) -> Optional[datetime]:
+    dt = _parse_known_format(string)
+    return tz.localize(dt) if dt else None
+
+
+def _parse_known_format(string: str) -> Optional[datetime]:
+    match = (
+        FINNISH_TIMESTAMP_RX.match(string) or ISO_TIMESTAMP_RX.match(string))
+    if not match:
+        return None
+    (year, month, day, hour, minute, second) = match.group(
+        'year', 'month', 'day', 'hour', 'minute', 'second')
+    try:
+        return datetime(
+            int(year), int(month), int(day),
+            int(hour or 0), int(minute or 0), int(second or 0))
+    except ValueError:
+        return None
+
+
+def parse_timestamp_with_dateutil(
+        string: str,
+        tz: _PytzTimezone = TZ,
+) -> datetime:
+    """
+    Parse timestamp with dateutil.
+
+    This is the generic implementation, which is used for the formats
+    not recognized by `parse_timestamp`.
+    """
+    special_date_function = SPECIAL_DATES.get(string.strip().lower())
+    if special_date_function:
+        string = str(special_date_function())
+    elif YEARLESS_DATE_RX.match(string):
+        string += str(datetime.now().year)
+    dt = parse_datetime(string, dayfirst=(string.count('.') >= 2))
+    if dt.tzinfo:
+        return dt
+    return tz.localize(dt)
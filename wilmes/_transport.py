@@ -0,0 +1,178 @@
+"""
+Configuration of the HTTP transport used by the connections.
+"""
+import inspect
+import random
+import threading
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional, Tuple, Union
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ._serialization import JsonDict
+
+DEFAULT_ACCEPT_ENCODING = urllib3.util.make_headers(
+    accept_encoding=True)['accept-encoding']
+
+# Jitter and maximum backoff are supported by urllib3 2.0 and newer
+_RETRY_HAS_JITTER = (
+    'backoff_jitter' in inspect.signature(Retry.__init__).parameters)
+
+_Timeout = Union[None, float, Tuple[float, float], Tuple[float, None]]
+
+
+@dataclass
+class TransportConfig:
+    """
+    Settings of the HTTP connections to the site.
+
+    The connection pool is shared by the worker threads of a
+    connection.  Its size defaults to the number of workers plus the
+    thread of the connection itself, so that no worker has to wait for
+    a pooled HTTP connection or open a new one for each request.
+
+    Failed requests are retried with exponential backoff, i.e. after
+    backoff_factor * 2 ** (n - 1) seconds for the nth retry, capped by
+    backoff_max, with a random jitter of up to backoff_jitter seconds.
+    Connection errors are retried for all requests, but read errors
+    and the retry statuses only for GET requests, since e.g. a login
+    should not be sent twice.
+
+    The accepted encodings default to the compression methods which
+    urllib3 can decode, e.g. "gzip,deflate" and "br" if a Brotli
+    library is installed.
+    """
+    pool_size: Optional[int] = None
+    connect_timeout: float = 10.0
+    read_timeout: float = 30.0
+    retries: int = 3
+    backoff_factor: float = 0.5
+    backoff_max: float = 30.0
+    backoff_jitter: float = 0.5
+    retry_statuses: Tuple[int, ...] = (500, 502, 503, 504)
+    accept_encoding: str = DEFAULT_ACCEPT_ENCODING
+
+    def get_pool_size(self, max_workers: int) -> int:
+        return self.pool_size or max_workers + 1
+
+    def get_backoff(self, retry_number: int) -> float:
+        """
+        Get the number of seconds to wait before the nth retry.
+        """
+        backoff = self.backoff_factor * 2.0 ** (retry_number - 1)
+        jitter = random.uniform(0, self.backoff_jitter)
+        return min(backoff, self.backoff_max) + jitter
+
+    def make_retry(self) -> Retry:
+        kwargs: JsonDict = {
+            'backoff_jitter': self.backoff_jitter,
+            'backoff_max': self.backoff_max,
+        } if _RETRY_HAS_JITTER else {}
+        return Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            status_forcelist=self.retry_statuses,
+            backoff_factor=self.backoff_factor,
+            raise_on_status=False,
+            respect_retry_after_header=True,
+            **kwargs)
+
+
+class TransportStats:
+    """
+    Counters of the HTTP requests done by a connection.
+
+    The requests include the retries.  The received bytes are counted
+    as transferred, i.e. before decompression, and the decoded bytes
+    after it.
+    """
+    def __init__(self) -> None:
+        self.request_count = 0
+        self.retry_count = 0
+        self.error_count = 0
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self._lock = threading.Lock()
+
+    def add(
+            self,
+            *,
+            retries: int = 0,
+            bytes_received: int = 0,
+            bytes_decoded: int = 0,
+            error: bool = False,
+    ) -> None:
+        with self._lock:
+            self.request_count += 1 + retries
+            self.retry_count += retries
+            self.error_count += int(error)
+            self.bytes_received += bytes_received
+            self.bytes_decoded += bytes_decoded
+
+    def to_dict(self) -> JsonDict:
+        with self._lock:
+            return {
+                'request_count': self.request_count,
+                'retry_count': self.retry_count,
+                'error_count': self.error_count,
+                'bytes_received': self.bytes_received,
+                'bytes_decoded': self.bytes_decoded,
+            }
+
+
+class TransportAdapter(HTTPAdapter):
+    """
+    Adapter applying a transport configuration to requests sessions.
+
+    The same adapter can be mounted to several sessions, which then
+    share its connection pool and counters.
+    """
+    def __init__(self, config: TransportConfig, max_workers: int) -> None:
+        self.transport_config = config
+        self.stats = TransportStats()
+        self.timeout = (config.connect_timeout, config.read_timeout)
+        super().__init__(
+            pool_maxsize=config.get_pool_size(max_workers),
+            max_retries=config.make_retry(),
+            pool_block=True)
+
+    def mount_to(self, session: requests.Session) -> None:
+        session.mount('https://', self)
+        session.mount('http://', self)
+        session.headers['Accept-Encoding'] = (
+            self.transport_config.accept_encoding)
+
+    def send(
+            self,
+            request: requests.PreparedRequest,
+            stream: bool = False,
+            timeout: _Timeout = None,
+            verify: Union[bool, str] = True,
+            cert: Any = None,
+            proxies: Optional[Mapping[str, str]] = None,
+    ) -> requests.Response:
+        try:
+            response = super().send(
+                request, stream=stream,
+                timeout=(self.timeout if timeout is None else timeout),
+                verify=verify, cert=cert, proxies=proxies)
+        except requests.RequestException:
+            self.stats.add(error=True)
+            raise
+        retry = getattr(response.raw, 'retries', None)
+        retries = len(retry.history) if retry else 0
+        if stream:
+            self.stats.add(retries=retries)
+        else:
+            # Read the content here to count the transferred bytes
+            content = response.content
+            self.stats.add(
+                retries=retries,
+                bytes_received=response.raw.tell(),
+                bytes_decoded=len(content))
+        return response
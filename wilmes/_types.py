@@ -1,9 +1,20 @@
 import textwrap
+import threading
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Iterable, List, NamedTuple, NewType, Optional
-
-from bs4 import BeautifulSoup
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    NewType,
+    Optional,
+    Tuple,
+    Type,
+)
 
 PupilId = NewType('PupilId', str)
 MessageId = NewType('MessageId', int)
@@ -15,15 +26,40 @@ class Pupil(NamedTuple):
     name: str
 
 
-@dataclass
+@dataclass(frozen=True, init=False)
 class Person:
+    """
+    Person sending or receiving messages.
+
+    Persons are immutable, since the connections share the instances
+    between the messages.
+    """
+    __slots__ = ('name', 'id', 'type')
+
     name: str
-    id: Optional[int] = None
-    type: Optional[str] = None
+    id: Optional[int]
+    type: Optional[str]
+
+    def __init__(
+            self,
+            name: str,
+            id: Optional[int] = None,
+            type: Optional[str] = None,
+    ) -> None:
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'id', id)
+        object.__setattr__(self, 'type', type)
+
+    def __reduce__(self) -> Tuple[Type['Person'], Tuple[Any, ...]]:
+        return (type(self), (self.name, self.id, self.type))
 
 
 @dataclass
 class MessageInfo:
+    __slots__ = (
+        'id', 'origin', 'pupil_id', 'subject', 'last_timestamp', 'folder',
+        'sender', 'reply_count', 'is_unread')
+
     id: MessageId
     origin: str  # URL of the system this message is from
     pupil_id: PupilId
@@ -42,11 +78,50 @@ class MessageInfo:
             f'{f" (+{self.reply_count})" if self.reply_count else ""}')
 
 
+class BodyText:
+    """
+    Plain text rendering of a HTML body.
+
+    The body is parsed only once to paragraphs of plain text, which
+    are then wrapped to the requested widths as needed.
+    """
+    def __init__(self, body: str) -> None:
+        # Imported here, since the types are needed by the front page
+        # check too, which should start without importing BeautifulSoup
+        from bs4 import BeautifulSoup
+
+        self.body = body
+        body_text = BeautifulSoup(body, features='lxml').get_text()
+        self.paragraphs = [
+            line.replace('\xa0', ' ').rstrip()
+            for line in body_text.splitlines()
+        ]
+        self._wrapped: Dict[int, str] = {}
+
+    def get_wrapped(self, width: int) -> str:
+        result = self._wrapped.get(width)
+        if result is None:
+            wrapper = _get_text_wrapper(width)
+            result = '\n\n'.join(
+                '\n'.join(wrapper.wrap(paragraph))
+                for paragraph in self.paragraphs)
+            self._wrapped[width] = result
+        return result
+
+
+@lru_cache(maxsize=16)
+def _get_text_wrapper(width: int) -> textwrap.TextWrapper:
+    return textwrap.TextWrapper(width=width)
+
+
 class _MessageWithBody:
     timestamp: datetime
     sender: Person
     body: str
 
+    # Cache for the plain text rendering, see get_body_text
+    _body_text: Optional[BodyText] = None
+
     def __str__(self) -> str:
         return self.to_text()
 
@@ -63,12 +138,20 @@ class _MessageWithBody:
         )
 
     def get_cleaned_body_text(self, width: int = 70) -> str:
-        body_text = BeautifulSoup(self.body, features='lxml').get_text()
-        return '\n\n'.join(
-            '\n'.join(textwrap.wrap(
-                line.replace('\xa0', ' ').rstrip(),
-                width=width))
-            for line in body_text.splitlines())
+        return self.get_body_text().get_wrapped(width)
+
+    def get_body_text(self) -> BodyText:
+        """
+        Get the plain text rendering of the body.
+
+        The rendering is computed once and cached until the body is
+        changed.
+        """
+        body_text = self._body_text
+        if body_text is None or body_text.body is not self.body:
+            body_text = BodyText(self.body)
+            self._body_text = body_text
+        return body_text
 
 
 @dataclass
@@ -114,8 +197,121 @@ class Message(_MessageWithBody, MessageInfo):
         return f'Subject: {self.subject}\n' + super().get_header_lines()
 
 
+class LazyMessage(Message):
+    """
+    Message whose page is fetched only when needed.
+
+    The message info attributes are available right away.  The
+    message page is fetched with the given function when the
+    timestamp, recipients, body or replies are first accessed, or
+    beforehand by `Connection.prefetch`.  The page is fetched only
+    once, even if the attributes are accessed from several threads.
+
+    A lazy message is equal to the fetched message, and its modified
+    copies, e.g. from `dataclasses.replace` or `from_info_and_attrs`,
+    are plain messages.  The page can be fetched only while the
+    connection is open, so prefetch the messages which are needed
+    after closing it.
+    """
+    def __new__(  # type: ignore[misc]
+            cls,
+            *args: Any,
+            **kwargs: Any,
+    ) -> Message:
+        # The copies are constructed with the message fields, which
+        # gives a fetched message instead of a lazy one
+        if kwargs and not args and 'info' not in kwargs:
+            return Message(**kwargs)
+        return super().__new__(cls)
+
+    def __init__(
+            self,
+            info: MessageInfo,
+            fetch: Callable[[MessageInfo], Message],
+    ) -> None:
+        MessageInfo.__init__(
+            self,
+            id=info.id,
+            origin=info.origin,
+            pupil_id=info.pupil_id,
+            subject=info.subject,
+            last_timestamp=info.last_timestamp,
+            folder=info.folder,
+            sender=info.sender,
+            reply_count=info.reply_count,
+            is_unread=info.is_unread,
+        )
+        self._fetch = fetch
+        self._message: Optional[Message] = None
+        self._lock = threading.Lock()
+
+    # Show only the message info, without fetching the page
+    __repr__ = MessageInfo.__repr__
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, LazyMessage):
+            other = other.load()
+        if not isinstance(other, Message):
+            return NotImplemented
+        return self.load() == other
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._message is not None
+
+    def load(self) -> Message:
+        """
+        Get the fully fetched message, fetching it if needed.
+        """
+        message = self._message
+        if message is None:
+            with self._lock:
+                message = self._message
+                if message is None:
+                    message = self._message = self._fetch(self)
+        return message
+
+    @property
+    def timestamp(self) -> datetime:  # type: ignore[override]
+        return self.load().timestamp
+
+    @property
+    def recipients(self) -> List[Person]:  # type: ignore[override]
+        return self.load().recipients
+
+    @property
+    def body(self) -> str:  # type: ignore[override]
+        return self.load().body
+
+    @property
+    def replies(self) -> List[ReplyMessage]:  # type: ignore[override]
+        return self.load().replies
+
+
+@dataclass
+class MessageUpdate:
+    """
+    Changes of a message since a previously fetched version of it.
+
+    The message is the current version of the whole message.  The new
+    replies are the replies which were not in the previous version
+    and the changed fields are the names of the changed message info
+    fields, e.g. "reply_count" or "is_unread".
+    """
+    message: Message
+    new_replies: List[ReplyMessage]
+    changed_fields: List[str]
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.new_replies or self.changed_fields)
+
+
 @dataclass
 class NewsItemInfo:
+    __slots__ = (
+        'id', 'origin', 'pupil_id', 'subject', 'timestamp', 'is_unread')
+
     id: NewsItemId
     origin: str  # URL of the system this message is from
     pupil_id: PupilId
@@ -156,3 +352,15 @@ class NewsItem(_MessageWithBody, NewsItemInfo):
 
     def get_header_lines(self) -> str:
         return f'Subject: {self.subject}\n' + super().get_header_lines()
+
+
+def render_text(
+        items: Iterable[_MessageWithBody],
+        width: int = 70,
+) -> str:
+    """
+    Render messages, replies or news items as text.
+
+    The items are separated by empty lines.
+    """
+    return '\n\n'.join(item.to_text(width) for item in items)
@@ -0,0 +1,358 @@
+"""
+Local stand-in for the site, serving synthetic or recorded pages.
+
+Used by the tests and benchmarks to run the client against a real
+HTTP server.
+"""
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple, Type
+
+SESSION_COOKIE = 'Wilma2LoginID'
+
+
+class FakeWilmaData:
+    def __init__(
+            self,
+            *,
+            pupils: int = 2,
+            messages: int = 5,
+            unread: int = 2,
+            replies: int = 2,
+            recipients: int = 3,
+            news: int = 4,
+            news_per_date: int = 2,
+    ) -> None:
+        self.pupil_ids = [str(1000 + n) for n in range(pupils)]
+        self.messages = messages
+        self.unread = unread
+        self.replies = replies
+        self.recipients = recipients
+        self.news = news
+        self.news_per_date = news_per_date
+
+    def front_page(self) -> str:
+        links = []
+        for pid in self.pupil_ids:
+            links.append(f'<a href="/!{pid}/">Pupil {pid}</a>')
+            links.append(
+                f'<a href="/!{pid}/messages">{self.unread} new messages</a>')
+        return (
+            '<html><body>'
+            '<div class="name-container"><span class="teacher">'
+            'Parent Person</span></div>'
+            '<a href="/passwd/settings">Account settings</a>'
+            + ''.join(links) +
+            '</body></html>')
+
+    def login_page(self) -> str:
+        return (
+            '<html><body>'
+            '<form class="login-form" method="post" action="/login">'
+            '<input name="Login" type="text">'
+            '<input name="Password" type="password">'
+            '<input name="SESSIONID" type="hidden" value="">'
+            '<input name="CompleteJson" type="hidden" value="">'
+            '<input name="submit" type="submit" value="Log in">'
+            '</form>'
+            '</body></html>')
+
+    def message_list(self, pupil_id: str) -> Dict[str, object]:
+        return {'Messages': [
+            {
+                'Id': 100 + n,
+                'Subject': f'Subject {n} for {pupil_id}',
+                'TimeStamp': f'2024-01-{1 + n % 28:02d} 12:{n % 60:02d}',
+                'Folder': 'Inbox',
+                'Sender': f'Teacher {n % 3}',
+                'SenderId': 10 + n % 3,
+                'SenderType': 1,
+                'Replies': self.replies,
+                'Status': 1 if n < self.unread else 0,
+            }
+            for n in range(self.messages)
+        ]}
+
+    def message_page(self, pupil_id: str, message_id: int) -> str:
+        recipients = ', '.join(
+            f'Recipient {n} (Class {n % 5}A)'
+            for n in range(self.recipients))
+        replies = ''.join(
+            '<div class="m-replybox">'
+            f'<h2>Teacher {n}\xa0 replied on '
+            f'{2 + n % 27}.{1 + n // 27 % 12}.2024 10:{n % 60:02d}</h2>'
+            f'<div class="inner"><p>Reply {n} text</p></div>'
+            '</div>'
+            for n in range(self.replies))
+        return (
+            '<html><body>'
+            '<table><tr><th>Sent:</th><td>1.1.2024 12:00</td></tr>'
+            '<tr><th>Recipients:</th><td><div id="recipients-cell">'
+            f'{recipients}, '
+            '<a class="profile-link" href="/profiles/teachers/12">'
+            'Teacher Two</a>'
+            '</div></td></tr></table>'
+            '<div class="ckeditor hidden">'
+            f'<p>Hello from message {message_id}'
+            ' <img src="/x/smiley/images/regular_smile.png"></p>'
+            '<p><a href="/cdn-cgi/l/email-protection#88dcedfbfca6cde5e9e1e4'
+            'c8edf0e9e5f8e4eda6ebe7e5">mail</a></p>'
+            '</div>'
+            f'{replies}'
+            '</body></html>')
+
+    def news_list(self, pupil_id: str) -> str:
+        items = ''.join(
+            (f'<h2>{1 + n % 28}.2.2024</h2>'
+             if n % self.news_per_date == 0 else '')
+            + '<div class="well">'
+            f'<h3>News {n}'
+            + (' <span class="label">New</span>' if n == 0 else '') +
+            '</h3>'
+            f'<a href="/!{pupil_id}/news/{500 + n}">Read more</a>'
+            '</div>'
+            for n in range(self.news))
+        return (
+            '<html><body>'
+            f'<a class="link" href="/!{pupil_id}/news/499">Old news</a>'
+            f'{items}'
+            '</body></html>')
+
+    def news_item_page(self, pupil_id: str, news_id: int) -> str:
+        return (
+            '<html><body><div class="panel-body">'
+            '<div class="horizontal-link-container">'
+            '<span class="small">Published 3.2.2024</span>'
+            '<a class="profile-link" href="/profiles/personnel/7">'
+            'Principal (Head)</a>'
+            '</div>'
+            f'<div id="news-content"><p>News body {news_id}</p></div>'
+            '</div></body></html>')
+
+
+class RecordedWilmaData(FakeWilmaData):
+    """
+    Pages recorded from the site, with synthetic pages for the rest.
+
+    The directory may contain any of the files front_page.html,
+    message_list.json, message.html, news_list.html and
+    news_item.html.  The recorded pages are served as such for every
+    pupil and item id, so their links need not match the synthetic
+    ids.
+    """
+    def __init__(self, directory: str, **kwargs: int) -> None:
+        super().__init__(**kwargs)
+        self.directory = directory
+
+    def front_page(self) -> str:
+        return self._read('front_page.html') or super().front_page()
+
+    def message_list(self, pupil_id: str) -> Dict[str, object]:
+        recorded = self._read('message_list.json')
+        if recorded is None:
+            return super().message_list(pupil_id)
+        result: Dict[str, object] = json.loads(recorded)
+        return result
+
+    def message_page(self, pupil_id: str, message_id: int) -> str:
+        return (
+            self._read('message.html')
+            or super().message_page(pupil_id, message_id))
+
+    def news_list(self, pupil_id: str) -> str:
+        return self._read('news_list.html') or super().news_list(pupil_id)
+
+    def news_item_page(self, pupil_id: str, news_id: int) -> str:
+        return (
+            self._read('news_item.html')
+            or super().news_item_page(pupil_id, news_id))
+
+    def _read(self, filename: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.directory, filename),
+                      encoding='utf-8') as fp:
+                return fp.read()
+        except FileNotFoundError:
+            return None
+
+
+class FakeWilmaServer:
+    def __init__(
+            self,
+            data: Optional[FakeWilmaData] = None,
+            *,
+            login_delay: float = 0.0,
+            page_delay: float = 0.0,
+            etags: bool = False,
+            compress: bool = False,
+    ) -> None:
+        self.data = data or FakeWilmaData()
+        self.login_delay = login_delay
+        self.page_delay = page_delay  # For the message and news pages
+        self.etags = etags
+        self.compress = compress
+        # path -> number of 503 responses to send before the real one
+        self.failures: Dict[str, int] = {}
+        self.request_count = 0
+        self.active_requests = 0
+        self.max_active_requests = 0
+        self.sessions: Dict[str, bool] = {}  # session id -> logged in
+        self.paths: List[str] = []
+        self.lock = threading.Lock()
+        self._session_numbers = itertools.count()
+        handler = _make_handler(self)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def url(self) -> str:
+        (host, port) = self.httpd.server_address[:2]
+        return f'http://{host!s}:{port}'
+
+    def __enter__(self) -> 'FakeWilmaServer':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _make_handler(
+        server: FakeWilmaServer,
+) -> Type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+        def do_GET(self) -> None:  # noqa: N802
+            self._handle('GET')
+
+        def do_POST(self) -> None:  # noqa: N802
+            self._handle('POST')
+
+        def _handle(self, method: str) -> None:
+            with server.lock:
+                server.active_requests += 1
+                server.max_active_requests = max(
+                    server.max_active_requests, server.active_requests)
+            try:
+                self._respond(method)
+            finally:
+                with server.lock:
+                    server.active_requests -= 1
+
+        def _respond(self, method: str) -> None:
+            parsed = urllib.parse.urlparse(self.path)
+            with server.lock:
+                server.request_count += 1
+                server.paths.append(parsed.path)
+                failures = server.failures.get(parsed.path, 0)
+                if failures:
+                    server.failures[parsed.path] = failures - 1
+            if failures:
+                self._send('unavailable', 'text/plain', status=503)
+                return
+            data = server.data
+            path = parsed.path
+            parts = path.strip('/').split('/')
+            session_id = self._get_session_id()
+            logged_in = server.sessions.get(session_id or '', False)
+            if path == '/token':
+                new_id = f'session{next(server._session_numbers)}'
+                server.sessions[new_id] = False
+                self._send('ok', 'text/plain', cookies=(
+                    f'{SESSION_COOKIE}={new_id}; Path=/',))
+            elif path == '/' and method == 'GET':
+                if 'langid' in parsed.query or not logged_in:
+                    self._send(data.login_page())
+                else:
+                    self._send(data.front_page())
+            elif path == '/login':
+                time.sleep(server.login_delay)
+                length = int(self.headers.get('Content-Length', '0'))
+                form = urllib.parse.parse_qs(
+                    self.rfile.read(length).decode('utf-8'))
+                form_session_id = form.get('SESSIONID', [''])[0]
+                if form.get('Password') == ['wrong'] or (
+                        form_session_id not in server.sessions):
+                    self._redirect('/?loginfailed')
+                else:
+                    server.sessions[form_session_id] = True
+                    self._redirect('/')
+            elif path == '/logout':
+                server.sessions.pop(session_id or '', None)
+                self._send('bye', 'text/plain')
+            elif not logged_in:
+                self._send('forbidden', 'text/plain', status=403)
+            else:
+                time.sleep(server.page_delay)
+                self._send_page(parts)
+
+        def _send_page(self, parts: List[str]) -> None:
+            data = server.data
+            if len(parts) == 3 and parts[1:] == ['messages', 'list']:
+                self._send(json.dumps(data.message_list(parts[0][1:])),
+                           'application/json')
+            elif len(parts) == 3 and parts[1] == 'messages':
+                self._send(data.message_page(parts[0][1:], int(parts[2])))
+            elif len(parts) == 2 and parts[1] == 'news':
+                self._send(data.news_list(parts[0][1:]))
+            elif len(parts) == 3 and parts[1] == 'news':
+                self._send(data.news_item_page(parts[0][1:], int(parts[2])))
+            else:
+                self._send('not found', 'text/plain', status=404)
+
+        def _get_session_id(self) -> Optional[str]:
+            for part in self.headers.get('Cookie', '').split(';'):
+                (name, _sep, value) = part.strip().partition('=')
+                if name == SESSION_COOKIE:
+                    return value
+            return None
+
+        def _redirect(self, location: str) -> None:
+            self.send_response(303)
+            self.send_header('Location', location)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def _send(
+                self,
+                content: str,
+                content_type: str = 'text/html; charset=utf-8',
+                status: int = 200,
+                cookies: Tuple[str, ...] = (),
+        ) -> None:
+            body = content.encode('utf-8')
+            etag = f'"{hashlib.sha1(body).hexdigest()}"'
+            if server.etags and status == 200 and self.command == 'GET':
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+            if server.compress and 'gzip' in self.headers.get(
+                    'Accept-Encoding', ''):
+                body = gzip.compress(body)
+                self.send_response(status)
+                self.send_header('Content-Encoding', 'gzip')
+            else:
+                self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            if server.etags and status == 200:
+                self.send_header('ETag', etag)
+            for cookie in cookies:
+                self.send_header('Set-Cookie', cookie)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
@@ -0,0 +1,58 @@
+import os
+from pathlib import Path
+
+import pytest
+import requests
+
+from wilmes._archive import ResponseArchive
+from wilmes._client import Connection
+from wilmes._replay import ReplayConnection
+from wilmes._types import PupilId
+from wilmes.tests.fake_wilma import FakeWilmaData, FakeWilmaServer
+
+ORIGIN = 'https://school.example.com'
+PUPIL_ID = PupilId('1000')
+
+
+def test_archive_stores_each_content_once(tmp_path: Path) -> None:
+    content = b'<html><body>' + b'<p>Hello</p>' * 1000 + b'</body></html>'
+    with ResponseArchive(str(tmp_path)) as archive:
+        content_hash = archive.save(ORIGIN, '/a', content, 'text/html')
+        assert archive.save(ORIGIN, '/b', content, 'text/html') == (
+            content_hash)
+        archived = archive.load(ORIGIN, '/b')
+        assert archive.load(ORIGIN, '/c') is None
+        assert list(archive.iter_urls()) == [(ORIGIN, '/a'), (ORIGIN, '/b')]
+
+    assert archived is not None
+    assert archived.content == content
+    assert archived.content_type == 'text/html'
+    objects = [
+        os.path.join(directory, name)
+        for (directory, _dirs, names) in os.walk(tmp_path / 'objects')
+        for name in names]
+    assert len(objects) == 1
+    assert os.path.getsize(objects[0]) < len(content) / 10
+
+
+def test_replay_archived_pages(tmp_path: Path) -> None:
+    data = FakeWilmaData(pupils=1, messages=3, replies=2, news=2)
+    with FakeWilmaServer(data) as server, \
+            ResponseArchive(str(tmp_path)) as archive:
+        url = server.url
+        with Connection.open(
+                url, 'user', 'pass', archive=archive) as connection:
+            messages = list(connection.iter_messages(PUPIL_ID))
+            news_items = list(connection.iter_news(PUPIL_ID))
+        request_count = server.request_count
+
+        with ReplayConnection(archive, url, max_workers=2) as replay:
+            assert replay.own_name == 'Parent Person'
+            assert replay.new_message_counts == (
+                connection.new_message_counts)
+            assert list(replay.iter_messages(PUPIL_ID)) == messages
+            assert list(replay.iter_news(PUPIL_ID)) == news_items
+            with pytest.raises(requests.HTTPError):
+                replay.fetch_message_list(PupilId('999'))
+
+        assert server.request_count == request_count
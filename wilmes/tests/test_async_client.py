@@ -0,0 +1,137 @@
+import asyncio
+from typing import Dict, List, Tuple
+
+import pytest
+
+from wilmes._client import Connection
+from wilmes._transport import TransportConfig
+from wilmes._types import Message, MessageInfo, NewsItem, Person, PupilId
+from wilmes.tests.fake_wilma import FakeWilmaData, FakeWilmaServer
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from wilmes._async_client import AsyncConnection  # noqa: E402,I001
+
+PUPIL_ID = PupilId('1000')
+NO_BACKOFF = TransportConfig(backoff_factor=0, backoff_jitter=0)
+
+
+def test_open() -> None:
+    async def open_and_close(server: FakeWilmaServer) -> AsyncConnection:
+        async with await AsyncConnection.open(
+                server.url, 'user', 'pass') as connection:
+            return connection
+
+    with FakeWilmaServer(FakeWilmaData(pupils=2, unread=3)) as server:
+        connection = asyncio.run(open_and_close(server))
+        assert server.sessions == {}  # Logged out
+
+    assert connection.own_name == 'Parent Person'
+    assert list(connection.pupils) == ['1000', '1001']
+    assert connection.new_message_counts == {'1000': 3, '1001': 3}
+
+
+def test_open_with_wrong_password() -> None:
+    with FakeWilmaServer() as server:
+        with pytest.raises(Exception, match='Login failed'):
+            asyncio.run(AsyncConnection.open(server.url, 'user', 'wrong'))
+
+
+def test_messages() -> None:
+    async def fetch(
+            server: FakeWilmaServer,
+    ) -> Tuple[List[MessageInfo], Dict[PupilId, List[int]]]:
+        async with await AsyncConnection.open(
+                server.url, 'user', 'pass') as connection:
+            infos = await connection.fetch_message_list(PUPIL_ID)
+            new_messages = await connection.get_new_messages()
+        return (infos, {
+            pupil.id: [x.id for x in messages]
+            for (pupil, messages) in new_messages.items()})
+
+    data = FakeWilmaData(pupils=2, messages=4, unread=2, replies=2)
+    with FakeWilmaServer(data) as server:
+        (infos, new_message_ids) = asyncio.run(fetch(server))
+
+    assert [(x.id, x.is_unread) for x in infos] == [
+        (100, True), (101, True), (102, False), (103, False)]
+    assert new_message_ids == {'1000': [100, 101], '1001': [100, 101]}
+
+
+def test_message_and_news_parsing_matches_connection() -> None:
+    async def fetch(
+            server: FakeWilmaServer,
+    ) -> Tuple[List[Message], List[NewsItem]]:
+        async with await AsyncConnection.open(
+                server.url, 'user', 'pass') as connection:
+            infos = await connection.fetch_message_list(PUPIL_ID)
+            messages = await asyncio.gather(*(
+                connection.fetch_message(x) for x in infos))
+            news_infos = await connection.fetch_news_list(PUPIL_ID)
+            news_items = await asyncio.gather(*(
+                connection.fetch_news_item(x) for x in news_infos))
+        return (list(messages), list(news_items))
+
+    data = FakeWilmaData(pupils=1, messages=3, replies=2, news=3)
+    with FakeWilmaServer(data) as server:
+        (messages, news_items) = asyncio.run(fetch(server))
+        with Connection.open(server.url, 'user', 'pass') as connection:
+            expected_messages = connection.fetch_messages(
+                connection.fetch_message_list(PUPIL_ID))
+            expected_news_items = connection.fetch_news_items(
+                connection.fetch_news_list(PUPIL_ID))
+
+    assert messages == expected_messages
+    assert news_items == expected_news_items
+    assert news_items[0].sender == Person('Head (Principal)', 7, 'personnel')
+
+
+def test_concurrency_is_limited() -> None:
+    async def fetch(server: FakeWilmaServer) -> int:
+        async with await AsyncConnection.open(
+                server.url, 'user', 'pass',
+                max_concurrency=2) as connection:
+            infos = await connection.fetch_message_list(PUPIL_ID)
+            messages = await asyncio.gather(*(
+                connection.fetch_message(x) for x in infos))
+        return len(messages)
+
+    data = FakeWilmaData(pupils=1, messages=8)
+    with FakeWilmaServer(data, page_delay=0.05) as server:
+        message_count = asyncio.run(fetch(server))
+
+    assert message_count == 8
+    assert server.max_active_requests == 2
+
+
+def test_retry_transient_failures() -> None:
+    async def fetch(server: FakeWilmaServer) -> Tuple[int, int]:
+        async with await AsyncConnection.open(
+                server.url, 'user', 'pass',
+                transport=NO_BACKOFF) as connection:
+            server.failures['/!1000/messages/list'] = 2
+            infos = await connection.fetch_message_list(PUPIL_ID)
+            return (len(infos), connection.transport_stats.retry_count)
+
+    with FakeWilmaServer() as server:
+        (info_count, retry_count) = asyncio.run(fetch(server))
+
+    assert info_count == 5
+    assert retry_count == 2
+
+
+def test_give_up_after_retries() -> None:
+    transport = TransportConfig(retries=1, backoff_factor=0, backoff_jitter=0)
+
+    async def fetch(server: FakeWilmaServer) -> None:
+        async with await AsyncConnection.open(
+                server.url, 'user', 'pass',
+                transport=transport) as connection:
+            server.failures['/!1000/news'] = 3
+            await connection.fetch_news_list(PUPIL_ID)
+
+    with FakeWilmaServer() as server:
+        with pytest.raises(aiohttp.ClientResponseError, match='503'):
+            asyncio.run(fetch(server))
+        # The first try and one retry
+        assert server.failures['/!1000/news'] == 1
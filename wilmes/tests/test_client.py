@@ -0,0 +1,283 @@
+import dataclasses
+import io
+import json
+import os
+import stat
+from datetime import datetime
+from http.cookiejar import CookieJar
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+from wilmes._client import Client, Connection
+from wilmes._export import write_jsonl
+from wilmes._polling import PollSchedule
+from wilmes._serialization import message_from_dict
+from wilmes._session_store import SessionStore
+from wilmes._settings import TZ
+from wilmes._types import Message, Person, PupilId
+from wilmes.tests.fake_wilma import FakeWilmaData, FakeWilmaServer
+
+PUPIL_ID = PupilId('1000')
+
+
+def test_open() -> None:
+    with FakeWilmaServer(FakeWilmaData(pupils=2, unread=3)) as server, \
+            Connection.open(server.url, 'user', 'pass') as connection:
+        assert connection.own_name == 'Parent Person'
+        assert list(connection.pupils) == ['1000', '1001']
+        assert connection.new_message_counts == {'1000': 3, '1001': 3}
+
+
+def test_open_with_wrong_password() -> None:
+    with FakeWilmaServer() as server:
+        with pytest.raises(Exception, match='Login failed'):
+            Connection.open(server.url, 'user', 'wrong')
+
+
+@pytest.mark.parametrize('max_workers', [1, 3])
+def test_messages(max_workers: int) -> None:
+    data = FakeWilmaData(pupils=1, messages=5, unread=2, replies=2)
+    with FakeWilmaServer(data) as server, Connection.open(
+            server.url, 'user', 'pass',
+            max_workers=max_workers) as connection:
+        infos = connection.fetch_message_list(PUPIL_ID)
+        messages = connection.fetch_messages(infos)
+        since = TZ.localize(datetime(2024, 1, 4))
+        recent = list(connection.iter_messages(PUPIL_ID, since=since))
+        new_messages = list(connection.iter_new_messages())
+
+    assert [(x.id, x.is_unread) for x in infos] == [
+        (100, True), (101, True), (102, False), (103, False), (104, False)]
+    assert [x.id for x in messages] == [x.id for x in infos]
+    assert messages[0].sender == Person('Teacher 0', 10, 'teachers')
+    assert messages[0].recipients[-1] == Person('Teacher Two', 12, 'teachers')
+    assert [x.body for x in messages[0].replies] == [
+        '<p>Reply 0 text</p>', '<p>Reply 1 text</p>']
+    assert [x.id for x in recent] == [103, 104]
+    assert [(pupil.id, x.id) for (pupil, x) in new_messages] == [
+        (PUPIL_ID, 100), (PUPIL_ID, 101)]
+
+
+def test_news() -> None:
+    with FakeWilmaServer(FakeWilmaData(pupils=1, news=3)) as server, \
+            Connection.open(server.url, 'user', 'pass') as connection:
+        infos = connection.fetch_news_list(PUPIL_ID)
+        news_items = list(connection.iter_news(PUPIL_ID))
+        unread_items = connection.fetch_news_items(infos, unread_only=True)
+        since = TZ.localize(datetime(2024, 2, 2))
+        recent_items = connection.fetch_news_items(infos, since)
+
+    assert [(x.id, x.subject, x.is_unread) for x in infos] == [
+        (499, 'Old news', False),
+        (500, 'News 0', True),
+        (501, 'News 1', False),
+        (502, 'News 2', False),
+    ]
+    assert [x.id for x in news_items] == [499, 500, 501, 502]
+    assert news_items[0].sender == Person('Head (Principal)', 7, 'personnel')
+    assert [x.id for x in unread_items] == [500]
+    assert [x.id for x in recent_items] == [502]
+
+
+def test_reuse_session(tmp_path: Path) -> None:
+    session_store = SessionStore(str(tmp_path / 'session'))
+    with FakeWilmaServer() as server:
+        client = Client(
+            server.url, 'user', 'pass', session_store=session_store)
+        with client.connect(reuse_session=True):
+            pass
+        request_count = server.request_count
+        with client.connect(reuse_session=True) as connection:
+            assert connection.own_name == 'Parent Person'
+
+    assert server.request_count == request_count + 1
+    assert stat.S_IMODE(os.stat(session_store.path).st_mode) == 0o600
+
+
+def test_session_file_is_private(tmp_path: Path) -> None:
+    path = tmp_path / 'session'
+    path.write_text('#LWP-Cookies-2.0\n')
+    path.chmod(0o644)
+    session_store = SessionStore(str(path))
+
+    session_store.save(CookieJar())
+
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    assert path.read_text() == '#LWP-Cookies-2.0\n'
+    assert [x.name for x in tmp_path.iterdir()] == ['session']
+
+
+def test_watch() -> None:
+    data = FakeWilmaData(pupils=2, messages=3, unread=1)
+    intervals: List[float] = []
+
+    def sleep(seconds: float) -> None:
+        intervals.append(seconds)
+        if len(intervals) == 1:
+            data.unread = 2
+        elif len(intervals) == 3:
+            raise KeyboardInterrupt
+
+    schedule = PollSchedule(1, 3, night_interval=None)
+    with FakeWilmaServer(data) as server, \
+            Connection.open(server.url, 'user', 'pass') as connection:
+        watched = []
+        with pytest.raises(KeyboardInterrupt):
+            for (pupil, message) in connection.watch(schedule, sleep=sleep):
+                watched.append((pupil.id, message.id))
+
+    assert watched == [
+        ('1000', 100), ('1001', 100), ('1000', 101), ('1001', 101)]
+    assert intervals == [1, 1, 2]
+    assert server.paths.count('/!1000/messages/list') == 2
+    assert connection.new_message_counts == {'1000': 2, '1001': 2}
+
+
+def test_update_message() -> None:
+    data = FakeWilmaData(pupils=1, messages=1, replies=2)
+    with FakeWilmaServer(data) as server, \
+            Connection.open(server.url, 'user', 'pass') as connection:
+        previous = connection.fetch_message(
+            connection.fetch_message_list(PUPIL_ID)[0])
+        data.replies = 4
+        info = connection.fetch_message_list(PUPIL_ID)[0]
+        update = connection.update_message(previous, info)
+        request_count = server.request_count
+        unchanged = connection.update_message(update.message, info)
+
+        assert server.request_count == request_count
+        assert update.message == connection.fetch_message(info)
+
+    assert [x.body for x in update.new_replies] == [
+        '<p>Reply 2 text</p>', '<p>Reply 3 text</p>']
+    assert update.changed_fields == ['reply_count']
+    assert update.message.replies[:2] == previous.replies
+    assert update.message.replies[0] is previous.replies[0]
+    assert update.message.replies[2:] == update.new_replies
+    assert not unchanged.has_changes
+
+
+def test_update_message_without_info() -> None:
+    data = FakeWilmaData(pupils=1, messages=1, replies=2)
+    with FakeWilmaServer(data) as server, \
+            Connection.open(server.url, 'user', 'pass') as connection:
+        previous = connection.fetch_message(
+            connection.fetch_message_list(PUPIL_ID)[0])
+        data.replies = 4
+        update = connection.update_message(previous)
+        unchanged = connection.update_message(update.message)
+
+    assert len(update.new_replies) == 2
+    assert update.changed_fields == ['last_timestamp', 'reply_count']
+    assert update.message.reply_count == 4
+    assert update.message.last_timestamp == update.new_replies[-1].timestamp
+    assert not unchanged.has_changes
+
+
+class ReplyListData(FakeWilmaData):
+    def __init__(self) -> None:
+        super().__init__(pupils=1, messages=1, replies=0)
+        self.reply_list: List[Tuple[str, str, str]] = []  # sender, date, text
+
+    def message_page(self, pupil_id: str, message_id: int) -> str:
+        replies = ''.join(
+            '<div class="m-replybox">'
+            f'<h2>{sender}\xa0 replied on {date}</h2>'
+            f'<div class="inner"><p>{text}</p></div>'
+            '</div>'
+            for (sender, date, text) in self.reply_list)
+        page = super().message_page(pupil_id, message_id)
+        return page.replace('</body>', f'{replies}</body>')
+
+
+def test_update_message_matches_reply_senders() -> None:
+    data = ReplyListData()
+    reply_a = ('Teacher A', '2.1.2024 10:00', 'A')
+    reply_b = ('Teacher B', '2.1.2024 10:00', 'B')
+    reply_c = ('Teacher C', '3.1.2024 10:00', 'C')
+    reply_d = ('Teacher D', '2.1.2024 10:00', 'D')
+    data.reply_list = [reply_a, reply_b, reply_c]
+    with FakeWilmaServer(data) as server, \
+            Connection.open(server.url, 'user', 'pass') as connection:
+        previous = connection.fetch_message(
+            connection.fetch_message_list(PUPIL_ID)[0])
+        data.reply_list = [reply_b, reply_d, reply_a, reply_c]
+        update = connection.update_message(previous)
+
+    assert [x.body for x in update.message.replies] == [
+        '<p>B</p>', '<p>D</p>', '<p>A</p>', '<p>C</p>']
+    assert update.message.replies[0] is previous.replies[1]
+    assert update.message.replies[2] is previous.replies[0]
+    assert [x.body for x in update.new_replies] == ['<p>D</p>']
+
+
+@pytest.mark.parametrize('max_workers', [1, 3])
+def test_list_messages(max_workers: int) -> None:
+    data = FakeWilmaData(pupils=1, messages=5, replies=1)
+    with FakeWilmaServer(data) as server, Connection.open(
+            server.url, 'user', 'pass',
+            max_workers=max_workers) as connection:
+        messages = connection.list_messages(PUPIL_ID)
+        assert server.paths[-1] == f'/!{PUPIL_ID}/messages/list'
+        assert [x.subject for x in messages[:2]] == [
+            'Subject 0 for 1000', 'Subject 1 for 1000']
+        assert not any(x.is_loaded for x in messages)
+
+        assert messages[0].body.startswith('<p>Hello from message 100')
+        assert [x.is_loaded for x in messages] == [
+            True, False, False, False, False]
+        connection.prefetch(messages[:3])
+        assert [x.is_loaded for x in messages] == [
+            True, True, True, False, False]
+        message_paths = [x for x in server.paths if '/messages/1' in x]
+        assert sorted(message_paths) == [
+            f'/!{PUPIL_ID}/messages/{100 + n}' for n in range(3)]
+
+        fetched = connection.fetch_message(messages[4])
+        assert str(messages[4]) == str(fetched)
+        assert messages[4].load() == fetched
+        assert len(messages[4].replies) == 1
+
+
+def test_lazy_messages_work_as_messages() -> None:
+    data = FakeWilmaData(pupils=1, messages=3, replies=1)
+    with FakeWilmaServer(data) as server, \
+            Connection.open(server.url, 'user', 'pass') as connection:
+        messages = connection.list_messages(PUPIL_ID)
+        fetched = connection.fetch_messages(messages)
+        connection.prefetch(messages[:2])
+        updates = [
+            connection.update_message(messages[0], fetched[0]),
+            connection.update_message(messages[1])]
+
+    assert messages[:2] == fetched[:2]
+    assert fetched[0] == messages[0]
+    assert [x.message for x in updates] == fetched[:2]
+    assert not any(x.has_changes for x in updates)
+    fp = io.StringIO()
+    assert write_jsonl(iter(messages[:2]), fp) == 2
+    assert [
+        message_from_dict(json.loads(line))
+        for line in fp.getvalue().splitlines()] == fetched[:2]
+    with pytest.raises(Exception, match=(
+            'Cannot fetch message 102: the connection is closed')):
+        messages[2].body
+
+
+def test_lazy_message_copies_are_messages() -> None:
+    data = FakeWilmaData(pupils=1, messages=2, unread=2, replies=1)
+    with FakeWilmaServer(data) as server, \
+            Connection.open(server.url, 'user', 'pass') as connection:
+        messages = connection.list_messages(PUPIL_ID)
+        fetched = connection.fetch_message(messages[0])
+        read = dataclasses.replace(messages[0], is_unread=False)
+        from_info = type(messages[1]).from_info_and_attrs(
+            messages[1], fetched.timestamp, [], 'Body')
+
+    assert type(read) is Message
+    assert read == dataclasses.replace(fetched, is_unread=False)
+    assert messages[0].is_unread
+    assert type(from_info) is Message
+    assert (from_info.id, from_info.body) == (messages[1].id, 'Body')
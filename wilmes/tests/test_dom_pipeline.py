@@ -0,0 +1,55 @@
+from typing import List
+
+import bs4
+from bs4.element import Tag
+
+from wilmes._client import CONTENT_REWRITES
+from wilmes._dom_pipeline import DomPipeline
+from wilmes._email_unmangling import unmangle_emails
+from wilmes._emojis import replace_emoji_imgs
+
+HEXSTRING = '88dcedfbfca6cde5e9e1e4c8edf0e9e5f8e4eda6ebe7e5'
+
+CONTENT = (
+    '<div>'
+    '<p>Hi <img src="/x/smiley/images/wink_smile.png"></p>'
+    f'<a href="/cdn-cgi/l/email-protection#{HEXSTRING}">mail</a>'
+    '<span class="__cf_email__" data-cfemail="{HEXSTRING}">'
+    '<img src="/x/smiley/images/heart.png"></span>'
+    '<img src="/other.png">'
+    '</div>').replace('{HEXSTRING}', HEXSTRING)
+
+
+def test_content_rewrites_match_separate_passes() -> None:
+    expected = bs4.BeautifulSoup(CONTENT, features='lxml')
+    replace_emoji_imgs(expected)
+    unmangle_emails(expected)
+    result = bs4.BeautifulSoup(CONTENT, features='lxml')
+
+    CONTENT_REWRITES.run(result)
+
+    assert str(result) == str(expected)
+
+
+def test_handler_order_and_removal() -> None:
+    calls: List[str] = []
+
+    def remove(element: Tag) -> None:
+        calls.append(f'remove:{element.get("id")}')
+        element.replace_with('')
+
+    pipeline = DomPipeline([('#gone', remove), ('.x.y', remove)])
+    pipeline = pipeline.extended([
+        ('b', lambda x: calls.append(f'b:{x.text}')),
+        ('.x', lambda x: calls.append(f'x:{x.get("id")}')),
+    ])
+    doc = bs4.BeautifulSoup(
+        '<p><b>1</b><i id="gone"><b>2</b></i>'
+        '<i id="xy" class="x y"><b>3</b></i>'
+        '<i id="x" class="x"><b>4</b></i></p>', features='lxml')
+
+    pipeline.run(doc)
+
+    assert calls == ['b:1', 'remove:gone', 'remove:xy', 'x:x', 'b:4']
+    assert str(doc.find('p')) == (
+        '<p><b>1</b><i class="x" id="x"><b>4</b></i></p>')
@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+import mailbox
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from wilmes._client import Connection
+from wilmes._export import (
+    ExportItem,
+    iter_export_items,
+    write_csv,
+    write_jsonl,
+    write_mbox,
+)
+from wilmes._serialization import message_from_dict, news_item_from_dict
+from wilmes._types import Message, Person
+from wilmes.tests.fake_wilma import FakeWilmaData, FakeWilmaServer
+
+
+@pytest.fixture(scope='module')
+def items() -> List[ExportItem]:
+    data = FakeWilmaData(pupils=1, messages=2, replies=2, news=1)
+    with FakeWilmaServer(data) as server, \
+            Connection.open(server.url, 'user', 'pass') as connection:
+        return list(iter_export_items(connection))
+
+
+def test_jsonl(items: List[ExportItem]) -> None:
+    fp = io.StringIO()
+
+    count = write_jsonl(iter(items), fp)
+
+    records = [json.loads(line) for line in fp.getvalue().splitlines()]
+    assert count == len(records) == 4
+    assert [x['kind'] for x in records] == [
+        'message', 'message', 'news_item', 'news_item']
+    assert [
+        message_from_dict(x) if x['kind'] == 'message'
+        else news_item_from_dict(x)
+        for x in records] == items
+
+
+def test_mbox(items: List[ExportItem], tmp_path: Path) -> None:
+    path = tmp_path / 'export.mbox'
+    with open(path, 'w', encoding='utf-8', newline='') as fp:
+        count = write_mbox(iter(items), fp)
+
+    emails = list(mailbox.mbox(str(path)))
+    assert count == 4
+    assert len(emails) == 2 * 3 + 2
+    (message, reply) = emails[:2]
+    assert message['Subject'] == 'Subject 0 for 1000'
+    assert message['From'] == 'Teacher 0 <teachers-10@127.0.0.1>'
+    assert message['Date'] == 'Mon, 01 Jan 2024 12:00:00 +0200'
+    assert 'Teacher Two <teachers-12@127.0.0.1>' in message['To']
+    assert reply['In-Reply-To'] == message['Message-ID']
+    assert reply['Subject'] == 'Re: Subject 0 for 1000'
+    assert [x.get_content_type() for x in message.walk()] == [
+        'multipart/alternative', 'text/plain', 'text/html']
+    assert emails[-1]['Subject'] == 'News 0'
+
+
+def test_mbox_with_line_breaks_in_headers(
+        items: List[ExportItem],
+        tmp_path: Path,
+) -> None:
+    message = items[0]
+    assert isinstance(message, Message)
+    message = Message.from_info_and_attrs(
+        message, message.timestamp, message.recipients, message.body)
+    message.subject = 'Two\nlines'
+    message.sender = Person('Teacher\r\n Name', 10, 'teachers')
+    path = tmp_path / 'export.mbox'
+    with open(path, 'w', encoding='utf-8', newline='') as fp:
+        count = write_mbox(iter([message]), fp)
+
+    emails = list(mailbox.mbox(str(path)))
+    assert count == 1
+    assert emails[0]['Subject'] == 'Two lines'
+    assert emails[0]['From'] == 'Teacher Name <teachers-10@127.0.0.1>'
+
+
+def test_csv(items: List[ExportItem]) -> None:
+    fp = io.StringIO()
+
+    write_csv(iter(items), fp)
+
+    rows = list(csv.DictReader(io.StringIO(fp.getvalue())))
+    assert [(x['kind'], x['id'], x['reply_number']) for x in rows] == [
+        ('message', '100', ''), ('reply', '100', '1'), ('reply', '100', '2'),
+        ('message', '101', ''), ('reply', '101', '1'), ('reply', '101', '2'),
+        ('news_item', '499', ''), ('news_item', '500', '')]
+    message = items[0]
+    assert isinstance(message, Message)
+    assert rows[0]['body'] == message.body
+    assert rows[0]['recipients'].endswith('; Teacher Two')
@@ -0,0 +1,93 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import wilmes
+from wilmes._client import Connection
+from wilmes._front_page import FrontPageParser, check_front_page
+from wilmes._session_store import SessionStore
+from wilmes.tests.fake_wilma import FakeWilmaData, FakeWilmaServer
+
+
+def test_check_front_page_matches_connection() -> None:
+    data = FakeWilmaData(pupils=2, unread=3)
+    with FakeWilmaServer(data) as server:
+        status = check_front_page(server.url, 'user', 'pass')
+        with Connection.open(server.url, 'user', 'pass') as connection:
+            assert status.pupils == connection.pupils
+            assert status.new_message_counts == (
+                connection.new_message_counts)
+        assert server.paths.count('/logout') == 2
+        assert not any(server.sessions.values())
+
+
+def test_check_front_page_with_wrong_password() -> None:
+    with FakeWilmaServer() as server:
+        with pytest.raises(Exception, match='Login failed'):
+            check_front_page(server.url, 'user', 'wrong')
+
+
+def test_check_front_page_reuses_session(tmp_path: Path) -> None:
+    session_store = SessionStore(str(tmp_path / 'session'))
+    with FakeWilmaServer() as server:
+        check_front_page(
+            server.url, 'user', 'pass', session_store=session_store)
+        del server.paths[:]
+        status = check_front_page(
+            server.url, 'user', 'pass', session_store=session_store)
+        assert server.paths == ['/']
+        assert list(status.pupils) == ['1000', '1001']
+
+        # The session can be continued by a connection too
+        connection = Connection.resume(server.url, session_store)
+        assert connection is not None
+        assert connection.own_name == 'Parent Person'
+
+
+def test_front_page_parser() -> None:
+    parser = FrontPageParser()
+    parser.feed(
+        '<div class="name-container"><img src="x.png">'
+        '<span class="teacher">Me</span></div>'
+        '<a href="/!1/messages"><b>2</b> new &amp; unread</a>'
+        '<a name="anchor">Not a link</a>')
+    assert parser.links == [('/!1/messages', '2 new & unread')]
+    assert parser.is_logged_in
+
+
+def test_main_module_imports_no_heavy_libraries() -> None:
+    code = (
+        'import sys, wilmes.__main__; '
+        'print(sorted({"bs4", "mechanicalsoup", "requests"} & '
+        'set(sys.modules)))')
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        check=True, capture_output=True, text=True)
+    assert result.stdout.strip() == '[]'
+
+
+def test_package_exports_are_imported_on_access() -> None:
+    assert sorted(wilmes._MODULES) == sorted(
+        wilmes.__all__ + ['AsyncConnection'])
+    assert wilmes.Connection is Connection
+    with pytest.raises(AttributeError):
+        wilmes.NoSuchName
+
+
+def test_star_import_without_aiohttp() -> None:
+    code = (
+        'import sys; sys.modules["aiohttp"] = None\n'
+        'from wilmes import *\n'
+        'import wilmes\n'
+        'try:\n'
+        '    wilmes.AsyncConnection\n'
+        'except ImportError as error:\n'
+        '    print(error)\n')
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        check=True, capture_output=True, text=True)
+    assert result.stdout.strip() == (
+        'AsyncConnection needs aiohttp, install it with'
+        ' "pip install wilmes[async]"')
@@ -0,0 +1,153 @@
+from datetime import datetime
+
+import pytest
+
+from wilmes import _client
+from wilmes._client import (
+    MESSAGE_PAGE_REGIONS,
+    NEWS_ITEM_PAGE_REGIONS,
+    NEWS_LIST_PAGE_REGIONS,
+    _ConnectionBase,
+)
+from wilmes._html_parsing import HTML_PARSERS, HtmlParser
+from wilmes._settings import TZ
+from wilmes._types import (
+    MessageId,
+    MessageInfo,
+    NewsItemId,
+    NewsItemInfo,
+    Person,
+    PupilId,
+)
+
+ORIGIN = 'https://school.example.com'
+PUPIL_ID = PupilId('123')
+
+MESSAGE_PAGE = (
+    '<html><head><title>Message</title></head><body>'
+    '<div class="container"><div class="panel">'
+    '<table class="table"><tbody>'
+    '<tr><th>Sent:</th><td>1.1.2024 12:00</td></tr>'
+    '<tr><th>Recipients:</th><td><div id="recipients-cell">'
+    'Parent One (1A), Parent Two, '
+    '<a class="profile-link" href="/profiles/teachers/12">Teacher</a>'
+    '</div></td></tr></tbody></table>'
+    '<div class="ckeditor hidden"><p>Hello'
+    ' <img src="/x/smiley/images/regular_smile.png"></p>'
+    '<table><tr><th>Not:</th><td>inner table</td></tr></table>'
+    '</div>'
+    '<div class="m-replybox"><h2>You replied on 2.1.2024 10:00</h2>'
+    '<div class="inner"><p>Reply</p></div></div>'
+    '</div></div>'
+    '<footer><a href="/somewhere">Link</a></footer>'
+    '</body></html>'
+).encode('utf-8')
+
+NEWS_LIST_PAGE = (
+    '<html><body>'
+    '<nav><a class="nav" href="/!123/news/1">Archived</a></nav>'
+    '<div class="col"><h2>5.2.2024</h2>'
+    '<div class="well"><h3>First <span class="label">New</span></h3>'
+    '<a href="/!123/news/2">Read more</a></div>'
+    '<div class="well"><h3>Second</h3>'
+    '<a href="/!123/news/3">Read more</a></div>'
+    '</div></body></html>'
+).encode('utf-8')
+
+NEWS_ITEM_PAGE = (
+    '<html><body><div class="container"><div class="panel-body">'
+    '<div class="horizontal-link-container">'
+    '<span class="small">Published 3.2.2024</span>'
+    '<a class="profile-link" href="/profiles/personnel/7">'
+    'Principal (Head)</a></div>'
+    '<div id="news-content"><p>Body</p></div>'
+    '</div></div></body></html>'
+).encode('utf-8')
+
+
+def make_parser(html_parser: HtmlParser) -> _ConnectionBase:
+    parser = _ConnectionBase(ORIGIN, html_parser)
+    parser.own_name = 'Parent One'
+    return parser
+
+
+@pytest.mark.parametrize('html_parser', HTML_PARSERS.values())
+def test_message_page(html_parser: HtmlParser) -> None:
+    parser = make_parser(html_parser)
+    info = MessageInfo(
+        id=MessageId(1), origin=ORIGIN, pupil_id=PUPIL_ID, subject='Hi',
+        last_timestamp=TZ.localize(datetime(2024, 1, 2, 10)),
+        folder='Inbox', sender=Person('Teacher'), reply_count=1,
+        is_unread=True)
+    page = html_parser.parse(MESSAGE_PAGE, None, MESSAGE_PAGE_REGIONS)
+
+    message = parser._parse_message(
+        info, parser._get_message_body(page, 'url'))
+
+    assert message.timestamp == TZ.localize(datetime(2024, 1, 1, 12))
+    assert message.recipients == [
+        Person('Parent One (1A)'),
+        Person('Parent Two'),
+        Person('Teacher', id=12, type='teachers'),
+    ]
+    assert message.body == (
+        '<p>Hello 🙂</p>\n'
+        '<table><tr><th>Not:</th><td>inner table</td></tr></table>')
+    assert [(x.sender.name, x.body) for x in message.replies] == [
+        ('Parent One', '<p>Reply</p>')]
+
+
+def test_persons_are_shared_within_connection() -> None:
+    parser = make_parser(HTML_PARSERS['regions'])
+    rows = [
+        {'Id': n, 'Subject': 'Hi', 'TimeStamp': '2024-01-02 10:00',
+         'Folder': 'Inbox', 'Sender': 'Teacher', 'SenderId': 12,
+         'SenderType': 1}
+        for n in range(3)]
+
+    infos = parser._parse_message_list(PUPIL_ID, {'Messages': rows})
+
+    assert infos[0].sender == Person('Teacher', 12, 'teachers')
+    assert all(x.sender is infos[0].sender for x in infos)
+    assert parser._get_person('Teacher', 12, 'teachers') is infos[0].sender
+    assert parser._get_person('Teacher') is not infos[0].sender
+
+
+def test_shared_persons_are_limited(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(_client, 'PERSON_CACHE_SIZE', 2)
+    parser = make_parser(HTML_PARSERS['regions'])
+
+    first = parser._get_person('First')
+    assert parser._get_person('First') is first
+    parser._get_person('Second')
+    parser._get_person('Third')
+
+    assert parser._persons.cache_info().currsize == 2
+    assert parser._get_person('Third') is parser._get_person('Third')
+    assert parser._get_person('First') is not first
+
+
+@pytest.mark.parametrize('html_parser', HTML_PARSERS.values())
+def test_news_pages(html_parser: HtmlParser) -> None:
+    parser = make_parser(html_parser)
+    page = html_parser.parse(NEWS_LIST_PAGE, None, NEWS_LIST_PAGE_REGIONS)
+
+    infos = parser._parse_news_list(PUPIL_ID, page)
+
+    date = TZ.localize(datetime(2024, 2, 5))
+    assert [(x.id, x.subject, x.timestamp, x.is_unread) for x in infos] == [
+        (1, 'Archived', None, False),
+        (2, 'First', date, True),
+        (3, 'Second', date, False),
+    ]
+
+    info = NewsItemInfo(
+        id=NewsItemId(2), origin=ORIGIN, pupil_id=PUPIL_ID,
+        subject='First', timestamp=date, is_unread=True)
+    page = html_parser.parse(NEWS_ITEM_PAGE, None, NEWS_ITEM_PAGE_REGIONS)
+
+    news_item = parser._parse_news_item(
+        info, parser._get_news_item_body(page, 'url'))
+
+    assert news_item.sender == Person('Head (Principal)', 7, 'personnel')
+    assert news_item.body == '<p>Body</p>'
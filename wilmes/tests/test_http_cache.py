@@ -0,0 +1,72 @@
+import dataclasses
+
+import pytest
+
+from wilmes._client import Connection
+from wilmes._http_cache import HttpCache
+from wilmes._types import PupilId
+from wilmes.tests.fake_wilma import FakeWilmaData, FakeWilmaServer
+
+PUPIL_ID = PupilId('1000')
+
+
+@pytest.mark.parametrize('etags', [True, False])
+def test_unchanged_pages_are_not_parsed_again(etags: bool) -> None:
+    data = FakeWilmaData(pupils=1, messages=2, unread=1, news=2)
+    http_cache = HttpCache()
+    with FakeWilmaServer(data, etags=etags) as server, Connection.open(
+            server.url, 'user', 'pass',
+            http_cache=http_cache) as connection:
+        infos1 = connection.fetch_message_list(PUPIL_ID)
+        message1 = connection.fetch_message(infos1[0])
+        news1 = connection.fetch_news_list(PUPIL_ID)
+        news_item1 = connection.fetch_news_item(news1[1])
+        infos2 = connection.fetch_message_list(PUPIL_ID)
+        message2 = connection.fetch_message(infos2[0])
+        news2 = connection.fetch_news_list(PUPIL_ID)
+        news_item2 = connection.fetch_news_item(news2[1])
+
+        assert http_cache.miss_count == 4
+        reuse_count = (
+            http_cache.not_modified_count if etags
+            else http_cache.unchanged_count)
+        assert reuse_count == 4
+        assert infos2 == infos1 and infos2[0] is infos1[0]
+        assert news2 == news1 and news2[0] is news1[0]
+        assert message2 == message1
+        assert message2.replies[0] is message1.replies[0]
+        assert news_item2 == news_item1
+
+        data.replies += 1
+        message3 = connection.fetch_message(infos2[0])
+
+        assert http_cache.miss_count == 5
+        assert len(message3.replies) == len(message1.replies) + 1
+
+
+def test_reused_message_gets_current_info() -> None:
+    http_cache = HttpCache()
+    with FakeWilmaServer(etags=True) as server, Connection.open(
+            server.url, 'user', 'pass',
+            http_cache=http_cache) as connection:
+        info = connection.fetch_message_list(PUPIL_ID)[0]
+        connection.fetch_message(info)
+        # E.g. the same message listed later as read
+        read_info = dataclasses.replace(info, is_unread=False)
+        message = connection.fetch_message(read_info)
+
+    assert http_cache.not_modified_count == 1
+    assert info.is_unread
+    assert not message.is_unread
+
+
+def test_least_recently_used_entries_are_dropped() -> None:
+    http_cache = HttpCache(max_entries=2)
+    with FakeWilmaServer(FakeWilmaData(pupils=3)) as server, Connection.open(
+            server.url, 'user', 'pass',
+            http_cache=http_cache) as connection:
+        for pupil_id in ['1000', '1001', '1000', '1002', '1000']:
+            connection.fetch_message_list(PupilId(pupil_id))
+
+    assert len(http_cache) == 2
+    assert (http_cache.miss_count, http_cache.unchanged_count) == (3, 2)
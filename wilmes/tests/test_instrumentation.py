@@ -0,0 +1,91 @@
+from typing import List
+
+from wilmes._client import MESSAGE_LIST_PATH, MESSAGE_PATH, Connection
+from wilmes._instrumentation import MetricsCollector, ParseEvent, RequestEvent
+from wilmes._types import PupilId
+from wilmes.tests.fake_wilma import FakeWilmaData, FakeWilmaServer
+
+
+class RecordingObserver:
+    def __init__(self) -> None:
+        self.requests: List[RequestEvent] = []
+        self.parses: List[ParseEvent] = []
+
+    def on_request(self, event: RequestEvent) -> None:
+        self.requests.append(event)
+
+    def on_parse(self, event: ParseEvent) -> None:
+        self.parses.append(event)
+
+
+def test_connection_events() -> None:
+    observer = RecordingObserver()
+    data = FakeWilmaData(pupils=1, messages=1)
+    with FakeWilmaServer(data) as server, Connection.open(
+            server.url, 'user', 'pass', observer=observer) as connection:
+        infos = connection.fetch_message_list(PupilId('1000'))
+        connection.fetch_message(infos[0])
+
+    requests = observer.requests
+    assert [(x.method, x.url_template, x.status) for x in requests] == [
+        ('GET', '/token', 200),
+        ('GET', '/', 200),
+        ('POST', '/login', 200),
+        ('GET', MESSAGE_LIST_PATH, 200),
+        ('GET', MESSAGE_PATH, 200),
+        ('POST', '/logout', 200),
+    ]
+    assert requests[4].url == (
+        f'{server.url}/!1000/messages/100?recipients')
+    assert requests[4].bytes > 0
+    assert [(x.phase, x.url_template) for x in observer.parses] == [
+        ('front_page', None),
+        ('message_list', None),
+        ('html', MESSAGE_PATH),
+        ('message_body', None),
+        ('sent_time', None),
+        ('recipients', None),
+        ('message_content', None),
+        ('replies', None),
+    ]
+
+
+def test_metrics_collector() -> None:
+    metrics = MetricsCollector(buckets=[0.1, 1.0])
+    for seconds in [0.05, 0.5, 2.0]:
+        metrics.on_request(RequestEvent(
+            url_template='/"x"', url='/"x"', method='GET', status=200,
+            bytes=10, seconds=seconds))
+    metrics.on_request(RequestEvent(
+        url_template='/"x"', url='/"x"', method='GET', status=None,
+        bytes=0, seconds=0.5))
+    metrics.on_parse(ParseEvent('recipients', 0.01))
+
+    assert metrics.to_dict() == {
+        'requests': [
+            {'url_template': '/"x"', 'status': '200',
+             'buckets': {'0.1': 1, '1.0': 2, '+Inf': 3},
+             'sum': 2.55, 'count': 3},
+            {'url_template': '/"x"', 'status': 'error',
+             'buckets': {'0.1': 0, '1.0': 1, '+Inf': 1},
+             'sum': 0.5, 'count': 1},
+        ],
+        'response_bytes': [{'url_template': '/"x"', 'bytes': 30}],
+        'parsing': [
+            {'phase': 'recipients', 'url_template': None,
+             'buckets': {'0.1': 1, '1.0': 1, '+Inf': 1},
+             'sum': 0.01, 'count': 1},
+        ],
+    }
+    lines = metrics.to_prometheus().splitlines()
+    assert '# TYPE wilmes_request_duration_seconds histogram' in lines
+    assert (
+        'wilmes_request_duration_seconds_bucket'
+        '{url="/\\"x\\"",status="200",le="1.0"} 2') in lines
+    assert (
+        'wilmes_request_duration_seconds_count'
+        '{url="/\\"x\\"",status="200"} 3') in lines
+    assert 'wilmes_response_bytes_total{url="/\\"x\\""} 30' in lines
+    assert (
+        'wilmes_parse_duration_seconds_bucket'
+        '{phase="recipients",le="+Inf"} 1') in lines
@@ -0,0 +1,116 @@
+import os
+import time
+from pathlib import Path
+from typing import List
+
+from wilmes._multi import (
+    Account,
+    AccountEvent,
+    AccountMessage,
+    AccountResult,
+    MultiClient,
+    load_accounts,
+)
+from wilmes.tests.fake_wilma import FakeWilmaData, FakeWilmaServer
+
+
+def test_iter_new_messages() -> None:
+    data = FakeWilmaData(pupils=2, messages=3, unread=2)
+    with FakeWilmaServer(data, login_delay=0.5) as slow_server, \
+            FakeWilmaServer(data) as fast_server:
+        multi_client = MultiClient([
+            Account('slow', slow_server.url, 'user', 'pass'),
+            Account('fast', fast_server.url, 'user', 'pass'),
+            Account('failing', fast_server.url, 'user', 'wrong'),
+        ])
+        events: List[AccountEvent] = list(multi_client.iter_new_messages())
+
+    results = {x.account: x for x in events if isinstance(x, AccountResult)}
+    messages = [x for x in events if isinstance(x, AccountMessage)]
+    assert sorted(
+        (x.account, x.message_count, x.ok) for x in results.values()) == [
+            ('failing', 0, False), ('fast', 4, True), ('slow', 4, True)]
+    # The slow login should not hold up the other accounts
+    assert events[-1] == results['slow']
+    assert results['slow'].login_seconds >= 0.5
+    assert 'Login failed' in str(results['failing'].error)
+    assert sorted((x.account, x.pupil.id, x.message.id) for x in messages) == [
+        (account, pupil_id, message_id)
+        for account in ['fast', 'slow']
+        for pupil_id in data.pupil_ids
+        for message_id in [100, 101]]
+
+
+def test_per_origin_limit() -> None:
+    with FakeWilmaServer(login_delay=0.2) as server:
+        multi_client = MultiClient(
+            [Account(f'account{n}', server.url, 'user', 'pass')
+             for n in range(3)],
+            max_per_origin=1)
+        results = [
+            x for x in multi_client.iter_new_messages()
+            if isinstance(x, AccountResult)]
+
+    assert all(x.ok for x in results)
+    assert sorted(round(x.wait_seconds, 1) for x in results)[0] == 0
+    assert max(x.wait_seconds for x in results) >= 0.4
+
+
+def test_slow_origin_does_not_block_other_origins() -> None:
+    with FakeWilmaServer(login_delay=0.3) as slow_server, \
+            FakeWilmaServer() as fast_server:
+        multi_client = MultiClient(
+            [Account(f'slow{n}', slow_server.url, 'user', 'pass')
+             for n in range(4)]
+            + [Account('fast', fast_server.url, 'user', 'pass')],
+            max_workers=2, max_per_origin=1)
+        start = time.monotonic()
+        result_times = {
+            x.account: (x, time.monotonic() - start)
+            for x in multi_client.iter_new_messages()
+            if isinstance(x, AccountResult)}
+
+    (fast_result, fast_time) = result_times['fast']
+    assert fast_result.ok
+    assert fast_result.wait_seconds < 0.2
+    assert fast_time < 0.3
+    assert all(
+        elapsed >= 0.3 for (result, elapsed) in result_times.values()
+        if result.account != 'fast')
+    assert max(x[0].wait_seconds for x in result_times.values()) >= 0.9
+
+
+def test_load_accounts(tmp_path: Path) -> None:
+    path = str(tmp_path / 'accounts.toml')
+    with open(path, 'w') as fp:
+        fp.write(
+            '[[accounts]]\n'
+            'name = "first"\n'
+            'url = "https://a.example.com"\n'
+            'username = "user1"\n'
+            'password = "pass1"\n'
+            'session_file = "first.session"\n'
+            '\n'
+            '[[accounts]]\n'
+            'url = "https://b.example.com"\n'
+            'username = "user2"\n'
+            'password_env = "WILMES_TEST_PASSWORD"\n'
+            '\n'
+            '[[accounts]]\n'
+            'url = "https://a.example.com"\n'
+            'username = "user3"\n')
+    os.environ['WILMES_TEST_PASSWORD'] = 'pass2'
+    try:
+        accounts = load_accounts(path, get_password=(lambda x: x.upper()))
+    finally:
+        del os.environ['WILMES_TEST_PASSWORD']
+
+    assert accounts == [
+        Account('first', 'https://a.example.com', 'user1', 'pass1',
+                'first.session'),
+        Account('user2@https://b.example.com', 'https://b.example.com',
+                'user2', 'pass2'),
+        Account('user3@https://a.example.com', 'https://a.example.com',
+                'user3', 'USER3@HTTPS://A.EXAMPLE.COM'),
+    ]
+    assert accounts[0].origin == accounts[2].origin == 'a.example.com'
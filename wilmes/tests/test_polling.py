@@ -0,0 +1,38 @@
+from datetime import datetime
+
+import pytest
+
+from wilmes._polling import PollSchedule
+from wilmes._settings import TZ
+
+DAY = TZ.localize(datetime(2024, 3, 1, 12, 0))
+
+
+def test_backoff_and_reset() -> None:
+    schedule = PollSchedule(10, 50, backoff=2)
+
+    intervals = [
+        schedule.next_interval(active, DAY)
+        for active in [True, False, False, False, True, False]]
+
+    assert intervals == [10, 20, 40, 50, 10, 20]
+
+
+@pytest.mark.parametrize('hour,minute,expected', [
+    (21, 59, 10),
+    (22, 0, 3600),
+    (23, 30, 3600),
+    (5, 30, 1800),
+    (5, 59, 60),
+    (6, 0, 10),
+])
+def test_night(hour: int, minute: int, expected: float) -> None:
+    schedule = PollSchedule(10, 60)
+    now = TZ.localize(datetime(2024, 3, 1, hour, minute))
+
+    assert schedule.next_interval(True, now) == expected
+
+
+def test_invalid_intervals() -> None:
+    with pytest.raises(ValueError):
+        PollSchedule(10, 5)
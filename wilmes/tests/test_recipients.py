@@ -0,0 +1,56 @@
+from typing import List
+
+import pytest
+
+from wilmes._client import _ConnectionBase, _MessageParts
+from wilmes._html_parsing import FULL_HTML_PARSER
+from wilmes._recipients import PERSON_LIST_RX, split_person_list
+from wilmes._types import Person
+
+
+def split_with_regex(text: str) -> List[str]:
+    names = (x.group(1).strip() for x in PERSON_LIST_RX.finditer(text))
+    return [x for x in names if x]
+
+
+@pytest.mark.parametrize('text', [
+    '',
+    'Teacher',
+    'Teacher One, Teacher Two',
+    'Pupil (7A), Other Pupil (Class 8B), Third',
+    'Group (a, b), Person (x) suffix (y), Last',
+    'Name (nested (parens)), Other',
+    'Smith,John, Doe',
+    'Unclosed (paren, Next, Last',
+    'A (x) (y, B',
+    ', , Leading, , commas, ',
+    '(Starts with paren), Name',
+    'Trailing newline\n',
+    'a(' * 50 + ')',
+    'a,' * 50,
+])
+def test_split_person_list_matches_regex(text: str) -> None:
+    assert split_person_list(text) == split_with_regex(text)
+
+
+def test_split_person_list_pathological_input() -> None:
+    # These take seconds to minutes with the regex
+    assert split_person_list('x' * 100000 + ',y') == ['y']
+    assert split_person_list('a (' * 100000) == []
+    assert split_person_list('a,' * 100000 + ' b') == ['a', 'b']
+
+
+def test_duplicate_recipients_are_included_once() -> None:
+    page = FULL_HTML_PARSER.parse(
+        b'<div id="recipients-cell">Pupil (7A), Parent, '
+        b'<a class="profile-link" href="/profiles/teachers/12">Teacher</a>'
+        b', Pupil (7A), Parent, '
+        b'<a class="profile-link" href="/profiles/teachers/12">Teacher</a>'
+        b'</div>')
+    parts = _MessageParts(page)
+    parts.recipients_cell = page.select_one('#recipients-cell')
+    connection = _ConnectionBase('https://example.com', FULL_HTML_PARSER)
+    recipients = connection._parse_recipients(parts)
+
+    assert [x.name for x in recipients] == ['Pupil (7A)', 'Parent', 'Teacher']
+    assert recipients[2] == Person('Teacher', 12, 'teachers')
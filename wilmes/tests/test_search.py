@@ -0,0 +1,131 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from wilmes import _search
+from wilmes._client import Connection
+from wilmes._settings import TZ
+from wilmes._store import MessageStore
+from wilmes._types import (
+    Message,
+    MessageId,
+    MessageInfo,
+    Person,
+    PupilId,
+    ReplyMessage,
+)
+from wilmes.tests.fake_wilma import FakeWilmaData, FakeWilmaServer
+
+ORIGIN = 'https://school.example.com'
+PUPIL_ID = PupilId('123')
+
+
+def make_message(reply_body: str) -> Message:
+    info = MessageInfo(
+        id=MessageId(42),
+        origin=ORIGIN,
+        pupil_id=PUPIL_ID,
+        subject='Excursion to the museum',
+        last_timestamp=TZ.localize(datetime(2024, 1, 3, 8, 0)),
+        folder='Inbox',
+        sender=Person('Teacher Tuuli'),
+        reply_count=1,
+        is_unread=False,
+    )
+    reply = ReplyMessage(
+        timestamp=TZ.localize(datetime(2024, 1, 3, 8, 0)),
+        sender=Person('Parent'),
+        body=f'<p>{reply_body}</p>')
+    return Message.from_info_and_attrs(
+        info,
+        timestamp=TZ.localize(datetime(2024, 1, 2, 12, 0)),
+        recipients=[Person('Class 7A')],
+        body='<p>Bring <b>packed lunches</b> &amp; raincoats</p>',
+        replies=[reply])
+
+
+@pytest.fixture(params=[True, False], ids=['fts5', 'without_fts5'])
+def has_fts(request: Any, monkeypatch: pytest.MonkeyPatch) -> bool:
+    if not request.param:
+        # Fail like an SQLite library without the FTS5 extension
+        monkeypatch.setattr(
+            _search, 'FTS_TEXT_SCHEMA',
+            _search.FTS_TEXT_SCHEMA.replace('fts5', 'missing_fts5'))
+    has_fts: bool = request.param
+    return has_fts
+
+
+def test_search_messages_and_replies(has_fts: bool) -> None:
+    with MessageStore(':memory:') as store:
+        assert store.search_index.has_fts == has_fts
+        store.save_messages([make_message('Thanks')])
+        assert [(x.kind, x.reply_number) for x in store.search('lunch')] == [
+            ('message', None)]
+        assert store.search('rainc')[0].snippet == (
+            'Bring packed lunches & [raincoats]')
+        assert store.search('7a')[0].snippet == 'Class [7A]'
+        assert store.search('tuuli')[0].subject == 'Excursion to the museum'
+        assert [(x.kind, x.subject) for x in store.search('thanks')] == [
+            ('reply', 'Excursion to the museum')]
+        assert [x.kind for x in store.search('museum')] == ['message']
+        assert store.search('"OR') == []
+
+        # Saving the message again replaces its earlier index entries
+        store.save_messages([make_message('Will do')])
+        assert store.search('thanks') == []
+        hits = store.search('will')
+        assert [(x.kind, x.item_id, x.reply_number) for x in hits] == [
+            ('reply', 42, 1)]
+
+
+def test_search_index_built_for_existing_store(tmp_path: Path) -> None:
+    path = str(tmp_path / 'store.sqlite')
+    with MessageStore(path) as store:
+        store.save_messages([make_message('Thanks')])
+        store._db.executescript(
+            'DROP TABLE search_rows; DROP TABLE search_text;')
+    with MessageStore(path) as store:
+        assert [x.kind for x in store.search('museum')] == ['message']
+
+
+def test_sync_updates_search_index(tmp_path: Path) -> None:
+    data = FakeWilmaData(pupils=1, messages=2, news=2)
+    path = str(tmp_path / 'store.sqlite')
+    with FakeWilmaServer(data) as server, \
+            Connection.open(server.url, 'user', 'pass') as connection, \
+            MessageStore(path) as store:
+        connection.sync(store)
+        assert {x.item_id for x in store.search('hello message')} == {
+            100, 101}
+        hits = store.search('news body 501')
+        assert [(x.kind, x.item_id) for x in hits] == [('news_item', 501)]
+
+        data.messages = 3
+        connection.sync(store)
+        hits = store.search('hello message 102')
+        assert [(x.kind, x.item_id) for x in hits] == [('message', 102)]
+
+
+def test_snippet_length(
+        has_fts: bool,
+        monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(_search, 'SNIPPET_WORDS', 4)
+    message = make_message(' '.join(f'word{n}' for n in range(30)))
+    with MessageStore(':memory:') as store:
+        store.save_messages([message])
+        hits = store.search('word10')
+
+    assert [x.snippet for x in hits] == ['...word9 [word10] word11 word12...']
+
+
+def test_make_snippet() -> None:
+    text = ' '.join(f'word{n}' for n in range(30))
+
+    assert _search.make_snippet(['', text], ['WORD10']) == (
+        '...word9 [word10] word11 word12 word13 word14 word15 word16'
+        ' word17 word18 word19 word20...')
+    assert _search.make_snippet([text], ['word29']).startswith('...word18 ')
+    assert _search.make_snippet([text], ['nothing']) == ''
@@ -0,0 +1,165 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from typing import Any, Iterator, List
+
+import pytest
+
+from wilmes._client import Client, Connection
+from wilmes._server import ResultCache, WilmesService, make_server
+from wilmes._types import PupilId
+from wilmes.tests.fake_wilma import FakeWilmaData, FakeWilmaServer
+
+PUPIL_ID = PupilId('1000')
+
+
+@pytest.fixture
+def site() -> Iterator[FakeWilmaServer]:
+    data = FakeWilmaData(pupils=2, messages=3, unread=1, replies=1, news=2)
+    with FakeWilmaServer(data) as server:
+        yield server
+
+
+def test_endpoints(site: FakeWilmaServer) -> None:
+    client = Client(site.url, 'user', 'pass')
+    with WilmesService(client) as service:
+        server = make_server(service, port=0)
+        thread = threading.Thread(
+            target=server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        (host, port) = server.server_address[:2]
+        base_url = f'http://{host!s}:{port}'
+        try:
+            pupils = get_json(base_url + '/pupils')
+            counts = get_json(base_url + '/counts')
+            message_list = get_json(base_url + '/pupils/1000/messages')
+            message = get_json(base_url + '/pupils/1000/messages/101')
+            news_list = get_json(base_url + '/pupils/1001/news/')
+            news_id = news_list[-1]['id']
+            news_item = get_json(base_url + f'/pupils/1001/news/{news_id}')
+            request_count = site.request_count
+            assert get_json(base_url + '/pupils/1000/messages') == (
+                message_list)
+            assert site.request_count == request_count
+            for path in ['/', '/pupils/1000/messages/999', '/pupils/9/news']:
+                with pytest.raises(urllib.error.HTTPError) as error:
+                    get_json(base_url + path)
+                assert error.value.code == 404
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    assert pupils == [
+        {'id': '1000', 'name': 'Pupil 1000'},
+        {'id': '1001', 'name': 'Pupil 1001'}]
+    assert counts == {'1000': 1, '1001': 1}
+    assert [x['id'] for x in message_list] == [100, 101, 102]
+    assert message['subject'] == message_list[1]['subject']
+    assert len(message['replies']) == 1
+    assert len(news_list) >= 2
+    assert news_item['subject'] == news_list[-1]['subject']
+    assert news_item['sender']['name'] == 'Head (Principal)'
+
+
+def test_internal_errors_are_not_reported_as_not_found(
+        site: FakeWilmaServer,
+        monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def fail(connection: Connection, pupil_id: PupilId) -> None:
+        raise KeyError('Id')
+
+    monkeypatch.setattr(Connection, 'fetch_message_list', fail)
+    client = Client(site.url, 'user', 'pass')
+    with WilmesService(client) as service:
+        server = make_server(service, port=0)
+        thread = threading.Thread(
+            target=server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        (host, port) = server.server_address[:2]
+        try:
+            with pytest.raises(urllib.error.HTTPError) as error:
+                get_json(f'http://{host!s}:{port}/pupils/1000/messages')
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    assert error.value.code == 502
+
+
+def test_login_again_after_session_expiry(site: FakeWilmaServer) -> None:
+    client = Client(site.url, 'user', 'pass')
+    with WilmesService(client) as service:
+        service.connect()
+        site.sessions.clear()
+        messages = service.get_message_list(PUPIL_ID)
+        service.keep_alive()
+
+        assert len(messages) == 3
+        assert service.login_count == 2
+
+
+def test_login_again_when_logout_fails(site: FakeWilmaServer) -> None:
+    client = Client(site.url, 'user', 'pass')
+    with WilmesService(client) as service:
+        service.connect()
+        site.sessions.clear()
+        site.failures['/logout'] = 1
+        messages = service.get_message_list(PUPIL_ID)
+
+        assert len(messages) == 3
+        assert service.login_count == 2
+        assert site.failures['/logout'] == 0
+
+
+def test_result_cache_coalesces_concurrent_requests() -> None:
+    cache = ResultCache(ttl=60)
+    release = threading.Event()
+    calls: List[int] = []
+    results: List[Any] = []
+
+    def compute() -> str:
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    def request() -> None:
+        results.append(cache.get('a', compute))
+
+    threads = [threading.Thread(target=request) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while cache.miss_count + cache.coalesced_count < 5:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ['result'] * 5
+    assert (cache.miss_count, cache.coalesced_count) == (1, 4)
+
+
+def test_result_cache_expiry_and_failures() -> None:
+    now = [0.0]
+    cache = ResultCache(ttl=10, clock=lambda: now[0])
+    values = iter(range(10))
+
+    def fail() -> int:
+        raise ValueError('boom')
+
+    assert cache.get('a', lambda: next(values)) == 0
+    now[0] = 9.9
+    assert cache.get('a', lambda: next(values)) == 0
+    now[0] = 10.0
+    assert cache.get('a', lambda: next(values)) == 1
+    with pytest.raises(ValueError):
+        cache.get('b', fail)
+    assert cache.get('b', lambda: next(values)) == 2
+    assert cache.get_stats() == {
+        'hits': 1, 'misses': 4, 'coalesced': 0, 'entries': 2}
+
+
+def get_json(url: str) -> Any:
+    with urllib.request.urlopen(url) as response:
+        return json.loads(response.read().decode('utf-8'))
@@ -0,0 +1,85 @@
+from datetime import datetime
+
+from wilmes._settings import TZ
+from wilmes._store import MessageStore
+from wilmes._types import (
+    Message,
+    MessageId,
+    MessageInfo,
+    NewsItem,
+    NewsItemId,
+    NewsItemInfo,
+    Person,
+    PupilId,
+    ReplyMessage,
+)
+
+ORIGIN = 'https://school.example.com'
+PUPIL_ID = PupilId('123')
+
+
+def make_message(reply_count: int = 1) -> Message:
+    info = MessageInfo(
+        id=MessageId(42),
+        origin=ORIGIN,
+        pupil_id=PUPIL_ID,
+        subject='Excursion',
+        last_timestamp=TZ.localize(datetime(2024, 1, 2, 12, 30)),
+        folder='Inbox',
+        sender=Person('Teacher', id=7, type='teachers'),
+        reply_count=reply_count,
+        is_unread=True,
+    )
+    reply = ReplyMessage(
+        timestamp=TZ.localize(datetime(2024, 1, 3, 8, 0)),
+        sender=Person('Parent'),
+        body='<p>Thanks</p>')
+    return Message.from_info_and_attrs(
+        info,
+        timestamp=TZ.localize(datetime(2024, 1, 2, 12, 0)),
+        recipients=[Person('Parent'), Person('Other (7A)')],
+        body='<p>Hello</p>',
+        replies=[reply] * reply_count)
+
+
+def test_message_round_trip() -> None:
+    message = make_message()
+    with MessageStore(':memory:') as store:
+        store.save_messages([message])
+        stored = store.get_message(ORIGIN, PUPIL_ID, message.id)
+        states = store.get_message_states(ORIGIN, PUPIL_ID)
+        assert store.get_messages(ORIGIN, PupilId('999')) == []
+
+    assert stored == message
+    assert stored is not None
+    assert str(stored) == str(message)
+    assert states == {message.id: (message.last_timestamp, 1)}
+
+
+def test_message_replaced_on_save() -> None:
+    with MessageStore(':memory:') as store:
+        store.save_messages([make_message(reply_count=1)])
+        store.save_messages([make_message(reply_count=2)])
+        messages = store.get_messages(ORIGIN, PUPIL_ID)
+
+    assert [len(x.replies) for x in messages] == [2]
+
+
+def test_news_item_round_trip() -> None:
+    info = NewsItemInfo(
+        id=NewsItemId(5),
+        origin=ORIGIN,
+        pupil_id=PUPIL_ID,
+        subject='Holiday',
+        timestamp=None,
+        is_unread=False,
+    )
+    news_item = NewsItem.from_info_and_attrs(
+        info,
+        timestamp=TZ.localize(datetime(2024, 2, 1)),
+        sender=Person('Principal', id=1, type='personnel'),
+        body='<p>School is closed</p>')
+    with MessageStore(':memory:') as store:
+        store.save_news_items([news_item])
+        assert store.get_news_item_ids(ORIGIN, PUPIL_ID) == {info.id}
+        assert store.get_news_items(ORIGIN, PUPIL_ID) == [news_item]
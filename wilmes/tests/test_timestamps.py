@@ -0,0 +1,59 @@
+from datetime import date, datetime, timedelta
+from typing import Any, List
+
+import pytest
+
+from wilmes import _timestamps
+from wilmes._settings import TZ
+from wilmes._timestamps import parse_timestamp, parse_timestamp_with_dateutil
+
+
+@pytest.mark.parametrize('string', [
+    '2024-01-02 12:34',
+    '2024-1-2 08:05:09',
+    '2024-01-02',
+    '2.1.2024 12:34',
+    '02.01.2024 7:05',
+    '31.12.2023',
+    ' 1.2.2024 ',
+    '1.2.',
+    'Today',
+    'yesterday',
+    'Wednesday 3.1.2024',
+    '2024-01-02T12:34:56+03:00',
+])
+def test_same_as_dateutil(string: str) -> None:
+    assert parse_timestamp(string) == parse_timestamp_with_dateutil(string)
+
+
+def test_values() -> None:
+    assert parse_timestamp('2.1.2024 12:34') == TZ.localize(
+        datetime(2024, 1, 2, 12, 34))
+    assert parse_timestamp('1.7.2024') == TZ.localize(datetime(2024, 7, 1))
+    assert parse_timestamp('today').date() == date.today()
+    yesterday = date.today() - timedelta(days=1)
+    assert parse_timestamp('Yesterday').date() == yesterday
+    assert parse_timestamp('3.4.').date() == date(date.today().year, 4, 3)
+
+
+def test_invalid_date() -> None:
+    with pytest.raises(ValueError):
+        parse_timestamp('31.2.2024')
+
+
+def test_dateutil_results_are_not_cached(
+        monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: List[str] = []
+
+    def parse(string: str, tz: Any = TZ) -> datetime:
+        calls.append(string)
+        return parse_timestamp_with_dateutil(string, tz)
+
+    monkeypatch.setattr(_timestamps, 'parse_timestamp_with_dateutil', parse)
+
+    # The date of a time only timestamp is filled in from the current date
+    assert parse_timestamp('12:30').date() == date.today()
+    assert parse_timestamp('12:30').date() == date.today()
+    assert parse_timestamp('2.1.2024 12:34').hour == 12
+    assert calls == ['12:30', '12:30']
@@ -0,0 +1,46 @@
+import pytest
+import requests
+
+from wilmes._client import Connection
+from wilmes._transport import TransportConfig
+from wilmes._types import PupilId
+from wilmes.tests.fake_wilma import FakeWilmaData, FakeWilmaServer
+
+PUPIL_ID = PupilId('1000')
+NO_BACKOFF = TransportConfig(backoff_factor=0, backoff_jitter=0)
+
+
+def test_retry_transient_failures() -> None:
+    with FakeWilmaServer() as server, Connection.open(
+            server.url, 'user', 'pass', transport=NO_BACKOFF) as connection:
+        server.failures['/!1000/messages/list'] = 2
+        infos = connection.fetch_message_list(PUPIL_ID)
+        stats = connection.transport_stats.to_dict()
+
+    assert len(infos) == 5
+    assert stats['retry_count'] == 2
+    assert stats['error_count'] == 0
+
+
+def test_give_up_after_retries() -> None:
+    transport = TransportConfig(retries=1, backoff_factor=0, backoff_jitter=0)
+    with FakeWilmaServer() as server, Connection.open(
+            server.url, 'user', 'pass', transport=transport) as connection:
+        server.failures['/!1000/news'] = 3
+        with pytest.raises(requests.HTTPError, match='503'):
+            connection.fetch_news_list(PUPIL_ID)
+
+    assert connection.transport_stats.retry_count == 1
+
+
+def test_compression_and_counters() -> None:
+    data = FakeWilmaData(pupils=1, messages=6, recipients=50)
+    with FakeWilmaServer(data, compress=True) as server, Connection.open(
+            server.url, 'user', 'pass', max_workers=3) as connection:
+        infos = connection.fetch_message_list(PUPIL_ID)
+        connection.fetch_messages(infos)
+        stats = connection.transport_stats.to_dict()
+
+    # Token, login page, login, redirect, message list and messages
+    assert stats['request_count'] == 5 + 6
+    assert stats['bytes_received'] < stats['bytes_decoded'] / 2
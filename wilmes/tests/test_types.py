@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from wilmes._settings import TZ
+from wilmes._types import Person, ReplyMessage, render_text
+
+
+def make_reply(body: str) -> ReplyMessage:
+    return ReplyMessage(
+        timestamp=TZ.localize(datetime(2024, 1, 3, 8, 0)),
+        sender=Person('Teacher'),
+        body=body)
+
+
+def test_cleaned_body_text() -> None:
+    reply = make_reply(
+        '<p>First paragraph with\xa0some words</p>\n<p>Second</p>')
+
+    assert reply.get_cleaned_body_text(width=20) == (
+        'First paragraph with\nsome words\n\nSecond')
+    assert reply.get_cleaned_body_text() == (
+        'First paragraph with some words\n\nSecond')
+    assert reply.get_body_text() is reply.get_body_text()
+
+
+def test_body_change_invalidates_cached_text() -> None:
+    reply = make_reply('<p>Old</p>')
+    assert reply.get_cleaned_body_text() == 'Old'
+
+    reply.body = '<p>New</p>'
+
+    assert reply.get_cleaned_body_text() == 'New'
+
+
+def test_render_text() -> None:
+    replies = [make_reply('<p>One</p>'), make_reply('<p>Two</p>')]
+
+    text = render_text(replies)
+
+    assert text == (
+        'Date: 2024-01-03 08:00:00+02:00\nFrom: Teacher\n\nOne\n\n'
+        'Date: 2024-01-03 08:00:00+02:00\nFrom: Teacher\n\nTwo')